@@ -0,0 +1,118 @@
+import socketserver
+import threading
+import time
+
+
+class RESPHandler(socketserver.StreamRequestHandler):
+    disable_nagle_algorithm = True
+
+    def handle(self):
+        while True:
+            try:
+                command = self.read_command()
+            except (ConnectionError, ValueError):
+                return
+            if command is None:
+                return
+            self.wfile.write(self.server.execute(command))
+
+    def read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        if line[:1] != b'*':
+            # Inline command (e.g. from telnet)
+            return line.split()
+        parts = []
+        for _ in range(int(line[1:-2])):
+            length = int(self.rfile.readline()[1:-2])
+            parts.append(self.rfile.read(length + 2)[:-2])
+        return parts
+
+
+class FakeRedisServer(socketserver.ThreadingTCPServer):
+    """
+    In-process stand-in for the handful of Redis commands main.ratelimit
+    uses (INCRBY, EXPIRE, GET, DEL, FLUSHDB, PING, SELECT, AUTH), with the
+    same atomicity: every command runs under one lock.
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host='127.0.0.1', port=0):
+        super().__init__((host, port), RESPHandler)
+        self.data = {}
+        self.expires = {}
+        self._lock = threading.Lock()
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f'redis://{host}:{port}/0'
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, name='fake-redis', daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def execute(self, command):
+        name = command[0].upper().decode()
+        args = command[1:]
+        with self._lock:
+            self._expire_keys(args)
+            try:
+                return getattr(self, f'cmd_{name.lower()}')(*args)
+            except AttributeError:
+                return f'-ERR unknown command \'{name}\'\r\n'.encode()
+            except (TypeError, ValueError):
+                return f'-ERR wrong arguments for \'{name}\'\r\n'.encode()
+
+    def _expire_keys(self, keys):
+        now = time.time()
+        for key in keys:
+            if key in self.expires and self.expires[key] <= now:
+                self.data.pop(key, None)
+                self.expires.pop(key, None)
+
+    def cmd_ping(self, *args):
+        return b'+PONG\r\n'
+
+    def cmd_auth(self, *args):
+        return b'+OK\r\n'
+
+    def cmd_select(self, db):
+        return b'+OK\r\n'
+
+    def cmd_incrby(self, key, delta):
+        value = int(self.data.get(key, 0)) + int(delta)
+        self.data[key] = str(value).encode()
+        return b':%d\r\n' % value
+
+    def cmd_incr(self, key):
+        return self.cmd_incrby(key, b'1')
+
+    def cmd_expire(self, key, seconds):
+        if key not in self.data:
+            return b':0\r\n'
+        self.expires[key] = time.time() + int(seconds)
+        return b':1\r\n'
+
+    def cmd_get(self, key):
+        value = self.data.get(key)
+        if value is None:
+            return b'$-1\r\n'
+        return b'$%d\r\n%s\r\n' % (len(value), value)
+
+    def cmd_del(self, *keys):
+        removed = sum(1 for key in keys if self.data.pop(key, None) is not None)
+        for key in keys:
+            self.expires.pop(key, None)
+        return b':%d\r\n' % removed
+
+    def cmd_flushdb(self, *args):
+        self.data.clear()
+        self.expires.clear()
+        return b'+OK\r\n'
@@ -0,0 +1,161 @@
+import json
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlsplit
+
+SPREADSHEET_RE = re.compile(r'^/v4/spreadsheets/([^/:]+)$')
+BATCH_UPDATE_RE = re.compile(r'^/v4/spreadsheets/([^/:]+):batchUpdate$')
+APPEND_RE = re.compile(r'^/v4/spreadsheets/([^/:]+)/values/(.+):append$')
+
+
+class FakeSheetsHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        path = urlsplit(self.path).path
+        self.server.simulate_latency()
+        match = SPREADSHEET_RE.match(path)
+        if not match:
+            return self.reply(404, {'error': {'code': 404, 'message': 'Not found'}})
+        self.server.count('metadata')
+        self.reply(200, self.server.metadata(match.group(1)))
+
+    def do_POST(self):
+        path = urlsplit(self.path).path
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        self.server.simulate_latency()
+
+        if path == '/token':
+            self.server.count('token')
+            return self.reply(200, {'access_token': 'fake-token', 'expires_in': 3600, 'token_type': 'Bearer'})
+
+        match = BATCH_UPDATE_RE.match(path)
+        if match:
+            return self.batch_update(match.group(1), json.loads(body or b'{}'))
+
+        match = APPEND_RE.match(path)
+        if not match:
+            return self.reply(404, {'error': {'code': 404, 'message': 'Not found'}})
+
+        sheet_name = unquote(match.group(2)).split('!')[0].strip("'")
+        if sheet_name not in self.server.sheets:
+            return self.reply(400, {'error': {'code': 400, 'message': f'Unable to parse range: {sheet_name}'}})
+        rows = json.loads(body or b'{}').get('values', [])
+        self.server.count('append')
+        self.server.append(sheet_name, rows)
+        self.reply(200, {
+            'spreadsheetId': match.group(1),
+            'updates': {'updatedRange': sheet_name, 'updatedRows': len(rows)},
+        })
+
+    def batch_update(self, spreadsheet_id, body):
+        appends = []
+        for request in body.get('requests', []):
+            cells = request.get('appendCells')
+            if cells is None or not 0 <= cells['sheetId'] < len(self.server.sheets):
+                return self.reply(400, {'error': {'code': 400, 'message': 'Unsupported request'}})
+            rows = [
+                [next(iter(value['userEnteredValue'].values())) for value in row['values']]
+                for row in cells['rows']
+            ]
+            appends.append((self.server.sheets[cells['sheetId']], rows))
+
+        self.server.count('batch_update')
+        for sheet_name, rows in appends:
+            self.server.append(sheet_name, rows)
+        self.reply(200, {'spreadsheetId': spreadsheet_id, 'replies': [{} for _ in appends]})
+
+    def reply(self, status, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class FakeSheetsServer(ThreadingHTTPServer):
+    """
+    Minimal stand-in for the Google OAuth token endpoint and the Sheets v4
+    API calls the site makes (spreadsheet metadata, values:append and
+    appendCells batch updates), with an optional per-request delay to
+    simulate the network round trip.
+    """
+    daemon_threads = True
+
+    def __init__(self, sheets, latency=0.0, host='127.0.0.1', port=0):
+        super().__init__((host, port), FakeSheetsHandler)
+        self.sheets = list(sheets)
+        self.latency = latency
+        self.rows = {name: [] for name in self.sheets}
+        self.requests = Counter()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def simulate_latency(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    def count(self, kind):
+        with self._lock:
+            self.requests[kind] += 1
+
+    def append(self, sheet_name, rows):
+        with self._lock:
+            self.rows[sheet_name].extend(rows)
+
+    def metadata(self, spreadsheet_id):
+        return {
+            'spreadsheetId': spreadsheet_id,
+            'properties': {'title': 'Fake spreadsheet', 'locale': 'en_US', 'timeZone': 'UTC'},
+            'sheets': [
+                {'properties': {
+                    'sheetId': index, 'title': name, 'index': index, 'sheetType': 'GRID',
+                    'gridProperties': {'rowCount': 1000, 'columnCount': 10},
+                }}
+                for index, name in enumerate(self.sheets)
+            ],
+        }
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, name='fake-sheets', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def service_account_info(token_uri):
+    """Service account JSON with a throwaway RSA key, pointed at ``token_uri``"""
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    ).decode()
+    return {
+        'type': 'service_account',
+        'project_id': 'fake-project',
+        'private_key_id': 'fake-key-id',
+        'private_key': pem,
+        'client_email': 'bench@fake-project.iam.gserviceaccount.com',
+        'client_id': '1',
+        'token_uri': token_uri,
+    }
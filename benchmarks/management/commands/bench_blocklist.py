@@ -0,0 +1,76 @@
+import ipaddress
+import math
+import random
+import time
+from django.core.management.base import BaseCommand, CommandError
+from main.blocklist import Blocklist
+from main.timing import summarize, time_calls
+
+
+class Command(BaseCommand):
+    help = 'Benchmark blocklist lookups with many active bans against a linear scan of the banned networks'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--entries',
+            type=int,
+            default=100000,
+            help='Active bans: random IPv4 addresses, IPv6 /64s and a few CIDR ranges'
+        )
+        parser.add_argument(
+            '--lookups',
+            type=int,
+            default=20000,
+            help='Lookups per measured case'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=1,
+            help='Random seed for the generated addresses'
+        )
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        entries = options['entries']
+        networks = set()
+        while len(networks) < entries:
+            kind = rng.random()
+            if kind < 0.7:
+                networks.add(ipaddress.ip_network(rng.getrandbits(32)))
+            elif kind < 0.98:
+                networks.add(ipaddress.ip_network((rng.getrandbits(64) << 64, 64)))
+            else:
+                networks.add(ipaddress.ip_network((rng.getrandbits(32), 24), strict=False))
+        networks = list(networks)
+
+        blocklist = Blocklist({})
+        began = time.perf_counter()
+        for network in networks:
+            blocklist.ban(network, math.inf, 'benchmark')
+        elapsed = time.perf_counter() - began
+        stats = blocklist.stats()
+        self.stdout.write(self.style.SUCCESS(f'{entries} bans'))
+        self.stdout.write(f'  built in {elapsed:.2f}s, {stats["memory"] / 1024 / 1024:.1f} MB of trie nodes '
+                          f'({len(blocklist.tries[4].marked) + len(blocklist.tries[6].marked)} nodes)')
+
+        def host(network):
+            return str(network.network_address + rng.randrange(min(network.num_addresses, 1 << 32)))
+
+        cases = [
+            ('banned IPv4', [host(n) for n in rng.choices([n for n in networks if n.version == 4], k=options['lookups'])]),
+            ('banned IPv6', [host(n) for n in rng.choices([n for n in networks if n.version == 6], k=options['lookups'])]),
+            ('clean IPv4', [str(ipaddress.IPv4Address(rng.getrandbits(32))) for _ in range(options['lookups'])]),
+            ('clean IPv6', [str(ipaddress.IPv6Address(rng.getrandbits(128))) for _ in range(options['lookups'])]),
+        ]
+        for label, ips in cases:
+            hits = sum(1 for ip in ips if blocklist.check(ip))
+            if label.startswith('banned') and hits != len(ips):
+                raise CommandError(f'{label}: only {hits} of {len(ips)} lookups matched a ban')
+            self.stdout.write(f'  {label:12} {summarize(time_calls(blocklist.check, ips))}  ({hits} blocked)')
+
+        # What checking each request against a list of networks would cost
+        sample = cases[2][1][:20]
+        timings = time_calls(lambda ip: any(ipaddress.ip_address(ip) in n for n in networks), sample)
+        self.stdout.write(self.style.SUCCESS('linear scan'))
+        self.stdout.write(f'  {"clean IPv4":12} {summarize(timings)}')
@@ -0,0 +1,124 @@
+import json
+import time
+import uuid
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import RequestFactory
+from django.test.utils import override_settings
+from main import views
+from main.captcha import BloomFilter, BloomSeenSet
+from main.captcha_images import _load_font, challenge_pool, render_challenge
+from main.security import generate_captcha_text
+
+# (CAPTCHA_MODE, CAPTCHA_IMAGES) per benchmarked mode
+MODES = {
+    'session': ('session', False),
+    'signed': ('signed', False),
+    'images': ('signed', True),
+}
+
+
+class Command(BaseCommand):
+    help = 'Benchmark CAPTCHA fetch floods in session, signed-token and image mode: session rows written and latency'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fetches',
+            type=int,
+            default=2000,
+            help='CAPTCHA fetches in the flood, each from a client without cookies'
+        )
+        parser.add_argument(
+            '--mode',
+            choices=['all'] + list(MODES),
+            default='all',
+            help='CAPTCHA mode to benchmark'
+        )
+        parser.add_argument(
+            '--bloom-items',
+            type=int,
+            default=100000,
+            help='Nonces inserted when measuring the Bloom filter false positive rate'
+        )
+
+    def handle(self, *args, **options):
+        modes = list(MODES) if options['mode'] == 'all' else [options['mode']]
+        factory = RequestFactory()
+        # Full request path for the view: session middleware loads and saves the session
+        get_captcha = SessionMiddleware(views.get_captcha)
+        verify_captcha = SessionMiddleware(views.verify_captcha)
+
+        if 'images' in modes:
+            self.check_pool()
+
+        for mode in modes:
+            captcha_mode, images = MODES[mode]
+            with override_settings(CAPTCHA_MODE=captcha_mode, CAPTCHA_IMAGES=images), transaction.atomic():
+                before = Session.objects.count()
+                tokens = []
+                began = time.perf_counter()
+                for _ in range(options['fetches']):
+                    # Bots do not send the session cookie back, so every fetch is a new session
+                    response = get_captcha(factory.get('/get-captcha/', {'type': 'contact'}))
+                    tokens.append(json.loads(response.content))
+                elapsed = time.perf_counter() - began
+                written = Session.objects.count() - before
+                self.stdout.write(self.style.SUCCESS(mode))
+                self.stdout.write(f'  {options["fetches"]} fetches: {elapsed * 1e6 / options["fetches"]:8.1f} us each, '
+                                  f'{written} session rows written')
+                if mode == 'images':
+                    self.stdout.write(f'  pool after the flood: {challenge_pool.stats()}')
+                if mode == 'signed':
+                    self.check_verify(verify_captcha, factory, tokens)
+                # Leave the database as it was
+                transaction.set_rollback(True)
+
+        self.check_bloom(options['bloom_items'])
+
+    def check_pool(self):
+        # Warm the pool first, as a running worker's would be
+        filled = challenge_pool.fill()
+        began = time.perf_counter()
+        render_challenge(generate_captcha_text(), _load_font(challenge_pool.font_path, 30),
+                         image_format=challenge_pool.image_format)
+        render = time.perf_counter() - began
+        self.stdout.write(self.style.SUCCESS('image pool'))
+        self.stdout.write(f'  rendering one {challenge_pool.image_format} challenge inline: {render * 1e6:8.1f} us '
+                          f'({filled} pre-rendered for the flood below)')
+
+    def check_verify(self, verify_captcha, factory, challenges):
+        def post(challenge, answer):
+            request = factory.post('/verify-captcha/', json.dumps({
+                'captcha': answer, 'token': challenge['token'], 'type': 'contact'
+            }), content_type='application/json')
+            return json.loads(verify_captcha(request).content)
+
+        began = time.perf_counter()
+        results = [post(challenge, challenge['captcha_text']) for challenge in challenges]
+        elapsed = time.perf_counter() - began
+        valid = sum(1 for result in results if result['valid'])
+        self.stdout.write(f'  {len(challenges)} verifications: {elapsed * 1e6 / len(challenges):8.1f} us each, {valid} valid')
+
+        replayed = sum(1 for challenge in challenges[:100] if post(challenge, challenge['captcha_text'])['valid'])
+        wrong = sum(1 for challenge in challenges[:100] if post(challenge, 'WRONG1')['valid'])
+        self.stdout.write(f'  replays accepted: {replayed}, wrong answers accepted: {wrong}')
+        if valid != len(challenges) or replayed or wrong:
+            raise CommandError('Signed CAPTCHA verification is wrong')
+
+    def check_bloom(self, items):
+        seen = BloomSeenSet(capacity=items)
+        nonces = [uuid.uuid4().hex for _ in range(items)]
+        began = time.perf_counter()
+        for nonce in nonces:
+            seen.add(nonce)
+        elapsed = time.perf_counter() - began
+        bloom = BloomFilter(items, seen.error_rate)
+        for nonce in nonces:
+            bloom.add(nonce)
+        false_positives = sum(1 for _ in range(items) if uuid.uuid4().hex in bloom)
+        self.stdout.write(self.style.SUCCESS('bloom seen-set'))
+        self.stdout.write(f'  {items} nonces: {elapsed * 1e6 / items:.1f} us per check, {seen.memory() / 1024:.0f} KB for two '
+                          f'generations, {false_positives} false positives in {items} fresh nonces '
+                          f'(target rate {seen.error_rate})')
@@ -0,0 +1,156 @@
+import json
+import os
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from main.chatbot_ai import TOKEN_RE, IntentEngine, get_chatbot
+from main.models import ChatbotMessage
+from main.timing import summarize, time_calls
+
+REGRESSION_PATH = os.path.join(settings.BASE_DIR, 'main', 'data', 'chatbot_regression.json')
+
+# Used when there are too few stored chatbot messages to replay
+SAMPLE_MESSAGES = [
+    'hello', 'Hi there!', 'good morning', 'What services do you offer?', 'I need a mobile app for my shop',
+    'Do you do web development?', 'can you help with SEO and social media', 'we are moving to AWS',
+    'is my website secure? need a cybersecurity audit', 'machine learning for sales forecasting',
+    'how much does a website cost', 'what is your hourly rate', 'my budget is around 5000 dollars',
+    'how can I contact you', 'whats your phone number', 'please email me the details',
+    'what are your business hours', 'are you open on weekends', 'tell me about your team',
+    'how many people work there', 'can I see your portfolio', 'show me some past projects',
+    'this is great, thanks', 'I want to talk about something else', 'asdf', 'ok',
+    'who are your clients', 'do you have case studies', 'what time do you close',
+]
+
+
+# The keyword chains ChatbotAI.get_response used before the intent engine
+LEGACY_SERVICES = [
+    'web development', 'software development', 'mobile app', 'digital marketing', 'seo', 'social media', 'cloud',
+    'aws', 'azure', 'security', 'cybersecurity', 'data analytics', 'ai', 'machine learning', 'consulting',
+]
+LEGACY_CHAIN = [
+    ('pricing', ['price', 'cost', 'rate', 'budget', 'how much']),
+    ('contact', ['contact', 'email', 'phone', 'call', 'reach']),
+    ('hours', ['hour', 'time', 'available', 'open', 'close']),
+    ('team', ['team', 'people', 'staff', 'employee']),
+    ('portfolio', ['portfolio', 'project', 'work', 'case study', 'client']),
+]
+
+
+def legacy_intent(message):
+    """Intent the old substring chain picked"""
+    message_lower = message.lower().strip()
+    if any(greeting in message_lower for greeting in
+           ['hello', 'hi', 'hey', 'good morning', 'good afternoon', 'good evening']):
+        return 'greeting'
+    for service in LEGACY_SERVICES:
+        if service in message_lower:
+            return 'service'
+    for intent, words in LEGACY_CHAIN:
+        if any(word in message_lower for word in words):
+            return intent
+    return 'default'
+
+
+class Command(BaseCommand):
+    help = 'Benchmark chatbot intent matching against the old keyword chains on stored chatbot messages'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=5000,
+            help='Most recent user messages replayed from ChatbotMessage'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=20,
+            help='Passes over the corpus'
+        )
+        parser.add_argument(
+            '--show',
+            type=int,
+            default=10,
+            help='Messages listed where the old and new intent differ'
+        )
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Fail if any labelled message in main/data/chatbot_regression.json gets the wrong intent'
+        )
+
+    def load_corpus(self, limit):
+        corpus = list(ChatbotMessage.objects.filter(is_user=True).order_by('-created_at')
+                      .values_list('message', flat=True)[:limit])
+        if len(corpus) < 20:
+            self.stdout.write(f'Only {len(corpus)} stored chatbot messages; replaying the built-in samples too')
+            corpus += SAMPLE_MESSAGES
+        return corpus
+
+    def handle(self, *args, **options):
+        corpus = self.load_corpus(options['limit'])
+        began = time.perf_counter()
+        bot = get_chatbot()
+        self.stdout.write(f'{len(corpus)} messages; engine built in {(time.perf_counter() - began) * 1e3:.2f} ms '
+                          f'({len(bot.engine.keywords)} keywords)')
+
+        def new_intent(message):
+            match = bot.engine.match(message)
+            if match is None:
+                return 'default'
+            # Compare the per-service intents as the one 'service' branch they replaced
+            return 'service' if bot.intents[match.intent].service else match.intent
+
+        for label, func in (('old keyword chains', legacy_intent), ('intent engine', new_intent),
+                            ('intent engine + response', lambda message: bot.get_response(message, None))):
+            began = time.perf_counter()
+            for _ in range(options['repeat']):
+                for message in corpus:
+                    func(message)
+            elapsed = time.perf_counter() - began
+            total = len(corpus) * options['repeat']
+            self.stdout.write(self.style.SUCCESS(label))
+            self.stdout.write(f'  {total / elapsed:12,.0f} messages/sec  ({elapsed * 1e6 / total:.2f} us each)')
+
+        differing = [(message, legacy_intent(message), new_intent(message)) for message in corpus]
+        differing = [row for row in differing if row[1] != row[2]]
+        self.stdout.write(f'{len(differing)} of {len(corpus)} messages change intent '
+                          f'(whole-word matching: "hi" no longer fires inside "this"; knowledge base keywords)')
+        for message, old, new in differing[:options['show']]:
+            self.stdout.write(f'  {message[:60]!r}: {old} -> {new}')
+
+        self.regression(bot, options['check'])
+
+    def regression(self, bot, check):
+        """Labelled messages through the engine with and without typo correction"""
+        with open(REGRESSION_PATH, encoding='utf-8') as f:
+            labelled = json.load(f)['messages']
+        keywords = [(keyword.intent, [keyword.text]) for keyword in bot.engine.keywords]
+        began = time.perf_counter()
+        fuzzy = IntentEngine(keywords)
+        built = time.perf_counter() - began
+        self.stdout.write(self.style.SUCCESS(f'regression set: {len(labelled)} labelled messages'))
+        self.stdout.write(f'  fuzzy engine built in {built * 1e3:.2f} ms '
+                          f'({len(fuzzy.vocabulary)} words, {len(fuzzy.grams)} trigrams)')
+        failures = []
+        for label, engine in (('exact', IntentEngine(keywords, fuzzy=False)), ('fuzzy', fuzzy)):
+            wrong = []
+            for message, expected in labelled:
+                match = engine.match(message)
+                intent = match.intent if match else 'default'
+                if intent != expected:
+                    wrong.append((message, expected, intent))
+            self.stdout.write(f'  {label:6} {len(labelled) - len(wrong)}/{len(labelled)} correct  '
+                              f'match: {summarize(time_calls(engine.match, [m for m, _ in labelled], 20))}')
+            failures = wrong
+
+        # Uncached correction cost: every token that is not a keyword word
+        tokens = sorted({token for message, _ in labelled for token in TOKEN_RE.findall(message.lower())
+                         if token not in fuzzy.vocabulary})
+        self.stdout.write(f'  uncached correction of {len(tokens)} unknown tokens: '
+                          f'{summarize(time_calls(fuzzy._nearest, tokens, 20))}')
+        for message, expected, intent in failures:
+            self.stdout.write(self.style.WARNING(f'  {message!r}: expected {expected}, got {intent}'))
+        if check and failures:
+            raise CommandError(f'{len(failures)} labelled messages matched the wrong intent')
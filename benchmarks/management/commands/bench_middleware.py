@@ -0,0 +1,112 @@
+from django.conf import settings
+from django.core.handlers.base import BaseHandler
+from django.core.management.base import BaseCommand
+from django.http import HttpResponse
+from django.middleware.security import SecurityMiddleware
+from django.test import RequestFactory
+from django.test.utils import override_settings
+from django.urls import path
+from main.middleware import SecurityHeadersMiddleware
+from main.timing import summarize, time_calls
+
+LEGACY = f'{__name__}.LegacySecurityHeadersMiddleware'
+
+
+class LegacySecurityHeadersMiddleware:
+    """main.middleware.SecurityHeadersMiddleware as it was, run after Django's SecurityMiddleware"""
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        response['X-Content-Type-Options'] = 'nosniff'
+        response['X-Frame-Options'] = 'DENY'
+        response['X-XSS-Protection'] = '1; mode=block'
+        if not settings.DEBUG:
+            csp = (
+                "default-src 'self'; "
+                "script-src 'self' 'unsafe-inline' https://www.google.com https://www.gstatic.com; "
+                "style-src 'self' 'unsafe-inline'; "
+                "img-src 'self' data: https:; "
+                "font-src 'self'; "
+                "connect-src 'self'; "
+                "frame-ancestors 'none'; "
+                "base-uri 'self'; "
+                "form-action 'self';"
+            )
+            response['Content-Security-Policy'] = csp
+        return response
+
+
+def ok(request):
+    return HttpResponse('ok')
+
+
+# ROOT_URLCONF for the full-chain runs: one view that does no work
+urlpatterns = [path('bench/', ok, name='bench')]
+
+
+def legacy_middleware():
+    """settings.MIDDLEWARE with the two header middlewares this one replaced"""
+    middleware = []
+    for name in settings.MIDDLEWARE:
+        if name == 'main.middleware.SecurityHeadersMiddleware':
+            middleware.append('django.middleware.security.SecurityMiddleware')
+        else:
+            middleware.append(name)
+    middleware.append(LEGACY)
+    return middleware
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the security header middleware alone and the whole middleware chain, before and after'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=5000,
+            help='Requests per measured case'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=3,
+            help='Passes over the requests'
+        )
+
+    def handle(self, *args, **options):
+        factory = RequestFactory()
+        requests = [factory.get('/bench/', secure=True) for _ in range(options['requests'])]
+
+        # Production headers: CSP enforced, HSTS on
+        with override_settings(DEBUG=False, SECURITY_CSP_REPORT_ONLY=False, SECURE_SSL_REDIRECT=False,
+                               SECURE_HSTS_SECONDS=31536000):
+            self.stdout.write(self.style.SUCCESS('security headers only'))
+            before = SecurityMiddleware(LegacySecurityHeadersMiddleware(ok))
+            after = SecurityHeadersMiddleware(ok)
+            self.report('before', before, requests, options['repeat'])
+            self.report('after', after, requests, options['repeat'])
+
+            self.stdout.write(self.style.SUCCESS('full middleware chain'))
+            # Leave the bench path out of page view tracking
+            exclude = list(getattr(settings, 'PAGEVIEW_EXCLUDE_PATHS', [])) + ['/bench/']
+            responses = []
+            for label, middleware in (('before', legacy_middleware()), ('after', settings.MIDDLEWARE)):
+                with override_settings(MIDDLEWARE=middleware, ROOT_URLCONF=__name__, PAGEVIEW_EXCLUDE_PATHS=exclude):
+                    handler = BaseHandler()
+                    handler.load_middleware()
+                    self.report(label, handler.get_response, requests, options['repeat'])
+                    responses.append(handler.get_response(requests[0]))
+            self.compare(*responses)
+
+    def report(self, label, get_response, requests, repeat):
+        get_response(requests[0])
+        self.stdout.write(f'  {label:8} {summarize(time_calls(get_response, requests, repeat))}')
+
+    def compare(self, before, after):
+        self.stdout.write('  header changes:')
+        before, after = dict(before.items()), dict(after.items())
+        for name in sorted(set(before) | set(after)):
+            if before.get(name) != after.get(name):
+                self.stdout.write(f'  {name}: {before.get(name)!r} -> {after.get(name)!r}')
@@ -0,0 +1,135 @@
+import multiprocessing
+import tempfile
+import time
+import uuid
+from pathlib import Path
+from django.core.management.base import BaseCommand, CommandError
+from main.ratelimit import MemoryBackend, RedisBackend, SQLiteBackend, hit
+from ._fake_redis import FakeRedisServer
+
+BACKENDS = ['memory', 'sqlite', 'redis']
+
+
+def build_backend(name, target):
+    if name == 'memory':
+        return MemoryBackend()
+    if name == 'sqlite':
+        return SQLiteBackend(target)
+    return RedisBackend(target)
+
+
+def contend(name, target, key, hits, limit, period, start, results):
+    """Worker process: hammer one key and report how many hits were allowed"""
+    backend = build_backend(name, target)
+    start.wait()
+    began = time.perf_counter()
+    allowed = sum(1 for _ in range(hits) if hit(key, limit, period, backend))
+    results.put((allowed, time.perf_counter() - began))
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the rate limit backends: decisions/sec and correctness under multi-process contention'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--backend',
+            choices=['all'] + BACKENDS,
+            default='all',
+            help='Backend to benchmark'
+        )
+        parser.add_argument(
+            '--hits',
+            type=int,
+            default=20000,
+            help='Decisions timed in the single-process run'
+        )
+        parser.add_argument(
+            '--keys',
+            type=int,
+            default=100,
+            help='Distinct keys in the single-process run'
+        )
+        parser.add_argument(
+            '--processes',
+            type=int,
+            default=4,
+            help='Worker processes in the contention run'
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=100,
+            help='Limit on the shared key in the contention run'
+        )
+        parser.add_argument(
+            '--redis-url',
+            type=str,
+            default='',
+            help='Benchmark a real Redis server instead of the in-process stand-in'
+        )
+
+    def handle(self, *args, **options):
+        names = BACKENDS if options['backend'] == 'all' else [options['backend']]
+        failures = []
+
+        with tempfile.TemporaryDirectory() as tmp:
+            redis_server = None
+            if 'redis' in names and not options['redis_url']:
+                redis_server = FakeRedisServer().start()
+            try:
+                for name in names:
+                    if name == 'sqlite':
+                        target = Path(tmp) / 'ratelimit.sqlite3'
+                    elif name == 'redis':
+                        target = options['redis_url'] or redis_server.url
+                    else:
+                        target = None
+                    if not self.bench(name, target, options):
+                        failures.append(name)
+            finally:
+                if redis_server is not None:
+                    redis_server.stop()
+
+        if failures:
+            raise CommandError(f'Rate limit exceeded under contention: {", ".join(failures)}')
+
+    def bench(self, name, target, options):
+        backend = build_backend(name, target)
+        backend.clear()
+
+        # Single process: decisions/sec over many keys, never limited
+        hits, keys = options['hits'], max(1, options['keys'])
+        began = time.perf_counter()
+        for i in range(hits):
+            hit(f'bench:{i % keys}', hits, 3600, backend)
+        elapsed = time.perf_counter() - began
+        self.stdout.write(f'{name:<7} single process: {hits / elapsed:10.0f} decisions/sec ({elapsed * 1e6 / hits:.1f} us each)')
+
+        # Contention: every process hammers one shared key
+        processes, limit = options['processes'], options['limit']
+        per_process = limit * 3
+        key = f'contend:{uuid.uuid4().hex}'
+        ctx = multiprocessing.get_context('fork')
+        start, results = ctx.Event(), ctx.Queue()
+        workers = [
+            ctx.Process(target=contend, args=(name, target, key, per_process, limit, 3600, start, results))
+            for _ in range(processes)
+        ]
+        for worker in workers:
+            worker.start()
+        start.set()
+        outcomes = [results.get() for _ in workers]
+        for worker in workers:
+            worker.join()
+
+        allowed = sum(count for count, _ in outcomes)
+        rate = processes * per_process / max(seconds for _, seconds in outcomes)
+        shared = name != 'memory'
+        expected = limit if shared else limit * processes
+        ok = allowed == expected
+        style = self.style.SUCCESS if ok else self.style.ERROR
+        self.stdout.write(style(
+            f'{name:<7} {processes} processes: {rate:10.0f} decisions/sec, allowed {allowed}/{processes * per_process} '
+            f'(expected {expected}{"" if shared else ", counters are per process"})'
+        ))
+        return ok
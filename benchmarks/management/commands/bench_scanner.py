@@ -0,0 +1,79 @@
+import re
+from django.core.management.base import BaseCommand
+from main.scanner import ThreatScanner
+from main.timing import summarize, time_calls
+
+# The per-pattern loop security.validate_form_data used before main.scanner
+LEGACY_SQL_PATTERNS = [
+    r"(\%27)|(\')|(\-\-)|(\%23)|(#)",
+    r"((\%3D)|(=))[^\n]*((\%27)|(\')|(\-\-)|(\%3B)|(;))",
+    r"\w*((\%27)|(\'))((\%6F)|o|(\%4F))((\%72)|r|(\%52))",
+    r"((\%27)|(\'))union",
+    r"exec(\s|\+)+(s|x)p\w+",
+]
+LEGACY_XSS_PATTERNS = [
+    r"<script[^>]*>.*?</script>",
+    r"javascript:",
+    r"on\w+\s*=",
+    r"<iframe[^>]*>.*?</iframe>",
+    r"<object[^>]*>.*?</object>",
+    r"<embed[^>]*>.*?</embed>",
+    r"<applet[^>]*>.*?</applet>",
+]
+
+
+def legacy_scan(value):
+    for pattern in LEGACY_SQL_PATTERNS:
+        if re.search(pattern, value, re.IGNORECASE):
+            return 'sql'
+    for pattern in LEGACY_XSS_PATTERNS:
+        if re.search(pattern, value, re.IGNORECASE):
+            return 'xss'
+    return None
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the input threat scanner against the old per-pattern loop on large and adversarial inputs'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--size',
+            type=int,
+            default=20000,
+            help='Length of the large and adversarial inputs'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=20,
+            help='Scans per input'
+        )
+
+    def get_inputs(self, size):
+        sentence = 'Hello, we would like a quote for a new company website and mobile app. '
+        return [
+            ('short clean message', sentence * 4),
+            ('short attack', 'Nice site <script>alert(1)</script>'),
+            ('large clean text', (sentence * (size // len(sentence) + 1))[:size]),
+            ('repeated "=" without quote', '=' * size),
+            ('repeated "on" tokens', 'on' * (size // 2)),
+            ('unclosed <script', '<script ' + 'a' * (size - 8)),
+            ('unclosed <iframe', '<iframe ' + 'a' * (size - 8)),
+            ('attack at the very end', (sentence * (size // len(sentence)))[:size - 20] + "' OR 1=1 --"),
+        ]
+
+    def handle(self, *args, **options):
+        size, repeat = options['size'], options['repeat']
+        # Lift the length limit so both scanners see identical input
+        scanner = ThreatScanner(max_length=size * 2)
+
+        self.stdout.write(f'Scanning inputs of up to {size} characters, {repeat} times each')
+        for label, value in self.get_inputs(size):
+            # The old loop takes seconds on the adversarial inputs; time it once
+            legacy_repeat = 1 if len(value) > 1000 else repeat
+            legacy = time_calls(legacy_scan, [value], legacy_repeat)
+            current = time_calls(scanner.scan, [value], repeat)
+            result = scanner.scan(value)
+            self.stdout.write(self.style.SUCCESS(label))
+            self.stdout.write(f'  legacy  {summarize(legacy)}  -> {legacy_scan(value)}')
+            self.stdout.write(f'  scanner {summarize(current)}  -> {result.rule if result else None}')
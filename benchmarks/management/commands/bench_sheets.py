@@ -0,0 +1,114 @@
+import json
+import statistics
+import tempfile
+import time
+from pathlib import Path
+import gspread
+from oauth2client.service_account import ServiceAccountCredentials
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from main.google_sheets import SheetsHTTPClient, append_form_row, form_row, sheets_client, write_limiter
+from main.sheets_sync import SyncReport, sync_rows
+from ._fake_sheets import FakeSheetsServer, service_account_info
+
+SHEET_NAME = 'contact_messages'
+SHEET_NAMES = [SHEET_NAME, 'subscribers']
+
+class Command(BaseCommand):
+    help = 'Measure per-append Google Sheets latency against a local fake Sheets server'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows',
+            type=int,
+            default=50,
+            help='Rows appended by each client'
+        )
+        parser.add_argument(
+            '--latency',
+            type=float,
+            default=20.0,
+            help='Simulated network round trip per request, in milliseconds'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=100,
+            help='Rows per request for the batched sync'
+        )
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        server = FakeSheetsServer(SHEET_NAMES, latency=options['latency'] / 1000).start()
+
+        # Measure latency, not the write quota
+        rate, capacity = write_limiter.rate, write_limiter.capacity
+        write_limiter.rate = write_limiter.capacity = write_limiter.tokens = 1e9
+
+        try:
+            with tempfile.TemporaryDirectory() as tmp:
+                credentials_file = Path(tmp) / 'credentials.json'
+                credentials_file.write_text(json.dumps(service_account_info(f'{server.url}/token')))
+
+                with override_settings(
+                    GOOGLE_SHEETS_CREDENTIALS=credentials_file,
+                    GOOGLE_SHEET_ID='bench-sheet',
+                    GOOGLE_SHEETS_API_URL=f'{server.url}/v4/spreadsheets',
+                ):
+                    self.stdout.write(f'Appending {rows} rows per client, {options["latency"]:.0f} ms simulated latency')
+                    self.run_client(server, 'per-row authorize (old)', rows, self.legacy_append)
+                    sheets_client.invalidate(credentials=True)
+                    self.run_client(server, 'cached client', rows, self.cached_append)
+                    sheets_client.invalidate(credentials=True)
+                    self.run_batched(server, rows, options['chunk_size'])
+                    sheets_client.invalidate(credentials=True)
+        finally:
+            write_limiter.rate, write_limiter.capacity = rate, capacity
+            server.stop()
+
+    def legacy_append(self, data):
+        """The previous flow: load credentials, authorize and open the sheet for every row"""
+        credentials = ServiceAccountCredentials.from_json_keyfile_name(
+            str(settings.GOOGLE_SHEETS_CREDENTIALS),
+            ['https://spreadsheets.google.com/feeds', 'https://www.googleapis.com/auth/drive']
+        )
+        client = gspread.authorize(credentials, http_client=SheetsHTTPClient)
+        client.http_client.base_url = settings.GOOGLE_SHEETS_API_URL
+        worksheet = client.open_by_key(settings.GOOGLE_SHEET_ID).worksheet(SHEET_NAME)
+        worksheet.append_row([data['name'], data['email'], data['phone'], str(data)])
+
+    def cached_append(self, data):
+        append_form_row(SHEET_NAME, data)
+
+    def run_client(self, server, label, rows, append):
+        server.requests.clear()
+        timings = []
+        for i in range(rows):
+            data = {'name': f'Bench {i}', 'email': f'bench{i}@example.com', 'phone': '555-0100'}
+            start = time.perf_counter()
+            append(data)
+            timings.append((time.perf_counter() - start) * 1000)
+
+        p95 = statistics.quantiles(timings, n=20)[-1] if len(timings) > 1 else timings[0]
+        per_row = sum(server.requests.values()) / rows
+        self.stdout.write(self.style.SUCCESS(
+            f'{label:<26} mean {statistics.mean(timings):7.1f} ms  p50 {statistics.median(timings):7.1f} ms  '
+            f'p95 {p95:7.1f} ms  {per_row:.2f} requests/row '
+            f'({dict(server.requests)})'
+        ))
+
+    def run_batched(self, server, rows, chunk_size):
+        """Sync the same number of rows, spread over two worksheets, with sync_rows"""
+        server.requests.clear()
+        items = [
+            (i, SHEET_NAMES[i % 2], form_row({'name': f'Bench {i}', 'email': f'bench{i}@example.com'}))
+            for i in range(rows)
+        ]
+        report = SyncReport()
+        sync_rows(items, chunk_size=chunk_size, report=report)
+        per_row = report.elapsed * 1000 / rows
+        self.stdout.write(self.style.SUCCESS(
+            f'{"batched sync_rows":<26} {per_row:.1f} ms/row, {report.rows_per_sec:.0f} rows/sec, '
+            f'{sum(server.requests.values()) / rows:.2f} requests/row ({dict(server.requests)})'
+        ))
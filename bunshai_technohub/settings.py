@@ -39,17 +39,24 @@ INSTALLED_APPS = [
     'main',
 ]
 
+# Dev-only benchmark commands (manage.py bench_*), left out of production
+# unless ENABLE_BENCHMARKS=True
+if DEBUG or os.getenv('ENABLE_BENCHMARKS', 'False') == 'True':
+    INSTALLED_APPS.append('benchmarks')
+
 MIDDLEWARE = [
-    'django.middleware.security.SecurityMiddleware',
+    'main.middleware.BlocklistMiddleware',  # first: banned clients get nothing else
+    'main.middleware.SecurityHeadersMiddleware',  # extends django.middleware.security.SecurityMiddleware
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
+    'main.middleware.RateLimitMiddleware',  # must run before CsrfViewMiddleware
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'main.middleware.SecurityHeadersMiddleware',
+    'main.middleware.PageViewMiddleware',
 ]
 
 ROOT_URLCONF = 'bunshai_technohub.urls'
@@ -120,14 +127,55 @@ if not DEBUG:
     CSRF_COOKIE_SECURE = True
     X_FRAME_OPTIONS = 'DENY'
 
+# Content Security Policy and extra headers, set by main.middleware.SecurityHeadersMiddleware.
+# In DEBUG the policy is sent report-only, so violations show in the browser console.
+SECURITY_CSP = {
+    'default-src': ["'self'"],
+    'script-src': ["'self'", "'unsafe-inline'", 'https://www.google.com', 'https://www.gstatic.com',
+                   'https://www.recaptcha.net'],
+    'style-src': ["'self'", "'unsafe-inline'", 'https://cdnjs.cloudflare.com', 'https://fonts.googleapis.com'],
+    'img-src': ["'self'", 'data:', 'https:'],
+    'font-src': ["'self'", 'https://cdnjs.cloudflare.com', 'https://fonts.gstatic.com'],
+    'connect-src': ["'self'"],
+    'frame-src': ['https://www.google.com', 'https://www.recaptcha.net'],
+    'frame-ancestors': ["'none'"],
+    'base-uri': ["'self'"],
+    'form-action': ["'self'"],
+}
+SECURITY_CSP_REPORT_ONLY = DEBUG
+SECURITY_EXTRA_HEADERS = {'X-XSS-Protection': '1; mode=block'}
+# URL name -> {'csp': {directive: sources}, 'headers': {header: value}}; None removes
+SECURITY_HEADERS_ROUTES = {}
+
 # reCAPTCHA Settings - For django-recaptcha package
 RECAPTCHA_PUBLIC_KEY = os.getenv('RECAPTCHA_PUBLIC_KEY', '6Lf95TUsAAAAAHJ3XDyKOxnWRuKXga5KMMbFlhCt')
 RECAPTCHA_PRIVATE_KEY = os.getenv('RECAPTCHA_PRIVATE_KEY', '6Lf95TUsAAAAAIUjmT_m8AqPjCfty1t4kyn52m-p')
 RECAPTCHA_DOMAIN = 'www.recaptcha.net'
-SILENCED_SYSTEM_CHECKS = ['django_recaptcha.recaptcha_test_key_error']  # FIXED: Changed 'captcha.' to 'django_recaptcha.'
+SILENCED_SYSTEM_CHECKS = [
+    'django_recaptcha.recaptcha_test_key_error',  # FIXED: Changed 'captcha.' to 'django_recaptcha.'
+    'security.W001',  # SecurityMiddleware runs as its subclass main.middleware.SecurityHeadersMiddleware
+]
+
+# Text CAPTCHA (get_captcha / verify_captcha): 'signed' issues HMAC-signed tokens
+# and stores nothing per challenge; 'session' keeps the answer in the session
+CAPTCHA_MODE = os.getenv('CAPTCHA_MODE', 'signed')
+CAPTCHA_TTL = 600  # seconds a challenge stays valid
+# Single-use check for signed tokens: 'bloom' is per process, 'cache' uses the Django cache
+CAPTCHA_REPLAY_BACKEND = 'bloom'
+CAPTCHA_BLOOM_CAPACITY = 100000  # verified tokens per CAPTCHA_TTL before the filter rotates early
+CAPTCHA_BLOOM_ERROR_RATE = 1e-6
+# Signed mode serves pre-rendered images from a per-process pool (main.captcha_images)
+# instead of returning the text; a background thread refills it below the low-water mark
+CAPTCHA_IMAGES = os.getenv('CAPTCHA_IMAGES', 'True') == 'True'
+CAPTCHA_IMAGE_FORMAT = 'WEBP'  # or 'PNG'
+CAPTCHA_POOL_SIZE = 200
+CAPTCHA_POOL_LOW_WATER = 50
+CAPTCHA_POOL_RETRY_AFTER = 2  # seconds a client waits when a flood has emptied the pool (503)
+CAPTCHA_FONT_PATH = os.getenv('CAPTCHA_FONT_PATH', '/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf')
 
 # Email settings
-EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+# SMTP with pooled, reused connections (see main/mail.py)
+EMAIL_BACKEND = 'main.mail.PooledEmailBackend'
 EMAIL_HOST = 'smtp.gmail.com'
 EMAIL_PORT = 587
 EMAIL_USE_TLS = True
@@ -138,10 +186,117 @@ CONTACT_EMAIL = "contact@bunshaitechnohub.com"
 SUPPORT_EMAIL = "support@bunshaitechnohub.com"
 INFO_EMAIL = "info@bunshaitechnohub.com"
 ADMIN_EMAIL = "admin@bunshaitechnohub.com"
+EMAIL_TIMEOUT = 30
+EMAIL_POOL_SIZE = 2  # idle connections kept per worker process
+EMAIL_POOL_IDLE_TIMEOUT = 120  # close idle connections after this many seconds
+EMAIL_POOL_CHECK_AFTER = 10  # NOOP-probe connections idle longer than this
+
+# Outbox: email and Google Sheets work is queued and sent by `manage.py run_outbox`
+OUTBOX_MAX_ATTEMPTS = 6
+OUTBOX_BACKOFF_BASE = 30  # seconds before the first retry; doubles per attempt
+OUTBOX_BACKOFF_MAX = 3600
+OUTBOX_LOCK_TIMEOUT = 300  # a running job whose worker died is retried after this
 
 # Google Sheets Settings
 GOOGLE_SHEETS_CREDENTIALS = BASE_DIR / 'google_credentials.json'
 GOOGLE_SHEET_ID = os.getenv('GOOGLE_SHEET_ID', '')
+# Override the Sheets API base URL, e.g. a local fake server for benchmarks
+GOOGLE_SHEETS_API_URL = os.getenv('GOOGLE_SHEETS_API_URL', '')
+# Write quota per process (the API allows 60 write requests/minute per user)
+GOOGLE_SHEETS_WRITES_PER_MINUTE = int(os.getenv('GOOGLE_SHEETS_WRITES_PER_MINUTE', '60'))
+GOOGLE_SHEETS_WRITE_BURST = 10
+GOOGLE_SHEETS_CHUNK_SIZE = 500  # rows per append request when syncing in batches
+# `manage.py sync_unsynced` leaves rows this recent to the outbox
+GOOGLE_SHEETS_SYNC_GRACE = 600
+GOOGLE_SHEETS_SYNC_MAX_ATTEMPTS = 10  # failed rows are retried until this many attempts
+
+# Page view ingestion (buffered, flushed with bulk_create)
+PAGEVIEW_BATCH_SIZE = int(os.getenv('PAGEVIEW_BATCH_SIZE', '200'))
+PAGEVIEW_FLUSH_INTERVAL = float(os.getenv('PAGEVIEW_FLUSH_INTERVAL', '5'))
+# Loss budget: most unflushed views a worker may hold before dropping the oldest
+PAGEVIEW_MAX_PENDING = int(os.getenv('PAGEVIEW_MAX_PENDING', '10000'))
+# Tracked by main.middleware.PageViewMiddleware (empty include list = all paths)
+PAGEVIEW_INCLUDE_PATHS = []
+PAGEVIEW_EXCLUDE_PATHS = ['/admin/', '/api/', '/static/', '/media/', '/robots.txt', '/sitemap', '/favicon.ico',
+                          '/get-captcha/', '/verify-captcha/']
+PAGEVIEW_SAMPLE_RATE = float(os.getenv('PAGEVIEW_SAMPLE_RATE', '1.0'))
+PAGEVIEW_BOT_SAMPLE_RATE = float(os.getenv('PAGEVIEW_BOT_SAMPLE_RATE', '0.1'))
+
+# Rate limiting (main.ratelimit): 'memory' is per process, 'sqlite' is shared by
+# the workers on one host, 'redis' is shared by every host
+RATELIMIT_BACKEND = os.getenv('RATELIMIT_BACKEND', 'sqlite')
+RATELIMIT_SQLITE_PATH = Path(os.getenv('RATELIMIT_SQLITE_PATH', BASE_DIR / 'ratelimit.sqlite3'))
+RATELIMIT_REDIS_URL = os.getenv('RATELIMIT_REDIS_URL', 'redis://127.0.0.1:6379/0')
+# URL name -> rules, applied by main.middleware.RateLimitMiddleware (POST only
+# unless 'methods' says otherwise); see main.ratelimit for the rule format
+RATELIMIT_POLICIES = {
+    'contact': {'rules': ['ip:5/m', 'ip:20/h', 'email:5/h']},
+    'subscribe': {'rules': ['ip:5/m', 'ip:30/h', 'email:3/h']},
+    'proposal_request': {'rules': ['ip:3/m', 'ip:10/h', 'email:5/h']},
+    'career': {'rules': ['ip:3/m', 'ip:10/h']},
+    'get_captcha': {'methods': ['GET'], 'rules': ['session:20/m', 'ip:60/m']},
+    'verify_captcha': {'rules': ['session:20/m', 'ip:60/m']},
+    'chatbot_start_session': {'rules': ['ip:10/m', 'ip:50/h', 'email:10/h']},
+    'chatbot_send_message': {'rules': ['session:30/m', 'ip:60/m', 'ip:600/h']},
+}
+
+# Input threat scanner (main.scanner): longer values are rejected outright
+SCANNER_MAX_LENGTH = 20000
+SCANNER_TIME_BUDGET_MS = 50
+
+# Client reputation (main.reputation): known crawler and abuse networks, one
+# '<cidr> <kind>[:<name>]' per line
+REPUTATION_NETWORK_FILES = [BASE_DIR / 'main' / 'data' / 'networks.txt']
+REPUTATION_CACHE_SIZE = 10000  # recent (ip, user agent) verdicts kept per process
+
+# IP blocklist (main.blocklist): clients whose SecurityLog events of a type
+# reach 'threshold' within 'window' seconds are banned for 'ban' seconds.
+# Only types something logs belong here: 'bruteforce' is a rate limit
+# rejection (main.ratelimit), 'spam' a submission scored as spam (main.signals)
+BLOCKLIST_RULES = {
+    'bruteforce': {'threshold': 20, 'window': 600, 'ban': 3600},
+    'spam': {'threshold': 5, 'window': 3600, 'ban': 86400},
+}
+BLOCKLIST_NETWORKS = []  # CIDRs banned permanently
+BLOCKLIST_EXEMPT = ['127.0.0.0/8', '::1/128']  # never banned (known crawler networks are exempt too)
+BLOCKLIST_IPV6_PREFIX = 64  # IPv6 bans cover the client's whole /64
+BLOCKLIST_REFRESH_INTERVAL = 30  # seconds between incremental reads of SecurityLog
+
+# Security log writes (main.security_events): buffered, and identical
+# (type, ip, details template) events within a flush window share one row
+SECURITYLOG_FLUSH_INTERVAL = float(os.getenv('SECURITYLOG_FLUSH_INTERVAL', '10'))
+SECURITYLOG_BATCH_SIZE = 500  # distinct pending events that trigger an early flush
+# Loss budget: most distinct unflushed events a worker may hold before dropping the oldest
+SECURITYLOG_MAX_PENDING = int(os.getenv('SECURITYLOG_MAX_PENDING', '5000'))
+
+# Chatbot (main.chatbot_ai): intents, keywords and responses live in this file;
+# workers pick up an edited file within CHATBOT_KB_CHECK_INTERVAL seconds
+CHATBOT_KB_PATH = BASE_DIR / 'main' / 'data' / 'chatbot.json'
+CHATBOT_KB_CHECK_INTERVAL = 5
+# Messages no intent matches are answered from the site's pages via a BM25
+# index written by `manage.py build_chatbot_index` (no index: default reply)
+CHATBOT_INDEX_PATH = Path(os.getenv('CHATBOT_INDEX_PATH', BASE_DIR / 'chatbot_index.bin'))
+CHATBOT_INDEX_CHECK_INTERVAL = 60  # seconds between checks for a rebuilt index
+CHATBOT_RETRIEVAL_MIN_SCORE = 3.0  # best passage's BM25 score needed to answer with it
+# Conversations (main.chatbot_sessions): active sessions are cached per worker
+# and messages written in batches, so a chat turn makes no database queries
+CHATBOT_SESSION_CACHE_SIZE = 10000  # conversations kept per worker, least recently used evicted
+CHATBOT_SESSION_TTL = 1800  # seconds idle before a conversation is reloaded from the database
+CHATBOT_MESSAGE_BATCH_SIZE = 200
+CHATBOT_MESSAGE_FLUSH_INTERVAL = float(os.getenv('CHATBOT_MESSAGE_FLUSH_INTERVAL', '2'))
+# Loss budget: most unflushed messages a worker may hold before dropping the oldest
+CHATBOT_MESSAGE_MAX_PENDING = int(os.getenv('CHATBOT_MESSAGE_MAX_PENDING', '10000'))
+
+# Spam filter (main.spam): submissions scoring at or above the threshold are
+# flagged. `manage.py train_spam_model` writes the model from admin labels.
+SPAM_THRESHOLD = 0.9
+SPAM_MODEL_PATH = Path(os.getenv('SPAM_MODEL_PATH', BASE_DIR / 'spam_model.json'))
+SPAM_MODEL_CHECK_INTERVAL = 60  # seconds between checks for a retrained model
+
+# Log retention: `manage.py archive_logs` moves older rows into LOG_ARCHIVE_DIR
+PAGEVIEW_RETENTION_DAYS = int(os.getenv('PAGEVIEW_RETENTION_DAYS', '90'))
+SECURITYLOG_RETENTION_DAYS = int(os.getenv('SECURITYLOG_RETENTION_DAYS', '180'))
+LOG_ARCHIVE_DIR = Path(os.getenv('LOG_ARCHIVE_DIR', BASE_DIR / 'archive'))
 
 # ===== SITE CUSTOM SETTINGS =====
 SITE_NAME = "BunShai TECHNOHUB"
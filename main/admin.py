@@ -4,8 +4,13 @@ from django.utils.html import format_html
 from django.urls import path
 from django.shortcuts import render
 from django.utils import timezone
-from datetime import timedelta
+from django.db.models import Sum
+from datetime import datetime, time, timedelta
 from .models import *
+from .rollups import HyperLogLog
+from .outbox import retry_dead
+from .chatbot_sessions import chatbot_stats
+from .pageviews import page_view_stats
 
 # Unregister default Group
 admin.site.unregister(Group)
@@ -26,12 +31,25 @@ class BaseAdmin(admin.ModelAdmin):
     def has_delete_permission(self, request, obj=None):
         return request.user.is_superuser
 
+class SpamReviewMixin:
+    """Spam labelling actions; reviewed labels are what train_spam_model learns from"""
+    
+    def mark_as_spam(self, request, queryset):
+        updated = queryset.update(is_spam=True, spam_reviewed=True)
+        self.message_user(request, f'{updated} submissions marked as spam.')
+    mark_as_spam.short_description = "Mark selected as spam"
+    
+    def mark_as_not_spam(self, request, queryset):
+        updated = queryset.update(is_spam=False, spam_reviewed=True)
+        self.message_user(request, f'{updated} submissions marked as not spam.')
+    mark_as_not_spam.short_description = "Mark selected as not spam"
+
 @admin.register(ContactMessage)
-class ContactMessageAdmin(BaseAdmin):
+class ContactMessageAdmin(SpamReviewMixin, BaseAdmin):
     list_display = ('name', 'email', 'phone', 'is_spam', 'is_verified', 'date_sent', 'ip_address')
-    list_filter = ('is_spam', 'is_verified', 'date_sent')
+    list_filter = ('is_spam', 'is_verified', 'date_sent', 'sync_status')
     search_fields = ('name', 'email', 'message')
-    readonly_fields = ('date_sent', 'ip_address', 'user_agent', 'verification_token')
+    readonly_fields = ('date_sent', 'ip_address', 'user_agent', 'verification_token', 'spam_score')
     fieldsets = (
         ('Contact Information', {
             'fields': ('name', 'email', 'phone')
@@ -40,25 +58,20 @@ class ContactMessageAdmin(BaseAdmin):
             'fields': ('message',)
         }),
         ('Status', {
-            'fields': ('is_verified', 'is_spam')
+            'fields': ('is_verified', 'is_spam', 'spam_score')
         }),
         ('Technical Information', {
             'fields': ('date_sent', 'ip_address', 'user_agent', 'verification_token'),
             'classes': ('collapse',)
         }),
     )
-    actions = ['mark_as_verified', 'mark_as_spam', 'export_selected']
+    actions = ['mark_as_verified', 'mark_as_spam', 'mark_as_not_spam', 'export_selected']
     
     def mark_as_verified(self, request, queryset):
         updated = queryset.update(is_verified=True)
         self.message_user(request, f'{updated} messages marked as verified.')
     mark_as_verified.short_description = "Mark selected as verified"
     
-    def mark_as_spam(self, request, queryset):
-        updated = queryset.update(is_spam=True)
-        self.message_user(request, f'{updated} messages marked as spam.')
-    mark_as_spam.short_description = "Mark selected as spam"
-    
     def export_selected(self, request, queryset):
         import csv
         from django.http import HttpResponse
@@ -79,9 +92,9 @@ class ContactMessageAdmin(BaseAdmin):
     export_selected.short_description = "Export selected to CSV"
 
 @admin.register(Subscriber)
-class SubscriberAdmin(BaseAdmin):
-    list_display = ('email', 'is_active', 'is_verified', 'subscribed_at', 'ip_address')
-    list_filter = ('is_active', 'is_verified', 'subscribed_at')
+class SubscriberAdmin(SpamReviewMixin, BaseAdmin):
+    list_display = ('email', 'is_active', 'is_verified', 'is_spam', 'subscribed_at', 'ip_address')
+    list_filter = ('is_active', 'is_verified', 'is_spam', 'subscribed_at', 'sync_status')
     search_fields = ('email',)
     readonly_fields = ('subscribed_at', 'ip_address', 'verification_token')
     fieldsets = (
@@ -93,7 +106,7 @@ class SubscriberAdmin(BaseAdmin):
             'classes': ('collapse',)
         }),
     )
-    actions = ['activate_subscribers', 'deactivate_subscribers', 'export_emails']
+    actions = ['activate_subscribers', 'deactivate_subscribers', 'mark_as_spam', 'mark_as_not_spam', 'export_emails']
     
     def export_emails(self, request, queryset):
         emails = '\n'.join([sub.email for sub in queryset])
@@ -103,9 +116,9 @@ class SubscriberAdmin(BaseAdmin):
     export_emails.short_description = "Export emails to text file"
 
 @admin.register(ServiceInquiry)
-class ServiceInquiryAdmin(BaseAdmin):
-    list_display = ('name', 'email', 'service', 'company', 'created_at', 'ip_address')
-    list_filter = ('service', 'created_at')
+class ServiceInquiryAdmin(SpamReviewMixin, BaseAdmin):
+    list_display = ('name', 'email', 'service', 'company', 'is_spam', 'created_at', 'ip_address')
+    list_filter = ('service', 'is_spam', 'created_at', 'sync_status')
     search_fields = ('name', 'email', 'company', 'message')
     readonly_fields = ('created_at', 'ip_address')
     fieldsets = (
@@ -120,12 +133,13 @@ class ServiceInquiryAdmin(BaseAdmin):
             'classes': ('collapse',)
         }),
     )
+    actions = ['mark_as_spam', 'mark_as_not_spam']
     date_hierarchy = 'created_at'
 
 @admin.register(ProposalRequest)
-class ProposalRequestAdmin(BaseAdmin):
-    list_display = ('name', 'email', 'service', 'budget', 'created_at', 'ip_address')
-    list_filter = ('service', 'budget', 'created_at')
+class ProposalRequestAdmin(SpamReviewMixin, BaseAdmin):
+    list_display = ('name', 'email', 'service', 'budget', 'is_spam', 'created_at', 'ip_address')
+    list_filter = ('service', 'budget', 'is_spam', 'created_at', 'sync_status')
     search_fields = ('name', 'email', 'requirements')
     readonly_fields = ('created_at', 'ip_address')
     fieldsets = (
@@ -140,12 +154,13 @@ class ProposalRequestAdmin(BaseAdmin):
             'classes': ('collapse',)
         }),
     )
+    actions = ['mark_as_spam', 'mark_as_not_spam']
     date_hierarchy = 'created_at'
 
 @admin.register(CareerApplication)
-class CareerApplicationAdmin(BaseAdmin):
-    list_display = ('name', 'email', 'position', 'applied_at', 'resume_link', 'ip_address')
-    list_filter = ('position', 'applied_at')
+class CareerApplicationAdmin(SpamReviewMixin, BaseAdmin):
+    list_display = ('name', 'email', 'position', 'is_spam', 'applied_at', 'resume_link', 'ip_address')
+    list_filter = ('position', 'is_spam', 'applied_at', 'sync_status')
     search_fields = ('name', 'email', 'cover_letter')
     readonly_fields = ('applied_at', 'ip_address', 'resume_preview')
     fieldsets = (
@@ -160,6 +175,7 @@ class CareerApplicationAdmin(BaseAdmin):
             'classes': ('collapse',)
         }),
     )
+    actions = ['mark_as_spam', 'mark_as_not_spam']
     
     def resume_link(self, obj):
         if obj.resume:
@@ -204,13 +220,13 @@ class PageViewAdmin(BaseAdmin):
 
 @admin.register(SecurityLog)
 class SecurityLogAdmin(BaseAdmin):
-    list_display = ('event_type', 'ip_address', 'created_at', 'details_short')
+    list_display = ('event_type', 'ip_address', 'count', 'created_at', 'details_short')
     list_filter = ('event_type', 'created_at')
     search_fields = ('ip_address', 'details')
-    readonly_fields = ('created_at', 'ip_address', 'user_agent', 'details')
+    readonly_fields = ('created_at', 'ip_address', 'user_agent', 'details', 'count')
     fieldsets = (
         ('Security Event', {
-            'fields': ('event_type', 'details')
+            'fields': ('event_type', 'details', 'count')
         }),
         ('Technical Information', {
             'fields': ('created_at', 'ip_address', 'user_agent'),
@@ -258,6 +274,28 @@ class ChatbotMessageAdmin(BaseAdmin):
     
     date_hierarchy = 'created_at'
 
+@admin.register(OutboundJob)
+class OutboundJobAdmin(BaseAdmin):
+    list_display = ('kind', 'status', 'attempts', 'max_attempts', 'run_after', 'created_at', 'error_short')
+    list_filter = ('status', 'kind', 'created_at')
+    search_fields = ('kind', 'last_error')
+    readonly_fields = ('kind', 'payload', 'attempts', 'locked_until', 'last_error', 'created_at', 'updated_at')
+    actions = ['retry_jobs']
+    
+    def error_short(self, obj):
+        return obj.last_error[:100] + '...' if len(obj.last_error) > 100 else obj.last_error
+    error_short.short_description = "Last Error"
+    
+    def retry_jobs(self, request, queryset):
+        updated = retry_dead(queryset)
+        self.message_user(request, f'{updated} dead-lettered jobs queued for retry.')
+    retry_jobs.short_description = "Retry selected dead-lettered jobs"
+    
+    date_hierarchy = 'created_at'
+    
+    def has_add_permission(self, request):
+        return False
+
 # Custom Admin Site
 class CustomAdminSite(admin.AdminSite):
     site_header = '🚀 BunShai TECHNOHUB Admin'
@@ -276,6 +314,9 @@ class CustomAdminSite(admin.AdminSite):
     
     def dashboard_view(self, request):
         thirty_days_ago = timezone.now() - timedelta(days=30)
+        today = PageViewDaily.objects.filter(date=timezone.localdate()).first()
+        # Range filter rather than created_at__date so the created_at index is usable
+        start_of_day = timezone.make_aware(datetime.combine(timezone.localdate(), time.min))
         
         context = {
             'title': 'Dashboard',
@@ -289,17 +330,45 @@ class CustomAdminSite(admin.AdminSite):
             'recent_proposals': ProposalRequest.objects.filter(created_at__gte=thirty_days_ago).count(),
             'total_applications': CareerApplication.objects.count(),
             'recent_applications': CareerApplication.objects.filter(applied_at__gte=thirty_days_ago).count(),
-            'page_views_today': PageView.objects.filter(viewed_at__date=timezone.now().date()).count(),
+            'page_views_today': today.views if today else 0,
+            'unique_visitors_today': today.unique_visitors if today else 0,
             'total_chatbot_sessions': ChatbotSession.objects.count(),
             'recent_chatbot_sessions': ChatbotSession.objects.filter(last_activity__gte=thirty_days_ago).count(),
-            'security_events_today': SecurityLog.objects.filter(created_at__date=timezone.now().date()).count(),
+            'security_events_today': SecurityLog.objects.filter(
+                created_at__gte=start_of_day).aggregate(total=Sum('count'))['total'] or 0,
+            'page_view_buffer': page_view_stats(),
+            'chatbot': chatbot_stats(),
         }
         
         return render(request, 'admin/dashboard.html', context)
     
     def analytics_view(self, request):
-        # Analytics data
-        return render(request, 'admin/analytics.html', {'title': 'Analytics'})
+        # Reads only the rollup tables: O(days) rows, never the raw PageView table
+        days = 30
+        start_date = timezone.localdate() - timedelta(days=days - 1)
+        start = timezone.make_aware(datetime.combine(start_date, time.min))
+        
+        daily = list(PageViewDaily.objects.filter(date__gte=start_date).order_by('date'))
+        top_pages = (PageViewHourly.objects.filter(hour__gte=start)
+                     .values('page_url').annotate(total=Sum('views')).order_by('-total')[:20])
+        top_referrers = (ReferrerDaily.objects.filter(date__gte=start_date)
+                         .values('referrer_host').annotate(total=Sum('views')).order_by('-total')[:20])
+        
+        # Visitors across the whole period come from merging the daily sketches
+        period_visitors = HyperLogLog()
+        for row in daily:
+            period_visitors.merge(HyperLogLog(row.visitor_sketch))
+        
+        context = {
+            'title': 'Analytics',
+            'days': days,
+            'daily': daily,
+            'total_views': sum(row.views for row in daily),
+            'unique_visitors': period_visitors.count() if daily else 0,
+            'top_pages': top_pages,
+            'top_referrers': top_referrers,
+        }
+        return render(request, 'admin/analytics.html', context)
     
     def export_data_view(self, request):
         # Data export interface
@@ -317,4 +386,5 @@ custom_admin_site.register(CareerApplication, CareerApplicationAdmin)
 custom_admin_site.register(PageView, PageViewAdmin)
 custom_admin_site.register(SecurityLog, SecurityLogAdmin)
 custom_admin_site.register(ChatbotSession, ChatbotSessionAdmin)
-custom_admin_site.register(ChatbotMessage, ChatbotMessageAdmin)
\ No newline at end of file
+custom_admin_site.register(ChatbotMessage, ChatbotMessageAdmin)
+custom_admin_site.register(OutboundJob, OutboundJobAdmin)
\ No newline at end of file
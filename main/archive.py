@@ -0,0 +1,141 @@
+import gzip
+import json
+import logging
+import os
+from datetime import date, datetime, time, timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import PageView, SecurityLog
+
+logger = logging.getLogger(__name__)
+
+# name -> (model, timestamp field, retention setting, default retention in days)
+ARCHIVED_MODELS = {
+    'pageviews': (PageView, 'viewed_at', 'PAGEVIEW_RETENTION_DAYS', 90),
+    'securitylogs': (SecurityLog, 'created_at', 'SECURITYLOG_RETENTION_DAYS', 180),
+}
+
+
+def archive_root():
+    return Path(getattr(settings, 'LOG_ARCHIVE_DIR', Path(settings.BASE_DIR) / 'archive'))
+
+
+def retention_days(name):
+    _, _, setting, default = ARCHIVED_MODELS[name]
+    return getattr(settings, setting, default)
+
+
+def cutoff_for(days):
+    """Start of the local day ``days`` days ago; rows older than this are expired"""
+    cutoff_date = timezone.localdate() - timedelta(days=days)
+    return timezone.make_aware(datetime.combine(cutoff_date, time.min))
+
+
+def partition_path(name, day):
+    """One gzip'd JSONL file per model per local day: <root>/<name>/YYYY/MM/YYYY-MM-DD.jsonl.gz"""
+    return archive_root() / name / f'{day:%Y}' / f'{day:%m}' / f'{day:%Y-%m-%d}.jsonl.gz'
+
+
+def _write_partitions(name, rows, ts_field):
+    by_day = {}
+    for row in rows:
+        day = timezone.localtime(row[ts_field]).date()
+        by_day.setdefault(day, []).append(row)
+
+    for day, day_rows in by_day.items():
+        path = partition_path(name, day)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Appending adds a new gzip member; gzip.open reads all members back
+        with open(path, 'ab') as raw:
+            with gzip.GzipFile(fileobj=raw, mode='wb') as gz:
+                for row in day_rows:
+                    gz.write(json.dumps(row, cls=DjangoJSONEncoder).encode() + b'\n')
+            raw.flush()
+            os.fsync(raw.fileno())
+
+
+def _delete_expired(name, cutoff, chunk_size, sink=None):
+    """
+    Delete rows older than ``cutoff`` oldest first, ``chunk_size`` rows per
+    transaction so no lock is held for long. Each chunk is passed to
+    ``sink`` before it is deleted.
+    """
+    model, ts_field, _, _ = ARCHIVED_MODELS[name]
+    queryset = model.objects.filter(**{f'{ts_field}__lt': cutoff}).order_by(ts_field)
+    deleted = 0
+    while True:
+        with transaction.atomic():
+            if sink is None:
+                rows = list(queryset.values('id')[:chunk_size])
+            else:
+                rows = list(queryset.values()[:chunk_size])
+            if not rows:
+                return deleted
+            if sink is not None:
+                sink(rows)
+            model.objects.filter(pk__in=[row['id'] for row in rows]).delete()
+        deleted += len(rows)
+
+
+def archive_expired(name, days=None, chunk_size=1000, dry_run=False):
+    """
+    Move rows older than ``days`` into the archive and delete them from the
+    database. Archive files are written and synced before the rows are
+    deleted, so a crash can only duplicate rows in the archive (iter_archive
+    drops duplicates), never lose them.
+    """
+    model, ts_field, _, _ = ARCHIVED_MODELS[name]
+    cutoff = cutoff_for(retention_days(name) if days is None else days)
+    if dry_run:
+        return model.objects.filter(**{f'{ts_field}__lt': cutoff}).count()
+
+    archived = _delete_expired(name, cutoff, chunk_size,
+                               sink=lambda rows: _write_partitions(name, rows, ts_field))
+    logger.info(f'Archived {archived} {name} rows older than {cutoff}')
+    return archived
+
+
+def prune_expired(name, days=None, chunk_size=1000, dry_run=False):
+    """Delete rows older than ``days`` without archiving them"""
+    model, ts_field, _, _ = ARCHIVED_MODELS[name]
+    cutoff = cutoff_for(retention_days(name) if days is None else days)
+    if dry_run:
+        return model.objects.filter(**{f'{ts_field}__lt': cutoff}).count()
+
+    pruned = _delete_expired(name, cutoff, chunk_size)
+    logger.info(f'Pruned {pruned} {name} rows older than {cutoff}')
+    return pruned
+
+
+def archived_days(name, start=None, end=None):
+    """Dates that have an archive partition, optionally limited to [start, end]"""
+    days = []
+    for path in sorted((archive_root() / name).glob('*/*/*.jsonl.gz')):
+        day = date.fromisoformat(path.name[:10])
+        if (start is None or day >= start) and (end is None or day <= end):
+            days.append(day)
+    return days
+
+
+def iter_archive(name, start=None, end=None):
+    """
+    Yield archived rows as dicts for the local dates [start, end], oldest
+    partition first. Timestamps are parsed back into datetimes.
+    """
+    _, ts_field, _, _ = ARCHIVED_MODELS[name]
+    for day in archived_days(name, start, end):
+        seen = set()
+        with gzip.open(partition_path(name, day), 'rt') as f:
+            for line in f:
+                row = json.loads(line)
+                if row['id'] in seen:
+                    continue
+                seen.add(row['id'])
+                row[ts_field] = parse_datetime(row[ts_field])
+                yield row
@@ -0,0 +1,331 @@
+import ipaddress
+import logging
+import math
+import os
+import socket
+import sys
+import threading
+import time
+from array import array
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Max, Sum
+from django.utils import timezone
+
+from .models import SecurityLog
+from .reputation import get_reputation_index
+
+logger = logging.getLogger(__name__)
+
+# SecurityLog rows can be written up to a flush interval after their event
+# (see main.security_events), so each refresh re-reads this much before the cursor
+CURSOR_OVERLAP = timedelta(seconds=30)
+
+
+class PrefixTrie:
+    """
+    Path-compressed binary trie (a PATRICIA trie) of CIDR prefixes for one
+    address family. Each node holds the leading bits it stands for, so n
+    prefixes need at most 2n nodes whatever their length, and a lookup
+    visits only the branching points on the address's path: at most
+    ``bits`` steps, about log2(n) in practice. Nodes live in flat arrays
+    indexed by node number rather than as one Python object each.
+
+    Lookups do not lock: a node is complete before anything links to it,
+    and a node's value is set before it is marked, so a concurrent insert
+    is seen whole or not at all.
+    """
+    def __init__(self, bits):
+        self.bits = bits
+        self.prefix = [0]  # the node's leading ``length`` bits, as an int
+        self.length = array('B', [0])
+        self.zero = array('I', [0])
+        self.one = array('I', [0])
+        self.marked = bytearray(1)
+        self.values = {}
+
+    def __len__(self):
+        return len(self.values)
+
+    def _new(self, prefix, length):
+        self.prefix.append(prefix)
+        self.length.append(length)
+        self.zero.append(0)
+        self.one.append(0)
+        self.marked.append(0)
+        return len(self.marked) - 1
+
+    def _link(self, parent, child):
+        # The child goes on the side of its first bit after the parent's prefix
+        shift = self.length[child] - self.length[parent] - 1
+        children = self.one if self.prefix[child] >> shift & 1 else self.zero
+        children[parent] = child
+
+    def _node(self, value, prefixlen, create):
+        """Node for the ``prefixlen``-bit prefix of ``value``, split in if ``create``"""
+        key = value >> (self.bits - prefixlen)
+        node = 0
+        while self.length[node] < prefixlen:
+            length = self.length[node]
+            children = self.one if key >> (prefixlen - length - 1) & 1 else self.zero
+            child = children[node]
+            if not child:
+                if not create:
+                    return None
+                child = self._new(key, prefixlen)
+                children[node] = child
+                return child
+            child_prefix, child_length = self.prefix[child], self.length[child]
+            common = min(child_length, prefixlen)
+            diff = (key >> (prefixlen - common)) ^ (child_prefix >> (child_length - common))
+            if not diff and child_length <= prefixlen:
+                node = child
+                continue
+            if not create:
+                return None
+            # Insert a node between ``node`` and ``child``: the new prefix
+            # itself if it contains the child, else their common ancestor
+            common -= diff.bit_length()
+            middle = self._new(key >> (prefixlen - common), common)
+            self._link(middle, child)
+            if common < prefixlen:
+                self._link(middle, self._new(key, prefixlen))
+            children[node] = middle
+            return self._node(value, prefixlen, False)
+        return node
+
+    def insert(self, value, prefixlen, item):
+        node = self._node(value, prefixlen, True)
+        self.values[node] = item
+        self.marked[node] = 1
+
+    def remove(self, value, prefixlen):
+        # The nodes stay; only the mark goes
+        node = self._node(value, prefixlen, False)
+        if node is not None and self.marked[node]:
+            self.marked[node] = 0
+            del self.values[node]
+
+    def matches(self, value):
+        """Items of every prefix containing ``value``, shortest prefix first"""
+        bits, prefix, length, zero, one, marked = self.bits, self.prefix, self.length, self.zero, self.one, self.marked
+        found = []
+        node = 0
+        while True:
+            if marked[node]:
+                found.append(self.values[node])
+            node_length = length[node]
+            if node_length == bits:
+                return found
+            node = (one if value >> (bits - node_length - 1) & 1 else zero)[node]
+            if not node or value >> (bits - length[node]) != prefix[node]:
+                return found
+
+    def memory(self):
+        size = len(self.marked)
+        return size * (self.zero.itemsize * 2 + 2) + sum(sys.getsizeof(p) for p in self.prefix)
+
+
+class Ban:
+    __slots__ = ('network', 'expires', 'reason')
+
+    def __init__(self, network, expires, reason):
+        self.network = network
+        self.expires = expires
+        self.reason = reason
+
+    def __repr__(self):
+        return f'<Ban {self.network} until {self.expires} ({self.reason})>'
+
+
+def _address(ip):
+    """(version, integer value) of an address string, or None; IPv4-mapped IPv6 counts as IPv4"""
+    try:
+        if ':' not in ip:
+            return 4, int.from_bytes(socket.inet_pton(socket.AF_INET, ip), 'big')
+        value = int.from_bytes(socket.inet_pton(socket.AF_INET6, ip.split('%', 1)[0]), 'big')
+    except (OSError, ValueError):
+        return None
+    if value >> 32 == 0xffff:
+        return 4, value & 0xffffffff
+    return 6, value
+
+
+class Blocklist:
+    """
+    Temporary IP bans derived from SecurityLog, held in one PrefixTrie per
+    address family. ``rules`` maps an event type to {'threshold', 'window',
+    'ban'}: an IP with ``threshold`` events of that type (by SecurityLog.count)
+    within ``window`` seconds is banned for ``ban`` seconds. IPv6 bans cover
+    the client's whole /``ipv6_prefix``, since one host usually holds a /64.
+    ``networks`` are banned permanently; ``exempt`` networks and known
+    crawler networks (main.reputation) are never banned.
+
+    refresh() reads only the log rows written since the previous refresh,
+    and re-counts only the IPs that appear in them. It runs every
+    ``refresh_interval`` seconds on a background thread (see start()), so
+    requests never wait on the SecurityLog queries. Per process.
+    """
+    def __init__(self, rules, networks=(), exempt=(), ipv6_prefix=64, refresh_interval=30):
+        self.rules = rules
+        self.ipv6_prefix = ipv6_prefix
+        self.refresh_interval = refresh_interval
+        self.tries = {4: PrefixTrie(32), 6: PrefixTrie(128)}
+        self.exempt = {4: PrefixTrie(32), 6: PrefixTrie(128)}
+        self.bans = {}
+        self.removed = 0
+        self.cursor = None
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = os.getpid()
+        self.counters = {'blocked': 0, 'banned': 0, 'expired': 0, 'refreshes': 0, 'refresh_errors': 0}
+        for network in exempt:
+            network = ipaddress.ip_network(network, strict=False)
+            self.exempt[network.version].insert(int(network.network_address), network.prefixlen, True)
+        for network in networks:
+            self.ban(ipaddress.ip_network(network, strict=False), math.inf, 'listed in BLOCKLIST_NETWORKS')
+
+    def network_for(self, version, value):
+        if version == 6:
+            shift = 128 - self.ipv6_prefix
+            return ipaddress.IPv6Network((value >> shift << shift, self.ipv6_prefix))
+        return ipaddress.IPv4Network(value)
+
+    def is_exempt(self, version, value):
+        if self.exempt[version].matches(value):
+            return True
+        address = ipaddress.IPv6Address(value) if version == 6 else ipaddress.IPv4Address(value)
+        network = get_reputation_index().networks.lookup(str(address))
+        return bool(network) and network.startswith('crawler')
+
+    def ban(self, network, expires, reason):
+        """Ban ``network`` until ``expires`` (a time.time() value); an existing longer ban is kept"""
+        current = self.bans.get(network)
+        if current is not None and current.expires >= expires:
+            return current
+        ban = Ban(network, expires, reason)
+        self.bans[network] = ban
+        self.tries[network.version].insert(int(network.network_address), network.prefixlen, ban)
+        if current is None:
+            self.counters['banned'] += 1
+        return ban
+
+    def check(self, ip, now=None):
+        """The active Ban covering ``ip``, or None"""
+        address = _address(ip) if ip else None
+        if address is None:
+            return None
+        version, value = address
+        now = now or time.time()
+        for ban in self.tries[version].matches(value):
+            if ban.expires > now:
+                self.counters['blocked'] += 1
+                return ban
+        return None
+
+    def expire(self, now=None):
+        now = now or time.time()
+        expired = [ban for ban in self.bans.values() if ban.expires <= now]
+        for ban in expired:
+            del self.bans[ban.network]
+            self.tries[ban.network.version].remove(int(ban.network.network_address), ban.network.prefixlen)
+        self.counters['expired'] += len(expired)
+        self.removed += len(expired)
+        if self.removed > 1000 and self.removed > len(self.bans):
+            # Removed bans leave their nodes behind; rebuild once they dominate
+            tries = {4: PrefixTrie(32), 6: PrefixTrie(128)}
+            for network, ban in self.bans.items():
+                tries[network.version].insert(int(network.network_address), network.prefixlen, ban)
+            self.tries = tries
+            self.removed = 0
+
+    def refresh(self):
+        """Ban IPs that crossed a rule threshold since the last refresh. Returns the number of new bans"""
+        if not self.rules:
+            return 0
+        now = timezone.now()
+        if self.cursor is None:
+            since = now - timedelta(seconds=max(rule['window'] for rule in self.rules.values()))
+        else:
+            since = self.cursor - CURSOR_OVERLAP
+        recent = SecurityLog.objects.filter(created_at__gte=since, event_type__in=list(self.rules))
+        touched = {}
+        for event_type, ip in recent.values_list('event_type', 'ip_address').distinct().iterator():
+            touched.setdefault(event_type, set()).add(ip)
+        latest = recent.aggregate(latest=Max('created_at'))['latest']
+        if latest is not None:
+            self.cursor = max(self.cursor, latest) if self.cursor else latest
+
+        before = self.counters['banned']
+        for event_type, ips in touched.items():
+            rule = self.rules[event_type]
+            ips = sorted(ips)
+            for i in range(0, len(ips), 500):
+                totals = (SecurityLog.objects
+                          .filter(event_type=event_type, ip_address__in=ips[i:i + 500],
+                                  created_at__gte=now - timedelta(seconds=rule['window']))
+                          .values('ip_address').annotate(total=Sum('count')))
+                for row in totals:
+                    if row['total'] < rule['threshold']:
+                        continue
+                    address = _address(row['ip_address'])
+                    if address is None or self.is_exempt(*address):
+                        continue
+                    ban = self.ban(self.network_for(*address), time.time() + rule['ban'],
+                                   f'{row["total"]} {event_type} events in {rule["window"]}s')
+                    logger.warning(f'Banned {ban.network} until {time.ctime(ban.expires)}: {ban.reason}')
+        self.expire()
+        self.counters['refreshes'] += 1
+        return self.counters['banned'] - before
+
+    def start(self):
+        """Start this process's refresh thread if it is not running (cheap; called per request)"""
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._lock:
+            # A forked worker inherits the bans but not the thread
+            self._pid = os.getpid()
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='blocklist-refresh', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            close_old_connections()
+            try:
+                self.refresh()
+            except Exception as e:
+                self.counters['refresh_errors'] += 1
+                logger.error(f'Blocklist refresh failed: {str(e)}')
+            finally:
+                close_old_connections()
+            time.sleep(self.refresh_interval)
+
+    def stats(self):
+        stats = dict(self.counters)
+        stats['active'] = len(self.bans)
+        stats['memory'] = sum(trie.memory() for trie in self.tries.values())
+        return stats
+
+
+_blocklist = None
+_blocklist_lock = threading.Lock()
+
+
+def get_blocklist():
+    """The process-wide blocklist, configured from the BLOCKLIST_* settings"""
+    global _blocklist
+    if _blocklist is None:
+        with _blocklist_lock:
+            if _blocklist is None:
+                _blocklist = Blocklist(
+                    getattr(settings, 'BLOCKLIST_RULES', {}),
+                    networks=getattr(settings, 'BLOCKLIST_NETWORKS', []),
+                    exempt=getattr(settings, 'BLOCKLIST_EXEMPT', []),
+                    ipv6_prefix=getattr(settings, 'BLOCKLIST_IPV6_PREFIX', 64),
+                    refresh_interval=getattr(settings, 'BLOCKLIST_REFRESH_INTERVAL', 30),
+                )
+    return _blocklist
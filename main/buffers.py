@@ -0,0 +1,211 @@
+import atexit
+import logging
+import os
+import threading
+from collections import deque
+
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+
+class BatchBuffer:
+    """
+    In-process write buffer. Items are appended on the request thread and
+    handed to ``flush_func`` in batches from a background thread, either when
+    ``batch_size`` items are pending or every ``flush_interval`` seconds.
+
+    ``max_pending`` is the loss budget: it bounds how many unflushed items a
+    crash can lose, and once it is reached the oldest items are dropped.
+    """
+    def __init__(self, name, flush_func, batch_size=100, flush_interval=5.0,
+                 max_pending=10000, max_retries=3):
+        self.name = name
+        self.flush_func = flush_func
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.max_pending = max(self.batch_size, max_pending)
+        self.max_retries = max_retries
+        self._failures = 0
+        self._items = deque()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._pid = os.getpid()
+        self._closed = False
+        self.counters = {'buffered': 0, 'flushed': 0, 'dropped': 0, 'failed_batches': 0}
+        atexit.register(self.close)
+
+    def add(self, item):
+        """Queue an item; never touches the database"""
+        with self._lock:
+            self._check_fork()
+            self._append(item)
+            self.counters['buffered'] += 1
+            pending = len(self._items)
+
+        if self._closed:
+            self.flush()
+            return
+        self._ensure_worker()
+        if pending >= self.batch_size:
+            self._wakeup.set()
+
+    def flush(self):
+        """Write out everything that is pending. Returns the number of items flushed"""
+        total = 0
+        with self._flush_lock:
+            while True:
+                with self._lock:
+                    if not self._items:
+                        break
+                    count = min(self.batch_size, len(self._items))
+                    batch = self._take(count)
+
+                try:
+                    self.flush_func(batch)
+                except Exception as e:
+                    logger.error(f'{self.name} buffer flush failed: {str(e)}')
+                    self._requeue(batch)
+                    break
+
+                total += len(batch)
+                self._failures = 0
+                with self._lock:
+                    self.counters['flushed'] += len(batch)
+        return total
+
+    def stats(self):
+        """Snapshot of the buffer counters for this process"""
+        with self._lock:
+            stats = dict(self.counters)
+            stats['pending'] = len(self._items)
+        return stats
+
+    def close(self):
+        """Stop accepting background work and flush synchronously (worker shutdown)"""
+        self._closed = True
+        self._wakeup.set()
+        self.flush()
+
+    def _requeue(self, batch):
+        self._failures += 1
+        with self._lock:
+            self.counters['failed_batches'] += 1
+            if self._failures > self.max_retries:
+                # Give up on a batch that keeps failing rather than letting it
+                # block everything queued behind it.
+                self.counters['dropped'] += len(batch)
+                self._failures = 0
+                return
+            room = self.max_pending - len(self._items)
+            keep = batch[-room:] if room > 0 else []
+            self.counters['dropped'] += len(batch) - len(keep)
+            self._put_back(keep)
+
+    # Queue operations, called with self._lock held
+    def _append(self, item):
+        if len(self._items) >= self.max_pending:
+            self._items.popleft()
+            self.counters['dropped'] += 1
+        self._items.append(item)
+
+    def _take(self, count):
+        return [self._items.popleft() for _ in range(count)]
+
+    def _put_back(self, items):
+        self._items.extendleft(reversed(items))
+
+    def _check_fork(self):
+        # A forked worker inherits the parent's queue but not its thread; the
+        # parent owns those items, so the child starts empty.
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._items.clear()
+            self._thread = None
+            self._wakeup = threading.Event()
+
+    def _ensure_worker(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(
+                target=self._run, name=f'{self.name}-flusher', daemon=True
+            )
+            self._thread.start()
+
+    def _run(self):
+        while not self._closed:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            close_old_connections()
+            try:
+                self.flush()
+            finally:
+                close_old_connections()
+
+
+class Coalesced:
+    """A buffered item standing for ``count`` identical ones"""
+    __slots__ = ('key', 'item', 'count')
+
+    def __init__(self, key, item):
+        self.key = key
+        self.item = item
+        self.count = 1
+
+
+class CoalescingBuffer(BatchBuffer):
+    """
+    BatchBuffer that merges items with the same ``key_func(item)`` while they
+    are pending: the first one is kept with a count of how many arrived
+    before the next flush, so a flood of identical items costs one entry.
+    ``flush_func`` receives Coalesced entries. ``max_pending`` bounds the
+    number of distinct keys.
+    """
+    def __init__(self, name, flush_func, key_func, **kwargs):
+        super().__init__(name, flush_func, **kwargs)
+        self.key_func = key_func
+        self._index = {}
+        self.counters['coalesced'] = 0
+
+    def _append(self, item):
+        key = self.key_func(item)
+        entry = self._index.get(key)
+        if entry is not None:
+            entry.count += 1
+            self.counters['coalesced'] += 1
+            return
+        if len(self._items) >= self.max_pending:
+            oldest = self._items.popleft()
+            del self._index[oldest.key]
+            self.counters['dropped'] += oldest.count
+        entry = Coalesced(key, item)
+        self._items.append(entry)
+        self._index[key] = entry
+
+    def _take(self, count):
+        entries = super()._take(count)
+        for entry in entries:
+            del self._index[entry.key]
+        return entries
+
+    def _put_back(self, entries):
+        # Items with the same key may have arrived while the batch was out
+        keep = []
+        for entry in entries:
+            current = self._index.get(entry.key)
+            if current is not None:
+                current.count += entry.count
+            else:
+                self._index[entry.key] = entry
+                keep.append(entry)
+        super()._put_back(keep)
+
+    def _check_fork(self):
+        if self._pid != os.getpid():
+            self._index.clear()
+        super()._check_fork()
@@ -0,0 +1,170 @@
+import hashlib
+import logging
+import math
+import re
+import secrets
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.crypto import constant_time_compare, salted_hmac
+
+from .security import generate_captcha_text
+
+logger = logging.getLogger(__name__)
+
+KIND_RE = re.compile(r'^[a-z_]{1,20}$')
+SALT = 'main.captcha'
+
+
+class BloomFilter:
+    """Fixed-size set membership with no false negatives and a bounded false positive rate"""
+    def __init__(self, capacity, error_rate):
+        self.capacity = capacity
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item):
+        # Double hashing: k positions from one 128-bit digest
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def __contains__(self, item):
+        bits = self.bits
+        return all(bits[p >> 3] & (1 << (p & 7)) for p in self._positions(item))
+
+    def add(self, item):
+        for p in self._positions(item):
+            self.bits[p >> 3] |= 1 << (p & 7)
+        self.count += 1
+
+
+class BloomSeenSet:
+    """
+    Single-use check for CAPTCHA nonces in two Bloom filter generations.
+    Each generation lives for ``period`` seconds (at least the token TTL),
+    so a nonce stays remembered for as long as its token could verify; the
+    older generation is then dropped whole instead of expiring entries.
+    Memory is fixed by ``capacity``, however many CAPTCHAs are fetched:
+    only tokens that verify are recorded. Per process.
+    """
+    def __init__(self, capacity=100000, error_rate=1e-6, period=600):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.period = period
+        self.current = BloomFilter(capacity, error_rate)
+        self.previous = None
+        self.rotated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _rotate(self):
+        now = time.monotonic()
+        if now - self.rotated_at >= self.period or self.current.count >= self.capacity:
+            if self.current.count >= self.capacity:
+                logger.warning('CAPTCHA seen-set generation filled early; raise CAPTCHA_BLOOM_CAPACITY')
+            # After a whole idle period the previous generation is stale too
+            self.previous = self.current if now - self.rotated_at < 2 * self.period else None
+            self.current = BloomFilter(self.capacity, self.error_rate)
+            self.rotated_at = now
+
+    def add(self, nonce):
+        """Record ``nonce``; False if it was (probably) seen before"""
+        with self._lock:
+            self._rotate()
+            if nonce in self.current or (self.previous is not None and nonce in self.previous):
+                return False
+            self.current.add(nonce)
+            return True
+
+    def memory(self):
+        return len(self.current.bits) * 2
+
+
+class CacheSeenSet:
+    """Single-use check through the Django cache, shared by every worker using it"""
+    def __init__(self, ttl=600):
+        self.ttl = ttl
+
+    def add(self, nonce):
+        return cache.add(f'captcha-seen:{nonce}', 1, self.ttl)
+
+
+def make_seen_set(name):
+    ttl = getattr(settings, 'CAPTCHA_TTL', 600)
+    if name == 'cache':
+        return CacheSeenSet(ttl)
+    if name == 'bloom':
+        return BloomSeenSet(
+            capacity=getattr(settings, 'CAPTCHA_BLOOM_CAPACITY', 100000),
+            error_rate=getattr(settings, 'CAPTCHA_BLOOM_ERROR_RATE', 1e-6),
+            period=ttl,
+        )
+    raise ValueError(f'Unknown CAPTCHA replay backend {name!r}')
+
+
+_seen_set = None
+
+
+def get_seen_set():
+    global _seen_set
+    if _seen_set is None:
+        _seen_set = make_seen_set(getattr(settings, 'CAPTCHA_REPLAY_BACKEND', 'bloom'))
+    return _seen_set
+
+
+def answer_digest(answer):
+    """Keyed hash of an answer; challenges can be stored and signed without the plaintext"""
+    return salted_hmac(f'{SALT}.answer', answer.strip().upper(), algorithm='sha256').hexdigest()
+
+
+def _signature(kind, nonce, issued, digest):
+    # The answer enters the MAC only as its keyed digest and is not part of
+    # the token, so the token does not give it away and a wrong answer
+    # fails the signature check
+    return salted_hmac(SALT, f'{kind}.{nonce}.{issued}.{digest}', algorithm='sha256').hexdigest()[:32]
+
+
+def issue(kind='contact', text=None, digest=None):
+    """
+    New challenge: (text, token). Nothing is stored server-side. Pass the
+    ``digest`` of a pre-generated challenge (see main.captcha_images) to
+    sign it without its text; ``text`` is then None.
+    """
+    if not KIND_RE.match(kind):
+        kind = 'contact'
+    if digest is None:
+        text = text or generate_captcha_text()
+        digest = answer_digest(text)
+    nonce = secrets.token_urlsafe(12)
+    issued = int(time.time())
+    return text, f'{kind}.{nonce}.{issued}.{_signature(kind, nonce, issued, digest)}'
+
+
+def verify(token, answer, kind='contact'):
+    """
+    Check ``answer`` against a token from issue(); a token verifies once.
+    Returns: (is_valid, message), like security.validate_captcha
+    """
+    if not answer:
+        return False, "Please enter the CAPTCHA code"
+    try:
+        token_kind, nonce, issued, signature = (token or '').split('.')
+        issued = int(issued)
+    except ValueError:
+        return False, "Invalid CAPTCHA. Please refresh."
+    if token_kind != kind:
+        return False, "Invalid CAPTCHA. Please refresh."
+
+    age = time.time() - issued
+    if age > getattr(settings, 'CAPTCHA_TTL', 600) or age < -60:
+        return False, "CAPTCHA expired. Please refresh."
+    if not constant_time_compare(signature, _signature(kind, nonce, issued, answer_digest(answer))):
+        return False, "Incorrect CAPTCHA code. Please try again."
+    if not get_seen_set().add(nonce):
+        return False, "CAPTCHA already used. Please refresh."
+    return True, "CAPTCHA validated successfully."
@@ -0,0 +1,201 @@
+import base64
+import io
+import logging
+import math
+import os
+import random
+import threading
+from collections import deque
+
+from django.conf import settings
+from PIL import Image, ImageDraw, ImageFilter, ImageFont
+
+from .captcha import answer_digest
+from .security import generate_captcha_text
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPES = {'PNG': 'image/png', 'WEBP': 'image/webp'}
+
+
+class Challenge:
+    """A rendered CAPTCHA: the image as a data URI and the keyed digest of its answer"""
+    __slots__ = ('image', 'digest')
+
+    def __init__(self, image, digest):
+        self.image = image
+        self.digest = digest
+
+
+def _load_font(path, size):
+    if path:
+        try:
+            return ImageFont.truetype(path, size)
+        except OSError:
+            logger.warning(f'CAPTCHA font {path} could not be loaded; using the built-in bitmap font')
+    return None
+
+
+def _glyph(char, font, height):
+    """One character on a transparent tile, ready to rotate"""
+    if font is not None:
+        left, top, right, bottom = font.getbbox(char)
+        tile = Image.new('L', (right - left + 8, bottom - top + 8), 0)
+        ImageDraw.Draw(tile).text((4 - left, 4 - top), char, font=font, fill=255)
+        return tile
+    # The bitmap font is 6x11; draw it small and scale it up
+    tile = Image.new('L', (8, 13), 0)
+    ImageDraw.Draw(tile).text((1, 1), char, font=ImageFont.load_default(), fill=255)
+    scale = height * 0.6 / 13
+    return tile.resize((int(8 * scale), int(13 * scale)), Image.NEAREST)
+
+
+def render_challenge(text, font=None, width=180, height=60, image_format='WEBP'):
+    """Distorted image of ``text``: rotated, jittered glyphs, a sine wave, noise lines and speckle"""
+    rng = random.SystemRandom()
+    background = tuple(rng.randint(225, 250) for _ in range(3))
+    image = Image.new('RGB', (width, height), background)
+
+    step = (width - 20) / len(text)
+    for i, char in enumerate(text):
+        glyph = _glyph(char, font, height).rotate(rng.uniform(-25, 25), resample=Image.BICUBIC, expand=True)
+        color = tuple(rng.randint(20, 120) for _ in range(3))
+        x = int(10 + i * step + rng.uniform(-3, 3))
+        y = int((height - glyph.height) / 2 + rng.uniform(-6, 6))
+        image.paste(Image.new('RGB', glyph.size, color), (x, y), glyph)
+
+    # Shift 3px columns along a sine wave so glyphs are not axis-aligned
+    warped = Image.new('RGB', (width, height), background)
+    amplitude, period, phase = rng.uniform(2, 5), rng.uniform(40, 80), rng.uniform(0, 2 * math.pi)
+    for x in range(0, width, 3):
+        offset = int(amplitude * math.sin(2 * math.pi * x / period + phase))
+        warped.paste(image.crop((x, 0, x + 3, height)), (x, offset))
+
+    draw = ImageDraw.Draw(warped)
+    for _ in range(rng.randint(3, 5)):
+        points = [(rng.randint(0, width), rng.randint(0, height)) for _ in range(2)]
+        draw.line(points, fill=tuple(rng.randint(60, 160) for _ in range(3)), width=rng.randint(1, 2))
+    for _ in range(width * height // 40):
+        draw.point((rng.randint(0, width - 1), rng.randint(0, height - 1)),
+                   fill=tuple(rng.randint(80, 200) for _ in range(3)))
+    warped = warped.filter(ImageFilter.SMOOTH)
+
+    buffer = io.BytesIO()
+    if image_format == 'WEBP':
+        warped.save(buffer, 'WEBP', quality=60)
+    else:
+        warped.save(buffer, 'PNG', optimize=True)
+    return buffer.getvalue()
+
+
+class ChallengePool:
+    """
+    Pre-rendered CAPTCHA challenges. take() pops one in O(1) on the request
+    thread; a background thread renders replacements whenever the pool
+    drops below ``low_water``, so no request ever renders an image.
+
+    Every challenge is served once. If a flood drains the pool faster than
+    it refills, take() returns None until the refill catches up; it never
+    re-serves an image whose answer may already be known, nor renders inline.
+    """
+    def __init__(self, size=200, low_water=50, image_format='WEBP', font_path=None):
+        self.size = max(1, size)
+        self.low_water = min(low_water, self.size)
+        self.image_format = image_format if image_format in CONTENT_TYPES else 'PNG'
+        self.font_path = font_path
+        self._font = None
+        self._entries = deque()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._ready = threading.Event()
+        self._thread = None
+        self._pid = os.getpid()
+        self.counters = {'rendered': 0, 'served': 0, 'exhausted': 0, 'render_errors': 0}
+
+    def take(self, timeout=0.5):
+        """
+        A Challenge, or None if the pool is empty. A cold pool waits up to
+        ``timeout`` seconds for its first challenge.
+        """
+        self._ensure_worker()
+        if not self._ready.is_set():
+            self._ready.wait(timeout)
+        with self._lock:
+            if self._entries:
+                challenge = self._entries.popleft()
+                self.counters['served'] += 1
+            else:
+                challenge = None
+                self.counters['exhausted'] += 1
+            low = len(self._entries) < self.low_water
+        if low:
+            self._wakeup.set()
+        return challenge
+
+    def fill(self, count=None):
+        """Render challenges until the pool is full (or ``count`` were added). Returns how many"""
+        if self._font is None:
+            self._font = _load_font(self.font_path, 30) or False
+        added = 0
+        content_type = CONTENT_TYPES[self.image_format]
+        while count is None or added < count:
+            with self._lock:
+                if len(self._entries) >= self.size:
+                    break
+            text = generate_captcha_text()
+            try:
+                data = render_challenge(text, self._font or None, image_format=self.image_format)
+            except Exception as e:
+                logger.error(f'CAPTCHA render failed: {str(e)}')
+                self.counters['render_errors'] += 1
+                break
+            challenge = Challenge(
+                f'data:{content_type};base64,{base64.b64encode(data).decode()}',
+                answer_digest(text),
+            )
+            with self._lock:
+                self._entries.append(challenge)
+                self.counters['rendered'] += 1
+            self._ready.set()
+            added += 1
+        return added
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+            stats['available'] = len(self._entries)
+        return stats
+
+    def _check_fork(self):
+        # Children of a forking server get their own pool and refill thread
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._entries.clear()
+            self._thread = None
+            self._wakeup = threading.Event()
+            self._ready = threading.Event()
+
+    def _ensure_worker(self):
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._lock:
+            self._check_fork()
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='captcha-pool', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            # Cleared before filling, so a wakeup during the fill is not lost
+            self._wakeup.clear()
+            self.fill()
+            self._wakeup.wait(5)
+
+
+challenge_pool = ChallengePool(
+    size=getattr(settings, 'CAPTCHA_POOL_SIZE', 200),
+    low_water=getattr(settings, 'CAPTCHA_POOL_LOW_WATER', 50),
+    image_format=getattr(settings, 'CAPTCHA_IMAGE_FORMAT', 'WEBP'),
+    font_path=getattr(settings, 'CAPTCHA_FONT_PATH', None),
+)
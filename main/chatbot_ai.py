@@ -1,143 +1,345 @@
 import json
+import logging
+import os
+import random
 import re
-from datetime import datetime
-from .models import ChatbotSession, ServiceInquiry
+import threading
+import time
+
+from django.conf import settings
+
+from .retrieval import get_index
+
+logger = logging.getLogger(__name__)
+
+TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+# Knowledge base format version this module reads (see main/data/chatbot.json)
+KB_VERSION = 1
+
+
+def word_forms(word):
+    """A keyword word and its plurals, so 'hour' also finds 'hours'"""
+    forms = {word, word + 's', word + 'es'}
+    if word.endswith('y'):
+        forms.add(word[:-1] + 'ies')
+    return frozenset(forms)
+
+
+class Keyword:
+    __slots__ = ('text', 'intent', 'forms', 'rank')
+
+    def __init__(self, text, intent, rank):
+        self.text = text
+        self.intent = intent
+        self.forms = tuple(word_forms(word) for word in TOKEN_RE.findall(text))
+        self.rank = rank
+
+
+class IntentMatch:
+    """The winning keyword of a message, plus every keyword found in it"""
+    __slots__ = ('intent', 'keyword', 'found')
+
+    def __init__(self, intent, keyword, found):
+        self.intent = intent
+        self.keyword = keyword
+        self.found = found
+
+
+def edit_distance(a, b, limit):
+    """
+    Optimal string alignment distance between ``a`` and ``b`` (insertions,
+    deletions, substitutions and adjacent transpositions), or ``limit + 1``
+    as soon as it must exceed ``limit``. A shared prefix and suffix are
+    skipped, and only the diagonal band of width ``2 * limit + 1`` is
+    computed.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    start = 0
+    while start < len(a) and start < len(b) and a[start] == b[start]:
+        start += 1
+    end = 0
+    while end < len(a) - start and end < len(b) - start and a[-1 - end] == b[-1 - end]:
+        end += 1
+    a, b = a[start:len(a) - end], b[start:len(b) - end]
+    if limit == 1:
+        # What one edit leaves once the shared ends are gone: a single
+        # character inserted, deleted or replaced, or a swapped pair
+        if not a and not b:
+            return 0
+        if len(a) + len(b) <= 2 or (len(a) == len(b) == 2 and a == b[::-1]):
+            return 1
+        return 2
+    over = limit + 1
+    before, previous = None, [j if j <= limit else over for j in range(len(b) + 1)]
+    for i in range(1, len(a) + 1):
+        ca = a[i - 1]
+        current = [over] * (len(b) + 1)
+        if i <= limit:
+            current[0] = i
+        lowest = current[0]
+        for j in range(max(1, i - limit), min(len(b), i + limit) + 1):
+            cb = b[j - 1]
+            cost = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb))
+            if before is not None and j > 1 and ca == b[j - 2] and a[i - 2] == cb:
+                cost = min(cost, before[j - 2] + 1)
+            current[j] = cost
+            if cost < lowest:
+                lowest = cost
+        if lowest > limit:
+            return over
+        before, previous = previous, current
+    return min(previous[-1], over)
+
+
+def trigrams(word):
+    padded = f'^{word}$'
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+# Tokens shorter than this are never corrected: too many real words sit one
+# edit from a short keyword ('rate' / 'late', 'call' / 'all')
+FUZZY_MIN_LENGTH = 5
+# Real words within an edit of a keyword form, left as typed
+COMMON_WORDS = frozenset('''
+about after again asked being below bring build built chose clear click could doing
+every first found going great guess happy having house later learn least
+leave maybe means might money never other place plans point prize quick quite right
+serve share since small sorry sound start still stuff table taken thank thanks their there
+these thing think those three today total tried under until using value wants where which
+while whole world worry would wrong years
+'''.split())
+
+
+class IntentEngine:
+    """
+    Every intent keyword in one inverted index from the forms of its first
+    word, so a message is tokenized once and looked up with one set
+    intersection; most messages stop there. Multi-word keywords are then
+    confirmed against the following tokens. Matching is on whole words:
+    'hi' does not fire inside 'this'.
+
+    With ``fuzzy``, tokens that are not keyword words are first corrected
+    to the nearest one within one edit (two for words of 8+ letters), so a
+    keyword with a typo still outranks a lower-priority one typed
+    correctly. Candidates come from a trigram index over the keyword
+    vocabulary, so only words sharing enough trigrams are compared, and
+    corrections are cached per engine.
+    """
+    CACHE_SIZE = 4096
+
+    def __init__(self, intents, fuzzy=True):
+        self.index = {}
+        self.keywords = []
+        self.vocabulary = {}  # keyword word form -> rank of its first keyword
+        for intent, keywords in intents:
+            for text in keywords:
+                keyword = Keyword(text, intent, len(self.keywords))
+                self.keywords.append(keyword)
+                for form in keyword.forms[0]:
+                    self.index.setdefault(form, []).append(keyword)
+                for forms in keyword.forms:
+                    for form in forms:
+                        self.vocabulary.setdefault(form, keyword.rank)
+        self.fuzzy = fuzzy
+        self.grams = {}
+        for word in self.vocabulary:
+            if len(word) >= FUZZY_MIN_LENGTH - 1:
+                for gram in trigrams(word):
+                    self.grams.setdefault(gram, []).append(word)
+        self.corrections = {}
+
+    def correct(self, token):
+        """The keyword word ``token`` is a typo of, else ``token``"""
+        if len(token) < FUZZY_MIN_LENGTH or token in self.vocabulary or token in COMMON_WORDS:
+            return token
+        corrected = self.corrections.get(token)
+        if corrected is None:
+            corrected = self._nearest(token)
+            if len(self.corrections) >= self.CACHE_SIZE:
+                self.corrections = {}
+            self.corrections[token] = corrected
+        return corrected
+
+    def _nearest(self, token):
+        limit = 1 if len(token) < 8 else 2
+        grams = trigrams(token)
+        shared = {}
+        for gram in grams:
+            for word in self.grams.get(gram, ()):
+                shared[word] = shared.get(word, 0) + 1
+        # Each edit changes at most four of a word's trigrams (a transposition)
+        needed = len(grams) - 4 * limit
+        best, best_key = token, None
+        for word, count in shared.items():
+            if count < needed or abs(len(word) - len(token)) > limit:
+                continue
+            distance = edit_distance(token, word, limit)
+            if distance <= limit:
+                key = (distance, self.vocabulary[word])
+                if best_key is None or key < best_key:
+                    best, best_key = word, key
+        return best
+
+    def match(self, text):
+        """IntentMatch for ``text``, or None if no keyword is in it"""
+        tokens = TOKEN_RE.findall(text.lower())
+        if self.fuzzy:
+            # Keyword words skip correct(); other tokens are mostly cache hits
+            vocabulary, correct = self.vocabulary, self.correct
+            tokens = [token if token in vocabulary else correct(token) for token in tokens]
+        if self.index.keys().isdisjoint(tokens):
+            return None
+        best = None
+        found = set()
+        for i, token in enumerate(tokens):
+            for keyword in self.index.get(token, ()):
+                if len(keyword.forms) > 1 and not all(
+                        i + j < len(tokens) and tokens[i + j] in forms
+                        for j, forms in enumerate(keyword.forms[1:], 1)):
+                    continue
+                found.add(keyword.text)
+                if best is None or keyword.rank < best.rank:
+                    best = keyword
+        if best is None:
+            return None
+        return IntentMatch(best.intent, best.text, found)
+
+
+class Placeholders(dict):
+    """Settings values for str.format_map; unknown names are left as written"""
+    def __missing__(self, key):
+        return '{' + key + '}'
+
+
+def site_placeholders():
+    return Placeholders(
+        site_name=getattr(settings, 'SITE_NAME', ''),
+        site_email=getattr(settings, 'SITE_EMAIL', ''),
+        site_phone=getattr(settings, 'SITE_PHONE', ''),
+        site_address=getattr(settings, 'SITE_ADDRESS', ''),
+    )
+
+
+class Intent:
+    __slots__ = ('name', 'responses', 'keyword_responses', 'service')
+
+    def __init__(self, name, responses, keyword_responses=None, service=None):
+        self.name = name
+        self.responses = responses
+        self.keyword_responses = keyword_responses or {}
+        self.service = service
+
+
+def _responses(value, placeholders, where):
+    if isinstance(value, str):
+        value = [value]
+    if not isinstance(value, list) or not value or not all(isinstance(r, str) for r in value):
+        raise ValueError(f'{where}: responses must be a non-empty list of strings')
+    return tuple(r.format_map(placeholders) for r in value)
+
 
 class ChatbotAI:
-    def __init__(self):
-        self.responses = self.load_responses()
-        self.services = {
-            'web development': 'it-consulting',
-            'software development': 'software-development',
-            'mobile app': 'software-development',
-            'digital marketing': 'digital-marketing',
-            'seo': 'digital-marketing',
-            'social media': 'digital-marketing',
-            'cloud': 'cloud-solutions',
-            'aws': 'cloud-solutions',
-            'azure': 'cloud-solutions',
-            'security': 'cybersecurity',
-            'cybersecurity': 'cybersecurity',
-            'data analytics': 'data-analytics',
-            'ai': 'data-analytics',
-            'machine learning': 'data-analytics',
-            'consulting': 'it-consulting'
-        }
-    
-    def load_responses(self):
-        return {
-            'greeting': [
-                "Hello! I'm Sharsh, your AI assistant at BunShai TECHNOHUB. How can I help you today?",
-                "Hi there! I'm Sharsh. How can I assist you with BunShai TECHNOHUB services?",
-                "Welcome! I'm Sharsh, ready to help you with all your technology needs."
-            ],
-            'services': {
-                'intro': "We offer a wide range of IT services including:\n\n",
-                'list': """• **IT Consulting** - Technology strategy and digital transformation\n• **Software Development** - Custom web and mobile applications\n• **Digital Marketing** - SEO, social media, and online advertising\n• **Cloud Solutions** - AWS, Azure, and Google Cloud services\n• **Cybersecurity** - Security audits and protection solutions\n• **Data Analytics** - Business intelligence and AI/ML solutions\n\nWhich service are you interested in?""",
-                'follow_up': "Would you like me to connect you with our {service} specialist?"
-            },
-            'pricing': {
-                'general': "Our pricing depends on project requirements. We offer:\n• Hourly rates from $25-$75\n• Project-based pricing\n• Monthly retainers\n• Custom enterprise solutions\n\nWould you like a free consultation?",
-                'budget': "What's your budget range for this project?"
-            },
-            'contact': {
-                'info': """You can reach us through:\n📧 Email: team.bunshailogicloop@gmail.com\n📞 Phone: +91 8091401208\n💬 WhatsApp: +91 8091401208\n📍 Address: Global Remote Operations\n\nWould you like me to connect you directly?""",
-                'hours': "We're available 24/7 for urgent matters. Regular business hours: Mon-Fri, 9AM-6PM IST."
-            },
-            'hours': "We operate 24/7 for critical support. Regular business hours are Monday to Friday, 9AM to 6PM Indian Standard Time.",
-            'team': "Our team consists of 50+ experienced professionals including software developers, designers, cloud architects, security experts, and data scientists.",
-            'portfolio': "We've delivered 50+ successful projects across various industries. Check our website for case studies and client testimonials.",
-            'default': "I'm not sure I understand. Could you please rephrase? Or you can ask about:\n• Our services\n• Pricing\n• Contact information\n• Portfolio\n• Team"
-        }
-    
-    def get_response(self, message, session):
-        """Get appropriate chatbot response based on user message"""
-        message_lower = message.lower().strip()
-        
-        # Check for greetings
-        if self.is_greeting(message_lower):
-            return self.get_random_response('greeting')
-        
-        # Check for services inquiry
-        service_match = self.check_service_inquiry(message_lower)
-        if service_match:
-            return self.handle_service_inquiry(service_match, session)
-        
-        # Check for pricing
-        if any(word in message_lower for word in ['price', 'cost', 'rate', 'budget', 'how much']):
-            return self.handle_pricing_inquiry(message_lower)
-        
-        # Check for contact information
-        if any(word in message_lower for word in ['contact', 'email', 'phone', 'call', 'reach']):
-            return self.responses['contact']['info']
-        
-        # Check for business hours
-        if any(word in message_lower for word in ['hour', 'time', 'available', 'open', 'close']):
-            return self.responses['hours']
-        
-        # Check for team information
-        if any(word in message_lower for word in ['team', 'people', 'staff', 'employee']):
-            return self.responses['team']
-        
-        # Check for portfolio
-        if any(word in message_lower for word in ['portfolio', 'project', 'work', 'case study', 'client']):
-            return self.responses['portfolio']
-        
-        # Default response
-        return self.responses['default']
-    
-    def is_greeting(self, message):
-        greetings = ['hello', 'hi', 'hey', 'good morning', 'good afternoon', 'good evening']
-        return any(greeting in message for greeting in greetings)
-    
-    def check_service_inquiry(self, message):
-        """Check if user is asking about specific services"""
-        for service_key in self.services.keys():
-            if service_key in message:
-                return service_key
-        return None
-    
-    def handle_service_inquiry(self, service, session):
-        """Handle service-specific inquiries"""
-        service_name = service.title()
-        response = f"We offer comprehensive {service_name} services. "
-        
-        # Add service-specific details
-        if service in ['web development', 'software development', 'mobile app']:
-            response += "Our development team specializes in:\n• Custom web applications\n• Mobile apps (iOS/Android)\n• E-commerce solutions\n• API development\n• Progressive Web Apps"
-        elif service in ['digital marketing', 'seo', 'social media']:
-            response += "Our marketing services include:\n• SEO optimization\n• Social media management\n• PPC advertising\n• Content marketing\n• Brand strategy"
-        elif service in ['cloud', 'aws', 'azure']:
-            response += "Our cloud expertise covers:\n• Cloud migration\n• Infrastructure setup\n• DevOps automation\n• Cost optimization\n• Security compliance"
-        elif service in ['security', 'cybersecurity']:
-            response += "Our security services provide:\n• Vulnerability assessments\n• Penetration testing\n• Security monitoring\n• Incident response\n• Compliance audits"
-        elif service in ['data analytics', 'ai', 'machine learning']:
-            response += "Our data services include:\n• Business intelligence\n• Predictive analytics\n• Machine learning models\n• Data visualization\n• Big data solutions"
-        
-        response += f"\n\nWould you like me to schedule a free consultation for {service_name}?"
-        
-        # Store service interest in session
-        if session:
-            session.service_interest = service
-            session.save()
-        
-        return response
-    
-    def handle_pricing_inquiry(self, message):
-        """Handle pricing-related inquiries"""
-        if 'budget' in message:
-            return self.responses['pricing']['budget']
-        return self.responses['pricing']['general']
-    
-    def get_random_response(self, response_type):
-        """Get random response from list"""
-        responses = self.responses.get(response_type, [])
-        if isinstance(responses, list) and responses:
-            import random
-            return random.choice(responses)
-        return responses if isinstance(responses, str) else "I'm here to help!"
-
-def get_chatbot_response(message, session):
-    """Main function to get chatbot response"""
-    chatbot = ChatbotAI()
-    return chatbot.get_response(message, session)
\ No newline at end of file
+    """
+    Sharsh, the site chatbot, compiled from a knowledge base dict (the
+    format of main/data/chatbot.json). Everything is built in __init__, so
+    answering only reads and one instance serves every request; a changed
+    knowledge base is a new instance (see get_chatbot).
+    """
+    def __init__(self, kb):
+        if kb.get('version') != KB_VERSION:
+            raise ValueError(f'Unsupported knowledge base version {kb.get("version")!r} (expected {KB_VERSION})')
+        self.revision = kb.get('revision', '')
+        placeholders = site_placeholders()
+        self.intents = {}
+        keywords = []
+        for entry in kb.get('intents', []):
+            name = entry['name']
+            if name in self.intents:
+                raise ValueError(f'Duplicate intent {name!r}')
+            self.intents[name] = Intent(
+                name,
+                _responses(entry['responses'], placeholders, name),
+                {keyword.lower(): _responses(value, placeholders, f'{name}.{keyword}')
+                 for keyword, value in entry.get('keyword_responses', {}).items()},
+                entry.get('service'),
+            )
+            keywords.append((name, [keyword.lower() for keyword in entry.get('keywords', [])]))
+        self.engine = IntentEngine(keywords)
+        self.default = _responses(kb.get('default', ["I'm here to help!"]), placeholders, 'default')
+
+    def get_response(self, message, state=None):
+        """Get appropriate chatbot response based on user message, noting the intent on ``state``"""
+        match = self.engine.match(message)
+        if match is None:
+            if state is not None:
+                state.note_intent(None)
+            return self.search_answer(message) or random.choice(self.default)
+        intent = self.intents[match.intent]
+
+        if state is not None:
+            state.note_intent(intent.name, intent.service)
+
+        for keyword, responses in intent.keyword_responses.items():
+            if keyword in match.found:
+                return random.choice(responses)
+        return random.choice(intent.responses)
+
+    def search_answer(self, message):
+        """The best matching passage of the site search index, if one is good enough"""
+        index = get_index()
+        if index is None:
+            return None
+        return index.answer(message, getattr(settings, 'CHATBOT_RETRIEVAL_MIN_SCORE', 3.0))
+
+
+def load_knowledge_base(path):
+    """A ChatbotAI built from the knowledge base file at ``path``"""
+    with open(path, encoding='utf-8') as f:
+        return ChatbotAI(json.load(f))
+
+
+_chatbot = None
+_chatbot_mtime = None
+_checked_at = 0.0
+_chatbot_lock = threading.Lock()
+
+
+def get_chatbot():
+    """
+    The process-wide chatbot. The knowledge base file is re-checked every
+    CHATBOT_KB_CHECK_INTERVAL seconds and a changed file is compiled into a
+    new ChatbotAI that replaces the old one in a single assignment, so
+    requests in flight finish on the version they started with. A file
+    that fails to load is logged and the previous version kept.
+    """
+    global _chatbot, _chatbot_mtime, _checked_at
+    now = time.monotonic()
+    if _chatbot is not None and now - _checked_at < getattr(settings, 'CHATBOT_KB_CHECK_INTERVAL', 5):
+        return _chatbot
+    with _chatbot_lock:
+        if _chatbot is not None and now - _checked_at < getattr(settings, 'CHATBOT_KB_CHECK_INTERVAL', 5):
+            return _chatbot
+        _checked_at = now
+        path = settings.CHATBOT_KB_PATH
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            mtime = None
+        if _chatbot is None or mtime != _chatbot_mtime:
+            try:
+                chatbot = load_knowledge_base(path)
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                logger.error(f'Could not load chatbot knowledge base {path}: {str(e)}')
+                chatbot = _chatbot or ChatbotAI({'version': KB_VERSION})
+            else:
+                logger.info(f'Loaded chatbot knowledge base revision {chatbot.revision or "?"} '
+                            f'({len(chatbot.intents)} intents)')
+            _chatbot, _chatbot_mtime = chatbot, mtime
+    return _chatbot
+
+
+def get_chatbot_response(message, state=None):
+    """Main function to get chatbot response; ``state`` is the ConversationState (main.chatbot_sessions)"""
+    return get_chatbot().get_response(message, state)
@@ -0,0 +1,194 @@
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .buffers import BatchBuffer
+from .models import ChatbotMessage, ChatbotSession
+
+logger = logging.getLogger(__name__)
+
+EMAIL_RE = re.compile(r'[\w.+-]+@[\w-]+(?:\.[\w-]+)+')
+PHONE_RE = re.compile(r'\+?\d[\d\s-]{8,16}\d')
+
+
+class ConversationState:
+    """
+    What the chatbot knows about one active conversation: the session row's
+    key and contact details, the intent of the last matched message and the
+    lead fields collected so far (name, email, phone, service).
+    """
+    __slots__ = ('pk', 'session_id', 'is_returning', 'intent', 'lead', 'turns', 'last_seen')
+
+    def __init__(self, pk, session_id, name=None, email=None, phone=None, is_returning=False):
+        self.pk = pk
+        self.session_id = session_id
+        self.is_returning = is_returning
+        self.intent = None
+        self.lead = {field: value for field, value in
+                     (('name', name), ('email', email), ('phone', phone)) if value}
+        self.turns = 0
+        self.last_seen = time.monotonic()
+
+    @classmethod
+    def from_session(cls, session):
+        return cls(session.pk, session.session_id, session.name, session.email, session.phone,
+                   session.is_returning)
+
+    def note_intent(self, intent, service=None):
+        """Called by the chatbot with the intent a message matched"""
+        self.intent = intent
+        if service:
+            self.lead['service'] = service
+
+    def collect(self, message):
+        """Lead fields given in ``message`` that were not known yet, now recorded"""
+        found = {}
+        if 'email' not in self.lead:
+            email = EMAIL_RE.search(message)
+            if email:
+                found['email'] = email.group(0)[:254]
+        if 'phone' not in self.lead:
+            phone = PHONE_RE.search(message)
+            if phone:
+                found['phone'] = phone.group(0)[:20]
+        self.lead.update(found)
+        return found
+
+
+class SessionCache:
+    """
+    Active conversations by session_id, least recently used first. A
+    conversation idle for ``ttl`` seconds is dropped on its next lookup,
+    and beyond ``max_sessions`` the least recently used one is evicted;
+    either way the next message reloads it from ChatbotSession. Per process.
+    """
+    def __init__(self, max_sessions=10000, ttl=1800):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._states = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = {'hits': 0, 'misses': 0, 'expired': 0, 'evicted': 0}
+
+    def get(self, session_id):
+        now = time.monotonic()
+        with self._lock:
+            state = self._states.get(session_id)
+            if state is None:
+                self.counters['misses'] += 1
+                return None
+            if now - state.last_seen > self.ttl:
+                del self._states[session_id]
+                self.counters['expired'] += 1
+                self.counters['misses'] += 1
+                return None
+            self._states.move_to_end(session_id)
+            state.last_seen = now
+            self.counters['hits'] += 1
+            return state
+
+    def put(self, state):
+        with self._lock:
+            self._states[state.session_id] = state
+            self._states.move_to_end(state.session_id)
+            while len(self._states) > self.max_sessions:
+                self._states.popitem(last=False)
+                self.counters['evicted'] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+            stats['active'] = len(self._states)
+        return stats
+
+
+def write_chatbot_messages(entries):
+    """
+    Persist a batch of buffered (ChatbotMessage, session fields) entries and
+    bring each session's last_activity, and any contact details collected
+    in the conversation, up to date. Messages for sessions deleted since
+    they were buffered (e.g. from the admin) are dropped.
+    """
+    session_ids = {message.session_id for message, _ in entries}
+    live = set(ChatbotSession.objects.filter(pk__in=session_ids).values_list('pk', flat=True))
+    if len(live) < len(session_ids):
+        kept = [(message, fields) for message, fields in entries if message.session_id in live]
+        logger.info(f'Dropped {len(entries) - len(kept)} chatbot messages for deleted sessions')
+        entries = kept
+        if not entries:
+            return
+    updates = {}
+    for message, fields in entries:
+        session_fields = updates.setdefault(message.session_id, {})
+        session_fields.update(fields)
+        session_fields['last_activity'] = max(message.created_at,
+                                              session_fields.get('last_activity', message.created_at))
+    with transaction.atomic():
+        ChatbotMessage.objects.bulk_create([message for message, _ in entries], batch_size=len(entries))
+        for pk, fields in updates.items():
+            activity = fields.pop('last_activity')
+            ChatbotSession.objects.filter(pk=pk).update(last_activity=activity)
+            for field, value in fields.items():
+                # Never overwrite details the visitor gave when starting the chat
+                empty = Q(**{f'{field}__isnull': True}) | Q(**{field: ''})
+                ChatbotSession.objects.filter(empty, pk=pk).update(**{field: value})
+    logger.debug(f'Flushed {len(entries)} chatbot messages for {len(updates)} sessions')
+
+
+chatbot_message_buffer = BatchBuffer(
+    'chatbotmessages',
+    write_chatbot_messages,
+    batch_size=getattr(settings, 'CHATBOT_MESSAGE_BATCH_SIZE', 200),
+    flush_interval=getattr(settings, 'CHATBOT_MESSAGE_FLUSH_INTERVAL', 2.0),
+    max_pending=getattr(settings, 'CHATBOT_MESSAGE_MAX_PENDING', 10000),
+)
+
+session_cache = SessionCache(
+    max_sessions=getattr(settings, 'CHATBOT_SESSION_CACHE_SIZE', 10000),
+    ttl=getattr(settings, 'CHATBOT_SESSION_TTL', 1800),
+)
+
+
+def remember_session(session):
+    """Cache a newly started ChatbotSession; returns its ConversationState"""
+    state = ConversationState.from_session(session)
+    session_cache.put(state)
+    return state
+
+
+def get_conversation(session_id):
+    """ConversationState for ``session_id``, loaded from ChatbotSession on a cache miss; None if unknown"""
+    state = session_cache.get(session_id)
+    if state is None:
+        session = ChatbotSession.objects.filter(session_id=session_id).first()
+        if session is None:
+            return None
+        state = remember_session(session)
+    return state
+
+
+def record_turn(state, message, response):
+    """
+    Queue the visitor's message and the bot's reply for the next batched
+    write, with any email or phone number the message gave for the session row
+    """
+    fields = state.collect(message)
+    state.turns += 1
+    now = timezone.now()
+    chatbot_message_buffer.add((ChatbotMessage(session_id=state.pk, message=message, is_user=True,
+                                               created_at=now), fields))
+    # A microsecond later, so the reply always sorts after the message
+    chatbot_message_buffer.add((ChatbotMessage(session_id=state.pk, message=response, is_user=False,
+                                               created_at=now + timedelta(microseconds=1)), {}))
+
+
+def chatbot_stats():
+    """Session cache and message buffer counters for this worker process"""
+    return {'sessions': session_cache.stats(), 'messages': chatbot_message_buffer.stats()}
@@ -1,9 +1,13 @@
+import logging
+
 from django.conf import settings
-from django.core.mail import send_mail
+from django.core.mail import send_mail, EmailMessage, get_connection
 from django.template.loader import render_to_string
 from django.utils.html import strip_tags
 from django.conf import settings
 
+logger = logging.getLogger(__name__)
+
 def site_info(request):
     """Add site information to all templates"""
     return {
@@ -19,6 +23,54 @@ def site_info(request):
         'SITE_INSTAGRAM': getattr(settings, 'SITE_INSTAGRAM', 'https://instagram.com'),
         'DEBUG': settings.DEBUG,
     }
+# Form fields that never belong in a notification
+EXCLUDED_FIELDS = ['csrfmiddletoken', 'captcha', 'g-recaptcha-response', 'honeypot']
+
+def send_form_email(form_type, form_data):
+    """
+    Send the admin notification and user acknowledgement for a form
+    submission over a single SMTP connection. Raises if the admin
+    notification fails, so the outbox can retry it; a failed
+    acknowledgement (a refused visitor address, say) is only logged, so a
+    retry never sends the admin notification twice.
+    """
+    subject = f'New {form_type} Submission - {settings.SITE_NAME}'
+    
+    # Create email content
+    content = f"""
+    New {form_type} Submission:
+    
+    Details:
+    """
+    
+    for key, value in form_data.items():
+        if key not in EXCLUDED_FIELDS:
+            content += f"{key.replace('_', ' ').title()}: {value}\n"
+    
+    notification = EmailMessage(subject, content, settings.DEFAULT_FROM_EMAIL, [settings.SITE_EMAIL])
+    confirmation = None
+    
+    # Confirmation to user if email provided
+    if form_data.get('email'):
+        user_subject = f'Thank you for contacting {settings.SITE_NAME}'
+        user_content = f"""
+        Dear {form_data.get('name', 'User')},
+        
+        Thank you for your submission. We have received your {form_type} and will contact you within 24 hours.
+        
+        Best regards,
+        {settings.SITE_NAME} Team
+        """
+        confirmation = EmailMessage(user_subject, user_content, settings.DEFAULT_FROM_EMAIL, [form_data['email']])
+    
+    with get_connection() as connection:
+        connection.send_messages([notification])
+        if confirmation is not None:
+            try:
+                connection.send_messages([confirmation])
+            except Exception as e:
+                logger.warning(f'{form_type} confirmation to {form_data["email"]} not sent: {str(e)}')
+
 def send_form_submission_email(form_type, data):
     """Send email notification for form submissions"""
     try:
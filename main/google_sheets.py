@@ -1,50 +1,175 @@
 import gspread
-from oauth2client.service_account import ServiceAccountCredentials
+from gspread.http_client import HTTPClient
+from gspread.urls import SPREADSHEETS_API_V4_BASE_URL
+from google.auth.exceptions import RefreshError
+from google.oauth2.service_account import Credentials
 from django.conf import settings
 import logging
+import os
+import threading
+import time
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
+SCOPES = [
+    'https://spreadsheets.google.com/feeds',
+    'https://www.googleapis.com/auth/drive'
+]
+
+class SheetsHTTPClient(HTTPClient):
+    """gspread HTTP client that can be pointed at another Sheets API host (e.g. a local fake)"""
+    base_url = None
+    
+    def request(self, method, endpoint, *args, **kwargs):
+        if self.base_url and endpoint.startswith(SPREADSHEETS_API_V4_BASE_URL):
+            endpoint = self.base_url.rstrip('/') + endpoint[len(SPREADSHEETS_API_V4_BASE_URL):]
+        return super().request(method, endpoint, *args, **kwargs)
+
+def authorize(credentials=None):
+    """Build an authorized gspread client, by default from the service account file"""
+    if credentials is None:
+        credentials = Credentials.from_service_account_file(
+            str(settings.GOOGLE_SHEETS_CREDENTIALS), scopes=SCOPES
+        )
+    client = gspread.Client(auth=credentials, http_client=SheetsHTTPClient)
+    client.http_client.base_url = getattr(settings, 'GOOGLE_SHEETS_API_URL', '') or None
+    return client
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: ``rate`` tokens per second, holding at most
+    ``capacity``. ``acquire`` blocks until enough tokens are available.
+    """
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self.tokens = self.capacity
+        self.waited = 0.0
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def acquire(self, tokens=1):
+        """Take ``tokens`` from the bucket; returns the seconds spent waiting"""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    self.waited += waited
+                    return waited
+                delay = (tokens - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+# Sheets API write quota is per minute; stay under it in this process
+write_limiter = TokenBucket(
+    getattr(settings, 'GOOGLE_SHEETS_WRITES_PER_MINUTE', 60) / 60.0,
+    getattr(settings, 'GOOGLE_SHEETS_WRITE_BURST', 10),
+)
+
+class SheetsClient:
+    """
+    Process-wide Google Sheets client. Credentials are loaded and authorized
+    once; google-auth refreshes the access token only when it expires. The
+    Spreadsheet and Worksheet handles are cached and dropped after any error,
+    so the next call starts from fresh metadata.
+    """
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._client = None
+        self._spreadsheet = None
+        self._worksheets = {}
+        self._pid = os.getpid()
+    
+    def spreadsheet(self):
+        with self._lock:
+            self._check_fork()
+            if self._client is None:
+                self._client = authorize()
+            if self._spreadsheet is None:
+                self._spreadsheet = self._client.open_by_key(settings.GOOGLE_SHEET_ID)
+            return self._spreadsheet
+    
+    def worksheet(self, sheet_name):
+        with self._lock:
+            self._check_fork()
+            if sheet_name not in self._worksheets:
+                # One metadata request caches every worksheet handle
+                spreadsheet = self.spreadsheet()
+                self._worksheets = {ws.title: ws for ws in spreadsheet.worksheets()}
+                if sheet_name not in self._worksheets:
+                    raise gspread.exceptions.WorksheetNotFound(sheet_name)
+            return self._worksheets[sheet_name]
+    
+    def invalidate(self, credentials=False):
+        """Drop cached handles (and the authorized client if ``credentials``)"""
+        with self._lock:
+            self._spreadsheet = None
+            self._worksheets = {}
+            if credentials:
+                self._client = None
+    
+    def call(self, sheet_name, func, throttle=True):
+        """
+        Run one write, ``func(worksheet)`` (or ``func(spreadsheet)`` when
+        ``sheet_name`` is None), within the write quota unless the caller
+        already waited for it. The cached handles are invalidated if it fails.
+        """
+        if throttle:
+            write_limiter.acquire()
+        try:
+            target = self.spreadsheet() if sheet_name is None else self.worksheet(sheet_name)
+            return func(target)
+        except Exception as e:
+            status = getattr(getattr(e, 'response', None), 'status_code', None)
+            self.invalidate(credentials=isinstance(e, RefreshError) or status in (401, 403))
+            raise
+    
+    def _check_fork(self):
+        # A forked worker must not share the parent's HTTP session
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._client = None
+            self._spreadsheet = None
+            self._worksheets = {}
+
+sheets_client = SheetsClient()
+
 def get_google_sheet():
-    """Initialize and return Google Sheets client"""
+    """Return the (cached) spreadsheet handle"""
     try:
-        scope = [
-            'https://spreadsheets.google.com/feeds',
-            'https://www.googleapis.com/auth/drive'
-        ]
-        
-        creds = ServiceAccountCredentials.from_json_keyfile_name(
-            settings.GOOGLE_SHEETS_CREDENTIALS, scope
-        )
-        
-        client = gspread.authorize(creds)
-        return client.open_by_key(settings.GOOGLE_SHEET_ID)
+        return sheets_client.spreadsheet()
     except Exception as e:
         logger.error(f"Failed to connect to Google Sheets: {str(e)}")
+        sheets_client.invalidate(credentials=True)
         return None
 
+def form_row(data, timestamp=None):
+    """Sheet row for one form submission"""
+    return [
+        timestamp or datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        data.get('name', ''),
+        data.get('email', ''),
+        data.get('phone', ''),
+        str(data)
+    ]
+
+def append_form_row(sheet_name, data, timestamp=None):
+    """Append one form submission to its worksheet. Raises on failure"""
+    row_data = form_row(data, timestamp)
+    
+    # Append to sheet
+    sheets_client.call(sheet_name, lambda worksheet: worksheet.append_row(row_data))
+    logger.info(f"Data saved to Google Sheets: {sheet_name}")
+
 def save_to_google_sheet(sheet_name, data):
     """Save form data to Google Sheets"""
     try:
-        sheet = get_google_sheet()
-        if not sheet:
-            return False
-        
-        worksheet = sheet.worksheet(sheet_name)
-        
-        # Prepare row data
-        row_data = [
-            datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-            data.get('name', ''),
-            data.get('email', ''),
-            data.get('phone', ''),
-            str(data)
-        ]
-        
-        # Append to sheet
-        worksheet.append_row(row_data)
-        logger.info(f"Data saved to Google Sheets: {sheet_name}")
+        append_form_row(sheet_name, data)
         return True
         
     except Exception as e:
@@ -72,7 +197,8 @@ def initialize_google_sheets():
                 sheet.add_worksheet(title=sheet_name, rows=1000, cols=10)
                 
                 # Add headers
-                worksheet = sheet.worksheet(sheet_name)
+                sheets_client.invalidate()
+                worksheet = sheets_client.worksheet(sheet_name)
                 headers = ['Timestamp', 'Name', 'Email', 'Phone', 'Data']
                 worksheet.append_row(headers)
                 
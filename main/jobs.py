@@ -0,0 +1,80 @@
+"""Handlers for the outbound job kinds queued through main.outbox"""
+from django.apps import apps
+
+from .email_service import send_form_email
+from .google_sheets import append_form_row, form_row
+from .outbox import batch_job_handler, job_handler
+from .sheets_sync import mark_outcomes, sync_rows, synced_pks
+from . import signals
+
+
+@job_handler('form_email')
+def form_email(payload):
+    send_form_email(payload['form_type'], payload['data'])
+
+
+def _submission(payload):
+    """(model, pk) of the stored submission a sheets_append job was queued for"""
+    if 'model' not in payload:
+        return None
+    return apps.get_model('main', payload['model']), payload['pk']
+
+
+@job_handler('sheets_append')
+def sheets_append(payload):
+    submission = _submission(payload)
+    if submission and synced_pks(submission[0], [submission[1]]):
+        # Already written by sync_unsynced
+        return
+    try:
+        append_form_row(payload['sheet_name'], payload['data'], payload.get('timestamp'))
+    except Exception as e:
+        if submission:
+            mark_outcomes({0: submission}, {0: e})
+        raise
+    if submission:
+        mark_outcomes({0: submission}, {})
+
+
+@batch_job_handler('sheets_append')
+def sheets_append_batch(jobs, report=None):
+    """Append the rows of many queued jobs with as few Sheets API calls as possible"""
+    submissions = {job.pk: _submission(job.payload) for job in jobs}
+    pks_by_model = {}
+    for submission in filter(None, submissions.values()):
+        pks_by_model.setdefault(submission[0], []).append(submission[1])
+    # Rows sync_unsynced already wrote need no second append
+    done = {(model, pk) for model, pks in pks_by_model.items() for pk in synced_pks(model, pks)}
+
+    items = []
+    for job in jobs:
+        submission = submissions[job.pk]
+        if submission in done:
+            continue
+        if submission:
+            done.add(submission)
+        items.append((job.pk, job.payload['sheet_name'],
+                      form_row(job.payload['data'], job.payload.get('timestamp'))))
+    errors = sync_rows(items, report=report) if items else {}
+    mark_outcomes({key: submissions[key] for key, _, _ in items if submissions[key]}, errors)
+    return errors
+
+
+# model name -> notification sent when a row of that model is created
+MODEL_EMAILS = {
+    'contactmessage': signals.send_contact_confirmation_email,
+    'subscriber': signals.send_subscription_confirmation_email,
+    'serviceinquiry': signals.send_service_inquiry_email,
+    'proposalrequest': signals.send_proposal_request_email,
+    'careerapplication': signals.send_career_application_email,
+}
+
+
+@job_handler('model_email')
+def model_email(payload):
+    model = apps.get_model('main', payload['model'])
+    instance = model.objects.filter(pk=payload['pk']).first()
+    if instance is None:
+        # Deleted (e.g. as spam) before the notification went out
+        return
+    MODEL_EMAILS[payload['model']](instance)
@@ -0,0 +1,151 @@
+import atexit
+import logging
+import os
+import smtplib
+import ssl
+import threading
+import time
+
+from django.conf import settings
+from django.core.mail.backends.smtp import EmailBackend
+
+logger = logging.getLogger(__name__)
+
+# Errors that mean the SMTP session is gone and a fresh one may succeed
+DISCONNECT_ERRORS = (smtplib.SMTPServerDisconnected, ConnectionError, ssl.SSLError, TimeoutError)
+
+
+class SMTPConnectionPool:
+    """
+    Process-wide pool of authenticated SMTP sessions, keyed by server and
+    credentials. Idle sessions are reused LIFO, probed with NOOP when they
+    have been idle for a while and closed once past the idle timeout.
+    """
+    def __init__(self):
+        self._idle = {}
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    @property
+    def max_idle(self):
+        return getattr(settings, 'EMAIL_POOL_SIZE', 2)
+
+    @property
+    def idle_timeout(self):
+        return getattr(settings, 'EMAIL_POOL_IDLE_TIMEOUT', 120)
+
+    @property
+    def check_after(self):
+        return getattr(settings, 'EMAIL_POOL_CHECK_AFTER', 10)
+
+    def acquire(self, key):
+        """Return a live pooled connection for ``key``, or None"""
+        while True:
+            with self._lock:
+                self._check_fork()
+                idle = self._idle.get(key)
+                if not idle:
+                    return None
+                connection, released_at = idle.pop()
+
+            idle_for = time.monotonic() - released_at
+            if idle_for > self.idle_timeout:
+                self.discard(connection)
+                continue
+            if idle_for > self.check_after and not self._is_alive(connection):
+                self.discard(connection)
+                continue
+            return connection
+
+    def release(self, key, connection):
+        with self._lock:
+            self._check_fork()
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_idle:
+                idle.append((connection, time.monotonic()))
+                return
+        self.discard(connection)
+
+    def discard(self, connection):
+        try:
+            connection.quit()
+        except Exception:
+            try:
+                connection.close()
+            except Exception:
+                pass
+
+    def close_all(self):
+        with self._lock:
+            pooled = [conn for idle in self._idle.values() for conn, _ in idle]
+            self._idle.clear()
+        for connection in pooled:
+            self.discard(connection)
+
+    def _is_alive(self, connection):
+        try:
+            return connection.noop()[0] == 250
+        except Exception:
+            return False
+
+    def _check_fork(self):
+        # Sockets inherited from a parent process must not be shared
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._idle = {}
+
+
+connection_pool = SMTPConnectionPool()
+atexit.register(connection_pool.close_all)
+
+
+class PooledEmailBackend(EmailBackend):
+    """
+    SMTP backend that keeps authenticated connections warm between sends
+    instead of doing connect + STARTTLS + AUTH for every message. A message
+    that hits a dropped session is retried once on a fresh connection.
+    """
+    @property
+    def pool_key(self):
+        return (self.host, self.port, self.username, self.use_tls, self.use_ssl)
+
+    def open(self):
+        if self.connection:
+            return False
+        pooled = connection_pool.acquire(self.pool_key)
+        if pooled is not None:
+            self.connection = pooled
+            return True
+        return super().open()
+
+    def close(self):
+        """Hand the connection back to the pool instead of quitting"""
+        if self.connection is None:
+            return
+        connection, self.connection = self.connection, None
+        connection_pool.release(self.pool_key, connection)
+
+    def reconnect(self):
+        if self.connection is not None:
+            connection_pool.discard(self.connection)
+            self.connection = None
+        return super().open()
+
+    def _send(self, email_message):
+        fail_silently, self.fail_silently = self.fail_silently, False
+        try:
+            if self.connection is None:
+                # An earlier reconnect in this batch failed
+                super().open()
+            try:
+                return super()._send(email_message)
+            except DISCONNECT_ERRORS as e:
+                logger.info(f'SMTP connection lost ({str(e)}), reconnecting')
+                self.reconnect()
+                return super()._send(email_message)
+        except (smtplib.SMTPException, OSError):
+            if not fail_silently:
+                raise
+            return False
+        finally:
+            self.fail_silently = fail_silently
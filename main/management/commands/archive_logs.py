@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+from ...archive import ARCHIVED_MODELS, archive_expired, archive_root, retention_days
+
+class Command(BaseCommand):
+    help = 'Move expired PageView/SecurityLog rows into compressed daily archive files'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--model',
+            type=str,
+            choices=['all'] + list(ARCHIVED_MODELS),
+            default='all',
+            help='Specify which log table to archive'
+        )
+        parser.add_argument(
+            '--days',
+            type=int,
+            help='Archive rows older than this many days (defaults to the retention setting)'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help='Rows archived and deleted per transaction'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report how many rows would be archived'
+        )
+    
+    def handle(self, *args, **options):
+        names = list(ARCHIVED_MODELS) if options['model'] == 'all' else [options['model']]
+        
+        for name in names:
+            days = options['days'] if options['days'] is not None else retention_days(name)
+            count = archive_expired(name, days, options['chunk_size'], options['dry_run'])
+            if options['dry_run']:
+                self.stdout.write(f'{name}: {count} rows older than {days} days would be archived')
+            else:
+                self.stdout.write(self.style.SUCCESS(
+                    f'{name}: archived {count} rows older than {days} days to {archive_root() / name}'
+                ))
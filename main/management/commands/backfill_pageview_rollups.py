@@ -0,0 +1,76 @@
+from datetime import datetime, time, timedelta
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from ...models import PageView, PageViewHourly, PageViewDaily, ReferrerDaily
+from ...pageviews import page_view_buffer
+from ...rollups import RollupBatch
+
+class Command(BaseCommand):
+    help = 'Rebuild the hourly/daily page view rollups from raw PageView rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=30,
+            help='Number of days to rebuild, counting back from today (0 = all history)'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=5000,
+            help='Raw rows fetched per database round-trip'
+        )
+
+    def handle(self, *args, **options):
+        days = options['days']
+        chunk_size = options['chunk_size']
+
+        # A buffered view can reach the database a few flush intervals (and
+        # retries) after it happened, so only days that ended before then are
+        # complete; later days stay with the incremental path
+        settle = page_view_buffer.flush_interval * (page_view_buffer.max_retries + 2)
+        end_date = timezone.localdate(timezone.now() - timedelta(seconds=settle))
+        if days:
+            start_date = timezone.localdate() - timedelta(days=days - 1)
+        else:
+            first = PageView.objects.order_by('viewed_at').values_list('viewed_at', flat=True).first()
+            start_date = timezone.localdate(first) if first else end_date
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilding page view rollups from {start_date} up to {end_date} (not included)...'
+        ))
+
+        scanned = rebuilt = 0
+        day = start_date
+        while day < end_date:
+            count = self.rebuild_day(day, chunk_size)
+            if count:
+                scanned += count
+                rebuilt += 1
+            day += timedelta(days=1)
+
+        self.stdout.write(self.style.SUCCESS(f'Scanned {scanned} page views into the rollups of {rebuilt} days'))
+
+    def rebuild_day(self, day, chunk_size):
+        """Replace one day's rollups with counts from its raw rows. Returns the rows scanned"""
+        start = timezone.make_aware(datetime.combine(day, time.min))
+        end = timezone.make_aware(datetime.combine(day + timedelta(days=1), time.min))
+        rows = (PageView.objects.order_by().filter(viewed_at__gte=start, viewed_at__lt=end)
+                .values_list('page_url', 'ip_address', 'referrer', 'viewed_at'))
+        # Scan and replace in one transaction, so the day is swapped whole
+        with transaction.atomic():
+            batch = RollupBatch()
+            scanned = 0
+            for page_url, ip_address, referrer, viewed_at in rows.iterator(chunk_size=chunk_size):
+                batch.add(page_url, ip_address, referrer, viewed_at)
+                scanned += 1
+            if not scanned:
+                # Raw rows already pruned (see prune_logs): the rollups are all that is left
+                return 0
+            PageViewHourly.objects.filter(hour__gte=start, hour__lt=end).delete()
+            PageViewDaily.objects.filter(date=day).delete()
+            ReferrerDaily.objects.filter(date=day).delete()
+            batch.apply()
+        return scanned
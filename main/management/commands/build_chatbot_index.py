@@ -0,0 +1,92 @@
+import json
+import os
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+from ...chatbot_ai import site_placeholders
+from ...retrieval import Passage, SearchIndex, template_passages, write_index
+from ...timing import summarize, time_calls
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(__file__), '..', '..', 'templates')
+
+# Pages indexed besides services/<slug>.html: template -> URL name
+PAGES = {
+    'about.html': 'about',
+    'support.html': 'support',
+}
+
+# Unmatched questions the index should answer, for the latency report
+SAMPLE_QUESTIONS = [
+    'do you do penetration testing', 'can you migrate us to the cloud', 'firewall configuration',
+    'what about business intelligence dashboards', 'do you build ecommerce stores', 'vpn setup',
+    'can you run our ppc ads', 'help with compliance', 'predictive models', 'tell me about your values',
+]
+
+
+class Command(BaseCommand):
+    help = 'Build the chatbot search index from the service pages and the chatbot knowledge base'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output',
+            default=None,
+            help='Index file to write (default: CHATBOT_INDEX_PATH)'
+        )
+        parser.add_argument(
+            '--max-lines',
+            type=int,
+            default=6,
+            help='Lines of a page section quoted in an answer'
+        )
+
+    def page_passages(self, max_lines):
+        passages = []
+        services_dir = os.path.join(TEMPLATE_DIR, 'services')
+        for name in sorted(os.listdir(services_dir)):
+            if name.endswith('.html'):
+                url = reverse('service_detail', args=[name[:-len('.html')]])
+                passages += template_passages(os.path.join(services_dir, name), url, max_lines)
+        for name, url_name in PAGES.items():
+            passages += template_passages(os.path.join(TEMPLATE_DIR, name), reverse(url_name), max_lines)
+        return passages
+
+    def knowledge_passages(self):
+        """One passage per knowledge base intent, answered with its first response"""
+        with open(settings.CHATBOT_KB_PATH, encoding='utf-8') as f:
+            kb = json.load(f)
+        placeholders = site_placeholders()
+        passages = []
+        for intent in kb.get('intents', []):
+            responses = intent['responses']
+            responses = [responses] if isinstance(responses, str) else responses
+            answer = responses[0].format_map(placeholders)
+            text = '\n'.join(intent.get('keywords', []) + [r.format_map(placeholders) for r in responses])
+            passages.append(Passage(intent['name'], text, answer, 'knowledge base'))
+        return passages
+
+    def handle(self, *args, **options):
+        path = options['output'] or settings.CHATBOT_INDEX_PATH
+        began = time.perf_counter()
+        passages = self.page_passages(options['max_lines']) + self.knowledge_passages()
+        if not passages:
+            raise CommandError('Nothing to index')
+        terms, postings = write_index(passages, path)
+        elapsed = time.perf_counter() - began
+        self.stdout.write(self.style.SUCCESS(
+            f'Wrote {path}: {len(passages)} passages, {terms} terms, {postings} postings, '
+            f'{os.path.getsize(path) / 1024:.1f} KB in {elapsed * 1e3:.0f} ms'
+        ))
+
+        index = SearchIndex(path)
+        min_score = settings.CHATBOT_RETRIEVAL_MIN_SCORE
+        for question in SAMPLE_QUESTIONS:
+            hits = index.search(question)
+            if hits:
+                score, doc = hits[0]
+                title = index.passages[doc][0]
+                mark = '' if score >= min_score else '  (below CHATBOT_RETRIEVAL_MIN_SCORE)'
+                self.stdout.write(f'  {question!r}: {title} [{score:.2f}]{mark}')
+            else:
+                self.stdout.write(f'  {question!r}: no match')
+        self.stdout.write(f'  per query: {summarize(time_calls(index.search, SAMPLE_QUESTIONS, 200))}')
@@ -0,0 +1,74 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+from ...models import (
+    ContactMessage, Subscriber, ServiceInquiry, ProposalRequest,
+    CareerApplication, PageView, SecurityLog, ChatbotSession, ChatbotMessage,
+    SUBMITTED_AT_FIELDS
+)
+
+class Command(BaseCommand):
+    help = 'EXPLAIN the hot dashboard, per-IP and admin list queries and check they use their indexes'
+    
+    def get_checks(self):
+        """(label, queryset, index the plan must use)"""
+        now = timezone.now()
+        day_ago = now - timedelta(days=1)
+        ip = '203.0.113.7'
+        
+        checks = [
+            ('dashboard: security events today',
+             SecurityLog.objects.filter(created_at__gte=day_ago), 'securitylog_date_idx'),
+            ('dashboard: security events by type',
+             SecurityLog.objects.filter(event_type='bot', created_at__gte=day_ago), 'securitylog_type_date_idx'),
+            ('dashboard: recent contacts',
+             ContactMessage.objects.filter(date_sent__gte=day_ago), 'contact_date_idx'),
+            # count() drops the default ordering, so check the unordered plan
+            ('context: unread contacts',
+             ContactMessage.objects.filter(is_verified=False, is_spam=False).order_by(), 'contact_unread_idx'),
+            ('chatbot: returning user lookup',
+             ChatbotSession.objects.filter(email='user@example.com'), 'chatsession_email_idx'),
+            ('chatbot: session transcript',
+             ChatbotMessage.objects.filter(session_id=1).order_by('created_at'), 'chatmessage_session_idx'),
+            ('admin list: contact messages',
+             ContactMessage.objects.order_by('-date_sent')[:50], 'contact_date_idx'),
+            ('admin list: security logs',
+             SecurityLog.objects.order_by('-created_at')[:50], 'securitylog_date_idx'),
+            ('admin list: page views',
+             PageView.objects.order_by('-viewed_at')[:50], 'pageview_date_idx'),
+            ('retention: expired page views',
+             PageView.objects.filter(viewed_at__lt=day_ago).order_by('viewed_at'), 'pageview_date_idx'),
+        ]
+        
+        for model, field in SUBMITTED_AT_FIELDS.items():
+            index = next(i.name for i in model._meta.indexes if i.fields == ['ip_address', field])
+            checks.append((
+                f'submissions per IP: {model.__name__}',
+                model.objects.filter(ip_address=ip, **{f'{field}__gte': day_ago}),
+                index,
+            ))
+        return checks
+    
+    def handle(self, *args, **options):
+        failures = []
+        
+        for label, queryset, index in self.get_checks():
+            with transaction.atomic():
+                if connection.vendor == 'postgresql':
+                    # Tiny tables make a sequential scan the cheapest plan; forbid it
+                    # so the plan shows whether the index is usable at all
+                    with connection.cursor() as cursor:
+                        cursor.execute('SET LOCAL enable_seqscan = off')
+                plan = queryset.explain()
+            
+            if index in plan:
+                self.stdout.write(self.style.SUCCESS(f'OK    {label} -> {index}'))
+            else:
+                failures.append(label)
+                self.stdout.write(self.style.ERROR(f'FAIL  {label}: expected {index}'))
+                self.stdout.write(f'      {plan}')
+        
+        if failures:
+            raise CommandError(f'{len(failures)} queries do not use their index')
+        self.stdout.write(self.style.SUCCESS(f'All queries use their indexes ({connection.vendor})'))
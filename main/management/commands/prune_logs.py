@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+from ...archive import ARCHIVED_MODELS, prune_expired, retention_days
+
+class Command(BaseCommand):
+    help = 'Delete expired PageView/SecurityLog rows without archiving them'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--model',
+            type=str,
+            choices=['all'] + list(ARCHIVED_MODELS),
+            default='all',
+            help='Specify which log table to prune'
+        )
+        parser.add_argument(
+            '--days',
+            type=int,
+            help='Delete rows older than this many days (defaults to the retention setting)'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help='Rows deleted per transaction'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report how many rows would be deleted'
+        )
+    
+    def handle(self, *args, **options):
+        names = list(ARCHIVED_MODELS) if options['model'] == 'all' else [options['model']]
+        
+        for name in names:
+            days = options['days'] if options['days'] is not None else retention_days(name)
+            count = prune_expired(name, days, options['chunk_size'], options['dry_run'])
+            if options['dry_run']:
+                self.stdout.write(f'{name}: {count} rows older than {days} days would be deleted')
+            else:
+                self.stdout.write(self.style.SUCCESS(f'{name}: deleted {count} rows older than {days} days'))
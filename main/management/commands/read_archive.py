@@ -0,0 +1,31 @@
+import json
+from datetime import date
+from django.core.management.base import BaseCommand
+from django.core.serializers.json import DjangoJSONEncoder
+from ...archive import ARCHIVED_MODELS, archived_days, iter_archive
+
+class Command(BaseCommand):
+    help = 'Read archived log rows back as JSON lines for ad-hoc analysis'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('model', choices=list(ARCHIVED_MODELS))
+        parser.add_argument('--since', type=date.fromisoformat, help='First local date (YYYY-MM-DD)')
+        parser.add_argument('--until', type=date.fromisoformat, help='Last local date (YYYY-MM-DD)')
+        parser.add_argument(
+            '--count',
+            action='store_true',
+            help='Print the number of archived rows per day instead of the rows'
+        )
+    
+    def handle(self, *args, **options):
+        name = options['model']
+        since, until = options['since'], options['until']
+        
+        if options['count']:
+            for day in archived_days(name, since, until):
+                rows = sum(1 for _ in iter_archive(name, day, day))
+                self.stdout.write(f'{day}\t{rows}')
+            return
+        
+        for row in iter_archive(name, since, until):
+            self.stdout.write(json.dumps(row, cls=DjangoJSONEncoder))
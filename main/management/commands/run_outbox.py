@@ -0,0 +1,72 @@
+import signal
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.utils import timezone
+from ...models import OutboundJob
+from ...outbox import run_pending
+
+class Command(BaseCommand):
+    help = 'Drain the outbound job queue (emails, Google Sheets) with retries and dead-lettering'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Run until the queue has no due jobs, then exit'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=20,
+            help='Jobs claimed per round'
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=2.0,
+            help='Seconds to wait when no jobs are due'
+        )
+        parser.add_argument(
+            '--purge-done-days',
+            type=int,
+            default=7,
+            help='Delete completed jobs older than this many days (0 keeps them)'
+        )
+    
+    def handle(self, *args, **options):
+        self.running = True
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        
+        self.purge(options['purge_done_days'])
+        self.stdout.write(self.style.SUCCESS('Outbox worker started'))
+        
+        total_ok = total_failed = 0
+        while self.running:
+            close_old_connections()
+            succeeded, failed = run_pending(options['batch_size'])
+            total_ok += succeeded
+            total_failed += failed
+            
+            if succeeded or failed:
+                continue
+            if options['once']:
+                break
+            time.sleep(options['sleep'])
+        
+        self.stdout.write(self.style.SUCCESS(
+            f'Outbox worker stopped: {total_ok} jobs done, {total_failed} failed attempts'
+        ))
+    
+    def stop(self, signum, frame):
+        # Finish the job in hand, then exit the loop
+        self.running = False
+    
+    def purge(self, days):
+        if days:
+            cutoff = timezone.now() - timedelta(days=days)
+            deleted, _ = OutboundJob.objects.filter(status='done', updated_at__lt=cutoff).delete()
+            if deleted:
+                self.stdout.write(f'Purged {deleted} completed jobs')
@@ -0,0 +1,46 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from ...jobs import sheets_append_batch
+from ...outbox import claim_jobs, record_batch
+from ...sheets_sync import SyncReport
+
+class Command(BaseCommand):
+    help = 'Flush queued Google Sheets rows in batches (e.g. to catch up after an outage)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=getattr(settings, 'GOOGLE_SHEETS_CHUNK_SIZE', 500),
+            help='Queued rows claimed and appended per round'
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=0,
+            help='Stop after this many rows (0 = until the queue is empty)'
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = max(1, options['chunk_size'])
+        limit = options['limit']
+        report = SyncReport()
+        succeeded = failed = 0
+
+        while not limit or succeeded + failed < limit:
+            size = min(chunk_size, limit - succeeded - failed) if limit else chunk_size
+            jobs = claim_jobs(size, kinds=['sheets_append'])
+            if not jobs:
+                break
+
+            try:
+                errors = sheets_append_batch(jobs, report=report)
+            except Exception as e:
+                errors = {job.pk: e for job in jobs}
+            ok, bad = record_batch(jobs, errors)
+            succeeded += ok
+            failed += bad
+
+        self.stdout.write(self.style.SUCCESS(f'Google Sheets sync: {report.summary()}'))
+        if failed:
+            self.stdout.write(self.style.ERROR(f'{failed} rows failed and were rescheduled'))
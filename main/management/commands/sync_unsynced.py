@@ -1,19 +1,15 @@
 from django.core.management.base import BaseCommand
 from django.utils import timezone
-from ...models import (
-    ContactMessage, Subscriber, ServiceInquiry, 
-    ProposalRequest, CareerApplication
-)
-from ...google_sheets import sync_to_google_sheets
+from ...sheets_sync import SYNCED_MODELS, sync_models
 
 class Command(BaseCommand):
     help = 'Sync unsynced records to Google Sheets'
-    
+
     def add_arguments(self, parser):
         parser.add_argument(
             '--model',
             type=str,
-            choices=['all', 'contacts', 'subscribers', 'inquiries', 'proposals', 'applications'],
+            choices=['all'] + list(SYNCED_MODELS),
             default='all',
             help='Specify which model to sync'
         )
@@ -21,67 +17,48 @@ class Command(BaseCommand):
             '--limit',
             type=int,
             default=100,
-            help='Maximum number of records to sync'
+            help='Maximum number of records to sync per model'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=None,
+            help='Rows per Sheets API request (default: GOOGLE_SHEETS_CHUNK_SIZE)'
         )
-    
+        parser.add_argument(
+            '--serial',
+            action='store_true',
+            help='Sync one model at a time instead of all models in parallel'
+        )
+
     def handle(self, *args, **options):
         model_type = options['model']
-        limit = options['limit']
-        
+        names = list(SYNCED_MODELS) if model_type == 'all' else [model_type]
+
         self.stdout.write(self.style.SUCCESS(f'Syncing {model_type} records to Google Sheets...'))
-        
-        synced_count = 0
-        failed_count = 0
-        
-        # Sync based on model type
-        if model_type in ['all', 'contacts']:
-            contacts = ContactMessage.objects.filter(synced_to_google=False)[:limit]
-            for contact in contacts:
-                if sync_to_google_sheets('contact_messages', contact):
-                    synced_count += 1
-                else:
-                    failed_count += 1
-        
-        if model_type in ['all', 'subscribers']:
-            subscribers = Subscriber.objects.filter(synced_to_google=False)[:limit]
-            for subscriber in subscribers:
-                if sync_to_google_sheets('subscribers', subscriber):
-                    synced_count += 1
-                else:
-                    failed_count += 1
-        
-        if model_type in ['all', 'inquiries']:
-            inquiries = ServiceInquiry.objects.filter(synced_to_google=False)[:limit]
-            for inquiry in inquiries:
-                if sync_to_google_sheets('service_inquiries', inquiry):
-                    synced_count += 1
-                else:
-                    failed_count += 1
-        
-        if model_type in ['all', 'proposals']:
-            proposals = ProposalRequest.objects.filter(synced_to_google=False)[:limit]
-            for proposal in proposals:
-                if sync_to_google_sheets('proposal_requests', proposal):
-                    synced_count += 1
-                else:
-                    failed_count += 1
-        
-        if model_type in ['all', 'applications']:
-            applications = CareerApplication.objects.filter(synced_to_google=False)[:limit]
-            for application in applications:
-                if sync_to_google_sheets('career_applications', application):
-                    synced_count += 1
-                else:
-                    failed_count += 1
-        
+
+        reports = sync_models(
+            names, limit=options['limit'], chunk_size=options['chunk_size'],
+            parallel=not options['serial']
+        )
+
+        synced_count = failed_count = 0
+        for name, report in reports.items():
+            synced_count += report.rows
+            failed_count += len(report.errors)
+            self.stdout.write(f'  {name}: {report.summary()}')
+
         # Output results
+        elapsed = max(report.elapsed for report in reports.values())
         self.stdout.write(self.style.SUCCESS(f'Sync completed at {timezone.now()}'))
-        self.stdout.write(self.style.SUCCESS(f'Successfully synced: {synced_count}'))
-        
+        self.stdout.write(self.style.SUCCESS(
+            f'Successfully synced: {synced_count} ({synced_count / elapsed if elapsed else 0:.1f} rows/sec)'
+        ))
+
         if failed_count > 0:
             self.stdout.write(self.style.ERROR(f'Failed to sync: {failed_count}'))
             self.stdout.write(self.style.WARNING(
                 'Check your Google Sheets configuration and credentials.'
             ))
         else:
-            self.stdout.write(self.style.SUCCESS('All records synced successfully!'))
\ No newline at end of file
+            self.stdout.write(self.style.SUCCESS('All records synced successfully!'))
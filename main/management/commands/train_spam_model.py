@@ -0,0 +1,128 @@
+import hashlib
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from ...spam import SPAM_MODELS, KeywordMatcher, NaiveBayes, SpamFilter, features
+from ...timing import summarize, time_calls
+
+# The keyword list signals.check_spam_before_save used before main.spam,
+# evaluated alongside the new filter for comparison
+LEGACY_KEYWORDS = [
+    'buy now', 'click here', 'http://', 'https://', 'www.', '.com',
+    'urgent', 'asap', 'earn money', 'make money', 'work from home',
+    'investment', 'lottery', 'winner', 'prize', 'free', 'discount',
+    'viagra', 'cialis', 'pharmacy', 'drug', 'medication'
+]
+
+
+def legacy_is_spam(text):
+    text = text.lower()
+    return any(keyword in text for keyword in LEGACY_KEYWORDS)
+
+
+def in_test_split(pk, percent):
+    """Stable split: a row stays on the same side across runs"""
+    digest = hashlib.blake2b(str(pk).encode(), digest_size=4).digest()
+    return int.from_bytes(digest, 'big') % 100 < percent
+
+
+class Command(BaseCommand):
+    help = 'Train the spam model from admin spam labels and report precision, recall and latency'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--include-unreviewed',
+            action='store_true',
+            help='Also learn from rows no admin has labelled, taking their current is_spam as the label'
+        )
+        parser.add_argument(
+            '--test-percent',
+            type=int,
+            default=20,
+            help='Share of the labelled rows held out for the evaluation report'
+        )
+        parser.add_argument(
+            '--threshold',
+            type=float,
+            default=None,
+            help='Spam score threshold to evaluate at (default: SPAM_THRESHOLD)'
+        )
+        parser.add_argument(
+            '--min-count',
+            type=int,
+            default=2,
+            help='Ignore words seen in fewer labelled rows than this'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report only; do not write the model file'
+        )
+
+    def load_examples(self, include_unreviewed):
+        examples = []
+        for model, fields in SPAM_MODELS.items():
+            queryset = model.objects.all() if include_unreviewed else model.objects.filter(spam_reviewed=True)
+            for pk, is_spam, *values in queryset.values_list('pk', 'is_spam', *fields).iterator():
+                text = '\n'.join(str(value or '') for value in values)
+                examples.append((pk, text, is_spam))
+        return examples
+
+    def handle(self, *args, **options):
+        threshold = options['threshold'] if options['threshold'] is not None else settings.SPAM_THRESHOLD
+        examples = self.load_examples(options['include_unreviewed'])
+        spam = sum(1 for _, _, is_spam in examples if is_spam)
+        self.stdout.write(f'{len(examples)} labelled submissions: {spam} spam, {len(examples) - spam} not spam')
+        if not spam or spam == len(examples):
+            raise CommandError('Need both spam and not-spam labels; label submissions with the admin '
+                               'spam actions or pass --include-unreviewed')
+
+        matcher = KeywordMatcher()
+        docs = []
+        for pk, text, is_spam in examples:
+            lowered = text.lower()
+            docs.append((pk, text, features(lowered, matcher.find(lowered)), is_spam))
+
+        train = [doc for doc in docs if not in_test_split(doc[0], options['test_percent'])]
+        test = [doc for doc in docs if in_test_split(doc[0], options['test_percent'])]
+        if test and {doc[3] for doc in train} == {True, False}:
+            model = NaiveBayes.train([doc[2] for doc in train], [doc[3] for doc in train], min_count=options['min_count'])
+            self.stdout.write(f'Evaluating on {len(test)} held-out submissions (trained on {len(train)}), '
+                              f'threshold {threshold}')
+            self.report('legacy keywords', legacy_is_spam, test)
+            untrained = SpamFilter(matcher, None, threshold)
+            self.report('keyword weights', lambda text: untrained.score(text).is_spam, test)
+            trained = SpamFilter(matcher, model, threshold)
+            self.report('trained model', lambda text: trained.score(text).is_spam, test)
+        else:
+            self.stdout.write(self.style.WARNING('Too few labels for a held-out evaluation; training on everything'))
+
+        model = NaiveBayes.train([doc[2] for doc in docs], [doc[3] for doc in docs], min_count=options['min_count'])
+        if options['dry_run']:
+            self.stdout.write(f'Dry run: model with {len(model.weights)} features not written')
+            return
+        model.save(settings.SPAM_MODEL_PATH)
+        self.stdout.write(self.style.SUCCESS(
+            f'Wrote {settings.SPAM_MODEL_PATH} ({len(model.weights)} features, '
+            f'{model.meta["spam"]} spam / {model.meta["ham"]} not spam)'
+        ))
+
+    def report(self, label, predict, test):
+        tp = fp = fn = tn = 0
+        for _, text, _, is_spam in test:
+            predicted = predict(text)
+            if predicted and is_spam:
+                tp += 1
+            elif predicted:
+                fp += 1
+            elif is_spam:
+                fn += 1
+            else:
+                tn += 1
+        precision = tp / (tp + fp) if tp + fp else 0.0
+        recall = tp / (tp + fn) if tp + fn else 0.0
+        f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+        timings = time_calls(predict, [doc[1] for doc in test])
+        self.stdout.write(self.style.SUCCESS(label))
+        self.stdout.write(f'  precision {precision:.3f}  recall {recall:.3f}  F1 {f1:.3f}  '
+                          f'(tp {tp}, fp {fp}, fn {fn}, tn {tn})')
+        self.stdout.write(f'  per message: {summarize(timings)}')
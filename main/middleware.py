@@ -1,34 +1,244 @@
+import logging
+import random
+import secrets
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
 from django.conf import settings
+from django.http import HttpResponseForbidden
+from django.http.response import ResponseHeaders
+from django.middleware.security import SecurityMiddleware
+from django.utils.deprecation import MiddlewareMixin
+from ipware import get_client_ip
+
+from .blocklist import get_blocklist
+from .pageviews import record_page_view
+from .ratelimit import compile_policies, enforce
+from .security import is_bot_user_agent
+
+logger = logging.getLogger(__name__)
 
-class SecurityHeadersMiddleware:
+class BlocklistMiddleware:
     """
-    Middleware to add security headers to responses.
+    Rejects banned clients (see main.blocklist) with a 403 before any other
+    middleware runs, so they cost one trie lookup instead of sessions, form
+    parsing, views and log writes. Keep it first in MIDDLEWARE.
     """
     def __init__(self, get_response):
         self.get_response = get_response
-        
+        self.blocklist = get_blocklist()
+
     def __call__(self, request):
-        response = self.get_response(request)
-        
-        # Add security headers
-        response['X-Content-Type-Options'] = 'nosniff'
-        response['X-Frame-Options'] = 'DENY'
-        response['X-XSS-Protection'] = '1; mode=block'
-        
-        # Only add CSP in production (DEBUG=False)
-        if not settings.DEBUG:
-            # Content Security Policy - adjust based on your needs
-            csp = (
-                "default-src 'self'; "
-                "script-src 'self' 'unsafe-inline' https://www.google.com https://www.gstatic.com; "
-                "style-src 'self' 'unsafe-inline'; "
-                "img-src 'self' data: https:; "
-                "font-src 'self'; "
-                "connect-src 'self'; "
-                "frame-ancestors 'none'; "
-                "base-uri 'self'; "
-                "form-action 'self';"
+        self.blocklist.start()
+        ip, _ = get_client_ip(request)
+        ban = self.blocklist.check(ip)
+        if ban is None:
+            return self.get_response(request)
+        response = HttpResponseForbidden('Access denied', content_type='text/plain')
+        if ban.expires != float('inf'):
+            response['Retry-After'] = str(max(1, int(ban.expires - time.time())))
+        return response
+
+class CSPNonce:
+    """
+    Per-request CSP nonce, generated the first time it is rendered. Only
+    responses whose template used ``{{ request.csp_nonce }}`` carry one;
+    browsers then ignore 'unsafe-inline', so such a page must put the
+    nonce on every inline script.
+    """
+    __slots__ = ('value',)
+
+    def __init__(self):
+        self.value = None
+
+    def __str__(self):
+        if self.value is None:
+            self.value = secrets.token_urlsafe(16)
+        return self.value
+
+
+def build_csp(directives, nonce=None):
+    """Policy string from {directive: [sources]}; ``nonce`` is added to script-src"""
+    parts = []
+    for directive, sources in directives.items():
+        sources = list(sources or ())
+        if nonce is not None and directive == 'script-src':
+            sources.append(f"'nonce-{nonce}'")
+        parts.append(' '.join([directive] + sources))
+    return '; '.join(parts)
+
+
+class HeaderSet:
+    """The response headers for one route, validated and encoded once"""
+    def __init__(self, headers, secure_headers, csp_header, csp):
+        headers = {k: v for k, v in headers.items() if v is not None}
+        self.csp_header = csp_header if csp else None
+        if csp:
+            headers[csp_header] = build_csp(csp)
+            self.nonce_parts = build_csp(csp, '\0').split('\0')
+        else:
+            self.nonce_parts = None
+        # Round-trip through ResponseHeaders so a bad value fails at startup
+        # and responses get the already encoded strings
+        self.headers = dict(ResponseHeaders(headers).items())
+        self.secure_headers = dict(ResponseHeaders(secure_headers).items())
+
+
+class SecurityHeadersMiddleware(SecurityMiddleware):
+    """
+    Django's SecurityMiddleware (SSL redirect, HSTS, nosniff,
+    Referrer-Policy, COOP) plus the Content-Security-Policy and
+    SECURITY_EXTRA_HEADERS, with every value built once at startup rather
+    than per response. Headers a view already set are left alone.
+    X-Frame-Options stays with XFrameOptionsMiddleware, so the
+    xframe_options_* view decorators keep working.
+
+    Settings:
+        SECURITY_CSP               {directive: [sources]}; empty disables CSP
+        SECURITY_CSP_REPORT_ONLY   send Content-Security-Policy-Report-Only
+        SECURITY_EXTRA_HEADERS     {header: value} added to every response
+        SECURITY_HEADERS_ROUTES    URL name -> {'csp': {directive: sources},
+                                   'headers': {header: value}}, merged over
+                                   the defaults; None removes an entry
+    """
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        csp = getattr(settings, 'SECURITY_CSP', {})
+        extra = getattr(settings, 'SECURITY_EXTRA_HEADERS', {})
+        self.default = self.build(csp, extra)
+        self.routes = {}
+        for name, override in getattr(settings, 'SECURITY_HEADERS_ROUTES', {}).items():
+            route_csp = {**csp, **override.get('csp', {})}
+            route_csp = {k: v for k, v in route_csp.items() if v is not None}
+            self.routes[name] = self.build(route_csp, {**extra, **override.get('headers', {})})
+
+    def build(self, csp, extra):
+        headers = {}
+        if self.content_type_nosniff:
+            headers['X-Content-Type-Options'] = 'nosniff'
+        if self.referrer_policy:
+            policy = self.referrer_policy
+            headers['Referrer-Policy'] = ','.join(
+                [v.strip() for v in policy.split(',')] if isinstance(policy, str) else policy
             )
-            response['Content-Security-Policy'] = csp
-        
-        return response
\ No newline at end of file
+        if self.cross_origin_opener_policy:
+            headers['Cross-Origin-Opener-Policy'] = self.cross_origin_opener_policy
+        headers.update(extra)
+
+        secure_headers = {}
+        if self.sts_seconds:
+            sts = f'max-age={self.sts_seconds}'
+            if self.sts_include_subdomains:
+                sts += '; includeSubDomains'
+            if self.sts_preload:
+                sts += '; preload'
+            secure_headers['Strict-Transport-Security'] = sts
+
+        report_only = getattr(settings, 'SECURITY_CSP_REPORT_ONLY', settings.DEBUG)
+        csp_header = 'Content-Security-Policy-Report-Only' if report_only else 'Content-Security-Policy'
+        return HeaderSet(headers, secure_headers, csp_header, csp)
+
+    def process_request(self, request):
+        request.csp_nonce = CSPNonce()
+        return super().process_request(request)
+
+    def process_response(self, request, response):
+        match = request.resolver_match
+        header_set = self.routes.get(match.view_name, self.default) if match and self.routes else self.default
+        headers = response.headers
+        for name, value in header_set.headers.items():
+            headers.setdefault(name, value)
+        if header_set.secure_headers and request.is_secure():
+            for name, value in header_set.secure_headers.items():
+                headers.setdefault(name, value)
+
+        nonce = getattr(request, 'csp_nonce', None)
+        if nonce is not None and nonce.value is not None and header_set.nonce_parts:
+            before, after = header_set.nonce_parts
+            headers[header_set.csp_header] = f'{before}{nonce.value}{after}'
+        return response
+
+class PageViewMiddleware:
+    """
+    Records page views after the response has been produced, so views do no
+    tracking work. Works under both WSGI and ASGI; recording only appends to
+    the in-process page view buffer and never blocks on the database.
+
+    Settings:
+        PAGEVIEW_INCLUDE_PATHS   path prefixes to track (empty = everything)
+        PAGEVIEW_EXCLUDE_PATHS   path prefixes never tracked
+        PAGEVIEW_SAMPLE_RATE     fraction of human traffic recorded
+        PAGEVIEW_BOT_SAMPLE_RATE fraction of bot traffic recorded
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+        self.include_paths = tuple(getattr(settings, 'PAGEVIEW_INCLUDE_PATHS', ()))
+        self.exclude_paths = tuple(getattr(settings, 'PAGEVIEW_EXCLUDE_PATHS', ()))
+        self.sample_rate = getattr(settings, 'PAGEVIEW_SAMPLE_RATE', 1.0)
+        self.bot_sample_rate = getattr(settings, 'PAGEVIEW_BOT_SAMPLE_RATE', 1.0)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        response = self.get_response(request)
+        self.track(request, response)
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        self.track(request, response)
+        return response
+
+    def should_track(self, request, response):
+        if request.method != 'GET' or not 200 <= response.status_code < 300:
+            return False
+        path = request.path
+        if self.include_paths and not path.startswith(self.include_paths):
+            return False
+        if self.exclude_paths and path.startswith(self.exclude_paths):
+            return False
+        return True
+
+    def track(self, request, response):
+        try:
+            if not self.should_track(request, response):
+                return
+
+            user_agent = request.META.get('HTTP_USER_AGENT', '')
+            rate = self.bot_sample_rate if is_bot_user_agent(user_agent) else self.sample_rate
+            if rate < 1.0 and random.random() >= rate:
+                return
+
+            ip, _ = get_client_ip(request)
+            record_page_view(request.path, ip, user_agent, request.META.get('HTTP_REFERER', ''))
+        except Exception as e:
+            # Tracking must never break a response that has already been built
+            logger.error(f'Page view tracking failed: {str(e)}')
+
+class RateLimitMiddleware(MiddlewareMixin):
+    """
+    Applies RATELIMIT_POLICIES by URL name. It runs in process_view, so it
+    needs to sit before CsrfViewMiddleware: over-limit clients get a 429
+    before the CSRF check, form parsing, upload handling or the view run
+    (only form bodies up to 16KB are parsed early, for email rules).
+    """
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.policies = compile_policies(getattr(settings, 'RATELIMIT_POLICIES', {}))
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        match = request.resolver_match
+        policy = self.policies.get(match.view_name) if match else None
+        if policy is None:
+            return None
+        methods, rules = policy
+        if request.method not in methods:
+            return None
+        return enforce(request, match.view_name, rules)
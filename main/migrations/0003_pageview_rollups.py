@@ -0,0 +1,58 @@
+# Generated by Django 5.2.5 on 2026-10-17 18:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0002_pageview_viewed_at_default'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PageViewDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True)),
+                ('views', models.PositiveIntegerField(default=0)),
+                ('unique_visitors', models.PositiveIntegerField(default=0)),
+                ('visitor_sketch', models.BinaryField(default=bytes)),
+            ],
+            options={
+                'verbose_name': 'Daily Page Views',
+                'verbose_name_plural': 'Daily Page Views',
+                'ordering': ['-date'],
+            },
+        ),
+        migrations.CreateModel(
+            name='PageViewHourly',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField()),
+                ('page_url', models.CharField(max_length=200)),
+                ('views', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Hourly Page Views',
+                'verbose_name_plural': 'Hourly Page Views',
+                'ordering': ['-hour'],
+                'constraints': [models.UniqueConstraint(fields=('hour', 'page_url'), name='pageviewhourly_hour_page_uniq')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ReferrerDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('referrer_host', models.CharField(blank=True, max_length=255)),
+                ('views', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Daily Referrer Views',
+                'verbose_name_plural': 'Daily Referrer Views',
+                'ordering': ['-date', '-views'],
+                'constraints': [models.UniqueConstraint(fields=('date', 'referrer_host'), name='referrerdaily_date_host_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,89 @@
+# Generated by Django 5.2.5 on 2026-10-17 18:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0003_pageview_rollups'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='careerapplication',
+            index=models.Index(fields=['-applied_at'], name='application_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='careerapplication',
+            index=models.Index(fields=['ip_address', 'applied_at'], name='application_ip_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='chatbotmessage',
+            index=models.Index(fields=['session', 'created_at'], name='chatmessage_session_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='chatbotsession',
+            index=models.Index(fields=['-last_activity'], name='chatsession_activity_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='chatbotsession',
+            index=models.Index(fields=['email'], name='chatsession_email_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contactmessage',
+            index=models.Index(fields=['-date_sent'], name='contact_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contactmessage',
+            index=models.Index(fields=['email'], name='contact_email_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contactmessage',
+            index=models.Index(fields=['ip_address', 'date_sent'], name='contact_ip_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contactmessage',
+            index=models.Index(condition=models.Q(('is_spam', False), ('is_verified', False)), fields=['-date_sent'], name='contact_unread_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pageview',
+            index=models.Index(fields=['-viewed_at'], name='pageview_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='proposalrequest',
+            index=models.Index(fields=['-created_at'], name='proposal_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='proposalrequest',
+            index=models.Index(fields=['ip_address', 'created_at'], name='proposal_ip_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='securitylog',
+            index=models.Index(fields=['-created_at'], name='securitylog_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='securitylog',
+            index=models.Index(fields=['event_type', 'created_at'], name='securitylog_type_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='securitylog',
+            index=models.Index(fields=['ip_address', 'created_at'], name='securitylog_ip_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='serviceinquiry',
+            index=models.Index(fields=['-created_at'], name='inquiry_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='serviceinquiry',
+            index=models.Index(fields=['ip_address', 'created_at'], name='inquiry_ip_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='subscriber',
+            index=models.Index(fields=['-subscribed_at'], name='subscriber_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='subscriber',
+            index=models.Index(fields=['ip_address', 'subscribed_at'], name='subscriber_ip_date_idx'),
+        ),
+    ]
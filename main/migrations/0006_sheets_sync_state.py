@@ -0,0 +1,155 @@
+# Generated by Django 5.2.5 on 2026-10-17 18:55
+
+from django.db import migrations, models
+
+
+def mark_existing_synced(apps, schema_editor):
+    # Rows from before sync tracking were appended inline when they were
+    # submitted; don't let the first sync run append them all again.
+    for model_name in ['contactmessage', 'subscriber', 'serviceinquiry', 'proposalrequest', 'careerapplication']:
+        apps.get_model('main', model_name).objects.update(sync_status='synced')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0005_outbound_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SyncCursor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('position', models.DateTimeField(blank=True, null=True)),
+                ('last_pk', models.CharField(blank=True, max_length=64)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Sync Cursor',
+                'verbose_name_plural': 'Sync Cursors',
+            },
+        ),
+        migrations.AddField(
+            model_name='careerapplication',
+            name='sync_attempts',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='careerapplication',
+            name='sync_error',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='careerapplication',
+            name='sync_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('synced', 'Synced'), ('failed', 'Failed')], default='pending', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='careerapplication',
+            name='synced_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='contactmessage',
+            name='sync_attempts',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='contactmessage',
+            name='sync_error',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='contactmessage',
+            name='sync_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('synced', 'Synced'), ('failed', 'Failed')], default='pending', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='contactmessage',
+            name='synced_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='proposalrequest',
+            name='sync_attempts',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='proposalrequest',
+            name='sync_error',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='proposalrequest',
+            name='sync_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('synced', 'Synced'), ('failed', 'Failed')], default='pending', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='proposalrequest',
+            name='synced_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='serviceinquiry',
+            name='sync_attempts',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='serviceinquiry',
+            name='sync_error',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='serviceinquiry',
+            name='sync_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('synced', 'Synced'), ('failed', 'Failed')], default='pending', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='serviceinquiry',
+            name='synced_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='subscriber',
+            name='sync_attempts',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='subscriber',
+            name='sync_error',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='subscriber',
+            name='sync_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('synced', 'Synced'), ('failed', 'Failed')], default='pending', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='subscriber',
+            name='synced_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(mark_existing_synced, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='careerapplication',
+            index=models.Index(condition=models.Q(('sync_status', 'synced'), _negated=True), fields=['applied_at'], name='application_unsynced_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contactmessage',
+            index=models.Index(condition=models.Q(('sync_status', 'synced'), _negated=True), fields=['date_sent'], name='contact_unsynced_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='proposalrequest',
+            index=models.Index(condition=models.Q(('sync_status', 'synced'), _negated=True), fields=['created_at'], name='proposal_unsynced_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='serviceinquiry',
+            index=models.Index(condition=models.Q(('sync_status', 'synced'), _negated=True), fields=['created_at'], name='inquiry_unsynced_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='subscriber',
+            index=models.Index(condition=models.Q(('sync_status', 'synced'), _negated=True), fields=['subscribed_at'], name='subscriber_unsynced_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-17 19:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0007_spam_state'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='securitylog',
+            name='count',
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
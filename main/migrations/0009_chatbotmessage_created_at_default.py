@@ -0,0 +1,19 @@
+# Generated by Django 5.2.5 on 2026-10-17 19:36
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0008_securitylog_count'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='chatbotmessage',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+    ]
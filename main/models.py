@@ -2,9 +2,36 @@ from django.db import models
 import uuid
 from django.utils import timezone
 from django.core.validators import EmailValidator
+from django.core.serializers.json import DjangoJSONEncoder
 import re
 
-class ContactMessage(models.Model):
+class SheetsSyncState(models.Model):
+    """Google Sheets sync state for the form submission models; see main.sheets_sync"""
+    SYNC_STATUSES = [
+        ('pending', 'Pending'),
+        ('synced', 'Synced'),
+        ('failed', 'Failed'),
+    ]
+    
+    sync_status = models.CharField(max_length=10, choices=SYNC_STATUSES, default='pending')
+    sync_attempts = models.PositiveIntegerField(default=0)
+    sync_error = models.TextField(blank=True)
+    synced_at = models.DateTimeField(blank=True, null=True)
+    
+    class Meta:
+        abstract = True
+
+class SpamState(models.Model):
+    """Spam verdict for the form submission models; see main.spam"""
+    is_spam = models.BooleanField(default=False)
+    spam_score = models.FloatField(blank=True, null=True)
+    # Set when an admin labels the row; only reviewed rows train the model
+    spam_reviewed = models.BooleanField(default=False)
+    
+    class Meta:
+        abstract = True
+
+class ContactMessage(SheetsSyncState, SpamState):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     name = models.CharField(max_length=100)
     email = models.EmailField(validators=[EmailValidator()])
@@ -14,7 +41,6 @@ class ContactMessage(models.Model):
     ip_address = models.GenericIPAddressField(blank=True, null=True)
     user_agent = models.TextField(blank=True, null=True)
     is_verified = models.BooleanField(default=False)
-    is_spam = models.BooleanField(default=False)
     verification_token = models.CharField(max_length=100, blank=True, null=True)
     
     def __str__(self):
@@ -24,8 +50,18 @@ class ContactMessage(models.Model):
         ordering = ['-date_sent']
         verbose_name = "Contact Message"
         verbose_name_plural = "Contact Messages"
+        indexes = [
+            models.Index(fields=['-date_sent'], name='contact_date_idx'),
+            models.Index(fields=['email'], name='contact_email_idx'),
+            models.Index(fields=['ip_address', 'date_sent'], name='contact_ip_date_idx'),
+            models.Index(fields=['date_sent'], name='contact_unsynced_idx',
+                         condition=~models.Q(sync_status='synced')),
+            # Partial: only the unread queue, which is what form_counts counts
+            models.Index(fields=['-date_sent'], name='contact_unread_idx',
+                         condition=models.Q(is_spam=False, is_verified=False)),
+        ]
 
-class Subscriber(models.Model):
+class Subscriber(SheetsSyncState, SpamState):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     email = models.EmailField(unique=True, validators=[EmailValidator()])
     is_active = models.BooleanField(default=True)
@@ -41,8 +77,14 @@ class Subscriber(models.Model):
         ordering = ['-subscribed_at']
         verbose_name = "Subscriber"
         verbose_name_plural = "Subscribers"
+        indexes = [
+            models.Index(fields=['-subscribed_at'], name='subscriber_date_idx'),
+            models.Index(fields=['ip_address', 'subscribed_at'], name='subscriber_ip_date_idx'),
+            models.Index(fields=['subscribed_at'], name='subscriber_unsynced_idx',
+                         condition=~models.Q(sync_status='synced')),
+        ]
 
-class ServiceInquiry(models.Model):
+class ServiceInquiry(SheetsSyncState, SpamState):
     SERVICES = [
         ('web', 'Web Development'),
         ('mobile', 'Mobile App Development'),
@@ -72,8 +114,14 @@ class ServiceInquiry(models.Model):
         ordering = ['-created_at']
         verbose_name = "Service Inquiry"
         verbose_name_plural = "Service Inquiries"
+        indexes = [
+            models.Index(fields=['-created_at'], name='inquiry_date_idx'),
+            models.Index(fields=['ip_address', 'created_at'], name='inquiry_ip_date_idx'),
+            models.Index(fields=['created_at'], name='inquiry_unsynced_idx',
+                         condition=~models.Q(sync_status='synced')),
+        ]
 
-class ProposalRequest(models.Model):
+class ProposalRequest(SheetsSyncState, SpamState):
     SERVICES = [
         ('web', 'Web Development'),
         ('mobile', 'Mobile App Development'),
@@ -112,8 +160,14 @@ class ProposalRequest(models.Model):
         ordering = ['-created_at']
         verbose_name = "Proposal Request"
         verbose_name_plural = "Proposal Requests"
+        indexes = [
+            models.Index(fields=['-created_at'], name='proposal_date_idx'),
+            models.Index(fields=['ip_address', 'created_at'], name='proposal_ip_date_idx'),
+            models.Index(fields=['created_at'], name='proposal_unsynced_idx',
+                         condition=~models.Q(sync_status='synced')),
+        ]
 
-class CareerApplication(models.Model):
+class CareerApplication(SheetsSyncState, SpamState):
     POSITIONS = [
         ('dev', 'Software Developer'),
         ('designer', 'UI/UX Designer'),
@@ -145,6 +199,21 @@ class CareerApplication(models.Model):
         ordering = ['-applied_at']
         verbose_name = "Career Application"
         verbose_name_plural = "Career Applications"
+        indexes = [
+            models.Index(fields=['-applied_at'], name='application_date_idx'),
+            models.Index(fields=['ip_address', 'applied_at'], name='application_ip_date_idx'),
+            models.Index(fields=['applied_at'], name='application_unsynced_idx',
+                         condition=~models.Q(sync_status='synced')),
+        ]
+
+# Submission timestamp per form model; (ip_address, <field>) is indexed on each
+SUBMITTED_AT_FIELDS = {
+    ContactMessage: 'date_sent',
+    Subscriber: 'subscribed_at',
+    ServiceInquiry: 'created_at',
+    ProposalRequest: 'created_at',
+    CareerApplication: 'applied_at',
+}
 
 class PageView(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -152,7 +221,8 @@ class PageView(models.Model):
     ip_address = models.GenericIPAddressField()
     user_agent = models.TextField(blank=True, null=True)
     referrer = models.URLField(blank=True, null=True)
-    viewed_at = models.DateTimeField(auto_now_add=True)
+    # Set when the view happens, not when the buffered row is flushed
+    viewed_at = models.DateTimeField(default=timezone.now, editable=False)
     
     def __str__(self):
         return f"{self.page_url} - {self.viewed_at}"
@@ -161,6 +231,9 @@ class PageView(models.Model):
         ordering = ['-viewed_at']
         verbose_name = "Page View"
         verbose_name_plural = "Page Views"
+        indexes = [
+            models.Index(fields=['-viewed_at'], name='pageview_date_idx'),
+        ]
 
 class SecurityLog(models.Model):
     EVENT_TYPES = [
@@ -180,6 +253,8 @@ class SecurityLog(models.Model):
     ip_address = models.GenericIPAddressField()
     user_agent = models.TextField(blank=True, null=True)
     details = models.TextField()
+    # Identical events within one write window are stored as one row
+    count = models.PositiveIntegerField(default=1)
     created_at = models.DateTimeField(auto_now_add=True)
     
     def __str__(self):
@@ -189,6 +264,11 @@ class SecurityLog(models.Model):
         ordering = ['-created_at']
         verbose_name = "Security Log"
         verbose_name_plural = "Security Logs"
+        indexes = [
+            models.Index(fields=['-created_at'], name='securitylog_date_idx'),
+            models.Index(fields=['event_type', 'created_at'], name='securitylog_type_date_idx'),
+            models.Index(fields=['ip_address', 'created_at'], name='securitylog_ip_date_idx'),
+        ]
 
 class ChatbotSession(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -205,13 +285,125 @@ class ChatbotSession(models.Model):
     
     class Meta:
         ordering = ['-last_activity']
+        indexes = [
+            models.Index(fields=['-last_activity'], name='chatsession_activity_idx'),
+            models.Index(fields=['email'], name='chatsession_email_idx'),
+        ]
 
 class ChatbotMessage(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     session = models.ForeignKey(ChatbotSession, on_delete=models.CASCADE, related_name='messages')
     message = models.TextField()
     is_user = models.BooleanField(default=True)
+    # Set when the message is sent; rows are written later in batches (main.chatbot_sessions)
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
+    
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['session', 'created_at'], name='chatmessage_session_idx'),
+        ]
+
+# ===== PAGE VIEW ROLLUPS =====
+# Maintained incrementally by main.rollups as buffered page views are flushed;
+# rebuilt from raw PageView rows with `manage.py backfill_pageview_rollups`.
+
+class PageViewHourly(models.Model):
+    hour = models.DateTimeField()
+    page_url = models.CharField(max_length=200)
+    views = models.PositiveIntegerField(default=0)
+    
+    def __str__(self):
+        return f"{self.page_url} @ {self.hour}: {self.views}"
+    
+    class Meta:
+        ordering = ['-hour']
+        constraints = [
+            models.UniqueConstraint(fields=['hour', 'page_url'], name='pageviewhourly_hour_page_uniq'),
+        ]
+        verbose_name = "Hourly Page Views"
+        verbose_name_plural = "Hourly Page Views"
+
+class PageViewDaily(models.Model):
+    date = models.DateField(unique=True)
+    views = models.PositiveIntegerField(default=0)
+    unique_visitors = models.PositiveIntegerField(default=0)
+    # HyperLogLog registers over visitor IPs; unique_visitors is their estimate
+    visitor_sketch = models.BinaryField(default=bytes)
+    
+    def __str__(self):
+        return f"{self.date}: {self.views} views, ~{self.unique_visitors} visitors"
+    
+    class Meta:
+        ordering = ['-date']
+        verbose_name = "Daily Page Views"
+        verbose_name_plural = "Daily Page Views"
+
+class ReferrerDaily(models.Model):
+    date = models.DateField()
+    referrer_host = models.CharField(max_length=255, blank=True)  # '' = direct
+    views = models.PositiveIntegerField(default=0)
+    
+    def __str__(self):
+        return f"{self.referrer_host or 'Direct'} @ {self.date}: {self.views}"
+    
+    class Meta:
+        ordering = ['-date', '-views']
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'referrer_host'], name='referrerdaily_date_host_uniq'),
+        ]
+        verbose_name = "Daily Referrer Views"
+        verbose_name_plural = "Daily Referrer Views"
+
+
+# ===== GOOGLE SHEETS SYNC =====
+
+class SyncCursor(models.Model):
+    """High-water mark of the rows `manage.py sync_unsynced` has scanned for one model"""
+    name = models.CharField(max_length=50, unique=True)
+    position = models.DateTimeField(blank=True, null=True)
+    last_pk = models.CharField(max_length=64, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.name} @ {self.position}"
+    
+    class Meta:
+        verbose_name = "Sync Cursor"
+        verbose_name_plural = "Sync Cursors"
+
+
+# ===== OUTBOX =====
+# Durable queue for outbound work (email, Google Sheets) drained by
+# `manage.py run_outbox`; see main.outbox.
+
+class OutboundJob(models.Model):
+    STATUSES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('dead', 'Dead Letter'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    kind = models.CharField(max_length=50)
+    payload = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    status = models.CharField(max_length=20, choices=STATUSES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=6)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_until = models.DateTimeField(blank=True, null=True)
+    last_error = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.kind} ({self.get_status_display()})"
     
     class Meta:
-        ordering = ['created_at']
\ No newline at end of file
+        ordering = ['-created_at']
+        verbose_name = "Outbound Job"
+        verbose_name_plural = "Outbound Jobs"
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='outbox_due_idx'),
+        ]
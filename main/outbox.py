@@ -0,0 +1,164 @@
+import logging
+import random
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import OutboundJob
+
+logger = logging.getLogger(__name__)
+
+# kind -> callable(payload); registered with @job_handler in main.jobs
+HANDLERS = {}
+# kind -> callable(jobs) -> {job.pk: exception}; registered with @batch_job_handler
+BATCH_HANDLERS = {}
+
+
+def job_handler(kind):
+    """Register the function that performs jobs of ``kind``"""
+    def decorator(func):
+        HANDLERS[kind] = func
+        return func
+    return decorator
+
+
+def batch_job_handler(kind):
+    """
+    Register a function that performs many claimed jobs of ``kind`` in one
+    go. It returns a dict mapping the pk of each job that failed to its
+    exception; raising fails the whole batch.
+    """
+    def decorator(func):
+        BATCH_HANDLERS[kind] = func
+        return func
+    return decorator
+
+
+def enqueue(kind, payload=None, max_attempts=None):
+    """Queue outbound work; costs the caller a single INSERT"""
+    return OutboundJob.objects.create(
+        kind=kind,
+        payload=payload or {},
+        max_attempts=max_attempts or getattr(settings, 'OUTBOX_MAX_ATTEMPTS', 6),
+    )
+
+
+def backoff_delay(attempts):
+    """Exponential backoff with jitter, capped at OUTBOX_BACKOFF_MAX seconds"""
+    base = getattr(settings, 'OUTBOX_BACKOFF_BASE', 30)
+    cap = getattr(settings, 'OUTBOX_BACKOFF_MAX', 3600)
+    delay = min(cap, base * 2 ** max(0, attempts - 1))
+    return timedelta(seconds=delay * random.uniform(0.9, 1.1))
+
+
+def claim_jobs(batch_size=20, kinds=None):
+    """
+    Claim up to ``batch_size`` due jobs for this worker. Each claim is a
+    compare-and-set UPDATE, so concurrent workers never run the same job
+    even on backends without SELECT ... SKIP LOCKED. Jobs whose worker died
+    mid-run become claimable again once their lock expires.
+    """
+    now = timezone.now()
+    lock_timeout = timedelta(seconds=getattr(settings, 'OUTBOX_LOCK_TIMEOUT', 300))
+    due = OutboundJob.objects.filter(
+        Q(status='pending', run_after__lte=now) |
+        Q(status='running', locked_until__lt=now)
+    ).order_by('run_after')
+    if kinds:
+        due = due.filter(kind__in=kinds)
+
+    claimed = []
+    for job in due[:batch_size]:
+        won = OutboundJob.objects.filter(
+            pk=job.pk, status=job.status, attempts=job.attempts
+        ).update(status='running', attempts=job.attempts + 1, locked_until=now + lock_timeout)
+        if won:
+            job.status = 'running'
+            job.attempts += 1
+            claimed.append(job)
+    return claimed
+
+
+def record_failure(job, e):
+    """Schedule a retry for a failed job, or dead-letter it once out of attempts"""
+    error = f'{type(e).__name__}: {str(e)}'[:2000]
+    if job.attempts >= job.max_attempts:
+        logger.error(f'Outbound job {job.pk} ({job.kind}) dead-lettered after {job.attempts} attempts: {error}')
+        OutboundJob.objects.filter(pk=job.pk).update(
+            status='dead', last_error=error, locked_until=None, updated_at=timezone.now()
+        )
+    else:
+        retry_at = timezone.now() + backoff_delay(job.attempts)
+        logger.warning(f'Outbound job {job.pk} ({job.kind}) failed, retrying at {retry_at}: {error}')
+        OutboundJob.objects.filter(pk=job.pk).update(
+            status='pending', last_error=error, run_after=retry_at,
+            locked_until=None, updated_at=timezone.now()
+        )
+
+
+def record_success(jobs):
+    OutboundJob.objects.filter(pk__in=[job.pk for job in jobs]).update(
+        status='done', last_error='', locked_until=None, updated_at=timezone.now()
+    )
+
+
+def run_job(job):
+    """Run one claimed job and record the outcome. Returns True on success"""
+    handler = HANDLERS.get(job.kind)
+    try:
+        if handler is None:
+            raise LookupError(f'No handler registered for job kind "{job.kind}"')
+        handler(job.payload)
+    except Exception as e:
+        record_failure(job, e)
+        return False
+
+    record_success([job])
+    return True
+
+
+def record_batch(jobs, errors):
+    """Record the outcome of a batch of jobs. Returns (succeeded, failed)"""
+    succeeded = [job for job in jobs if job.pk not in errors]
+    for job in jobs:
+        if job.pk in errors:
+            record_failure(job, errors[job.pk])
+    record_success(succeeded)
+    return len(succeeded), len(jobs) - len(succeeded)
+
+
+def run_jobs(jobs):
+    """Run claimed jobs, batching kinds that have a batch handler. Returns (succeeded, failed)"""
+    succeeded = failed = 0
+    batches = {}
+    for job in jobs:
+        if job.kind in BATCH_HANDLERS:
+            batches.setdefault(job.kind, []).append(job)
+        elif run_job(job):
+            succeeded += 1
+        else:
+            failed += 1
+
+    for kind, batch in batches.items():
+        try:
+            errors = BATCH_HANDLERS[kind](batch)
+        except Exception as e:
+            errors = {job.pk: e for job in batch}
+        ok, bad = record_batch(batch, errors)
+        succeeded += ok
+        failed += bad
+    return succeeded, failed
+
+
+def run_pending(batch_size=20, kinds=None):
+    """Claim and run one batch of due jobs. Returns (succeeded, failed)"""
+    return run_jobs(claim_jobs(batch_size, kinds))
+
+
+def retry_dead(queryset):
+    """Put dead-lettered jobs back on the queue with a fresh attempt budget"""
+    return queryset.filter(status='dead').update(
+        status='pending', attempts=0, run_after=timezone.now(), last_error=''
+    )
@@ -0,0 +1,48 @@
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .buffers import BatchBuffer
+from .models import PageView
+from .rollups import apply_page_views
+
+logger = logging.getLogger(__name__)
+
+# URLField columns are varchar(200); one over-long referrer must not fail a batch
+URL_MAX_LENGTH = 200
+
+
+def write_page_views(page_views):
+    """Persist a batch of buffered PageView instances and update the rollups"""
+    # One transaction, so a failed batch can be retried without double counting
+    with transaction.atomic():
+        PageView.objects.bulk_create(page_views, batch_size=len(page_views))
+        apply_page_views(page_views)
+    logger.debug(f'Flushed {len(page_views)} page views')
+
+
+page_view_buffer = BatchBuffer(
+    'pageviews',
+    write_page_views,
+    batch_size=getattr(settings, 'PAGEVIEW_BATCH_SIZE', 200),
+    flush_interval=getattr(settings, 'PAGEVIEW_FLUSH_INTERVAL', 5.0),
+    max_pending=getattr(settings, 'PAGEVIEW_MAX_PENDING', 10000),
+)
+
+
+def record_page_view(page_url, ip_address, user_agent='', referrer=''):
+    """Queue a page view for the next batched write"""
+    page_view_buffer.add(PageView(
+        page_url=page_url[:URL_MAX_LENGTH],
+        ip_address=ip_address or '0.0.0.0',
+        user_agent=user_agent,
+        referrer=(referrer or '')[:URL_MAX_LENGTH],
+        viewed_at=timezone.now(),
+    ))
+
+
+def page_view_stats():
+    """Buffered / flushed / dropped counters for this worker process"""
+    return page_view_buffer.stats()
@@ -0,0 +1,474 @@
+import hashlib
+import json
+import logging
+import math
+import os
+import re
+import socket
+import sqlite3
+import threading
+import time
+from functools import wraps
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse
+from ipware import get_client_ip
+
+from .security import log_security_event
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimitDecision:
+    """Outcome of one rate-limited hit"""
+    def __init__(self, allowed, limit, remaining, retry_after=0, counted=None):
+        self.allowed = allowed
+        self.limit = limit
+        self.remaining = remaining
+        self.retry_after = retry_after
+        # (backend, key, ttl) of the counter an allowed hit was added to
+        self._counted = counted
+
+    def release(self):
+        """Take an allowed hit back out of the count, e.g. when a later rule rejects the request"""
+        if self._counted is None:
+            return
+        backend, key, ttl = self._counted
+        self._counted = None
+        try:
+            backend.incr(key, -1, ttl)
+        except Exception as e:
+            logger.error(f'Rate limit backend unavailable, hit not released: {str(e)}')
+
+    def __bool__(self):
+        return self.allowed
+
+    def __repr__(self):
+        return f'<RateLimitDecision allowed={self.allowed} remaining={self.remaining} retry_after={self.retry_after}>'
+
+
+# ===== BACKENDS =====
+# A backend only needs an atomic ``incr(key, delta, ttl)`` that returns the
+# new value, and ``get(key)``; ``hit`` may combine them in one round trip.
+
+class MemoryBackend:
+    """Per-process counters; each worker process limits on its own"""
+    def __init__(self):
+        self._counters = {}
+        self._lock = threading.Lock()
+        self._next_purge = 0
+
+    def incr(self, key, delta, ttl):
+        now = time.time()
+        with self._lock:
+            if now >= self._next_purge:
+                self._counters = {k: v for k, v in self._counters.items() if v[1] > now}
+                self._next_purge = now + 60
+            value, expires = self._counters.get(key, (0, 0))
+            if expires <= now:
+                value, expires = 0, now + ttl
+            value += delta
+            self._counters[key] = (value, expires)
+            return value
+
+    def get(self, key):
+        with self._lock:
+            value, expires = self._counters.get(key, (0, 0))
+        return value if expires > time.time() else 0
+
+    def hit(self, key, previous_key, ttl):
+        return self.incr(key, 1, ttl), self.get(previous_key)
+
+    def clear(self):
+        with self._lock:
+            self._counters = {}
+
+
+class SQLiteBackend:
+    """
+    Counters in a local SQLite file shared by every worker process on the
+    host. Each increment is a single ``INSERT ... ON CONFLICT ... RETURNING``
+    statement, so it is atomic across processes. SQLite before 3.35 has no
+    RETURNING; there the read and the write share a write-locked transaction.
+    """
+    INCR_SQL = (
+        'INSERT INTO ratelimit (key, value, expires) VALUES (?, ?, ?) '
+        'ON CONFLICT (key) DO UPDATE SET '
+        'value = CASE WHEN expires <= ? THEN excluded.value ELSE value + excluded.value END, '
+        'expires = CASE WHEN expires <= ? THEN excluded.expires ELSE expires END '
+        'RETURNING value'
+    )
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._local = threading.local()
+        self._next_purge = 0
+        self.returning = sqlite3.sqlite_version_info >= (3, 35)
+        if not self.returning:
+            logger.warning(f'SQLite {sqlite3.sqlite_version} has no RETURNING (3.35+), '
+                           f'rate limit counters use a slower locked transaction')
+
+    @property
+    def connection(self):
+        # One connection per thread and per process (connections must not cross a fork)
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS ratelimit '
+                '(key TEXT PRIMARY KEY, value INTEGER NOT NULL, expires REAL NOT NULL)'
+            )
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def incr(self, key, delta, ttl):
+        now = time.time()
+        conn = self.connection
+        if now >= self._next_purge:
+            self._next_purge = now + 60
+            conn.execute('DELETE FROM ratelimit WHERE expires <= ?', (now,))
+        if self.returning:
+            return conn.execute(self.INCR_SQL, (key, delta, now + ttl, now, now)).fetchone()[0]
+        return self._locked_incr(conn, key, delta, now, ttl)
+
+    def _locked_incr(self, conn, key, delta, now, ttl):
+        # BEGIN IMMEDIATE takes the write lock up front, so no other process
+        # can change the row between the SELECT and the write
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('SELECT value, expires FROM ratelimit WHERE key = ?', (key,)).fetchone()
+            if row is None or row[1] <= now:
+                value, expires = delta, now + ttl
+            else:
+                value, expires = row[0] + delta, row[1]
+            conn.execute('INSERT OR REPLACE INTO ratelimit (key, value, expires) VALUES (?, ?, ?)',
+                         (key, value, expires))
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+        return value
+
+    def get(self, key):
+        row = self.connection.execute(
+            'SELECT value FROM ratelimit WHERE key = ? AND expires > ?', (key, time.time())
+        ).fetchone()
+        return row[0] if row else 0
+
+    def hit(self, key, previous_key, ttl):
+        return self.incr(key, 1, ttl), self.get(previous_key)
+
+    def clear(self):
+        self.connection.execute('DELETE FROM ratelimit')
+
+
+class RedisBackend:
+    """
+    Counters in Redis (or anything speaking RESP), over a minimal built-in
+    client so no extra dependency is needed. A hit is one pipelined round
+    trip: INCRBY + EXPIRE on the current window, GET on the previous one.
+    """
+    def __init__(self, url, timeout=1.0):
+        parts = urlsplit(url)
+        self.host = parts.hostname or '127.0.0.1'
+        self.port = parts.port or 6379
+        self.password = parts.password
+        self.db = int(parts.path.strip('/') or 0)
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connect(self):
+        sock = socket.create_connection((self.host, self.port), self.timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._local.sock, self._local.file, self._local.pid = sock, sock.makefile('rb'), os.getpid()
+        setup = []
+        if self.password:
+            setup.append(('AUTH', self.password))
+        if self.db:
+            setup.append(('SELECT', self.db))
+        if setup:
+            self._send(setup)
+
+    def _send(self, commands):
+        payload = b''.join(self._encode(command) for command in commands)
+        self._local.sock.sendall(payload)
+        replies = [self._read_reply() for _ in commands]
+        for reply in replies:
+            if isinstance(reply, RedisError):
+                raise reply
+        return replies
+
+    def execute(self, *commands):
+        """Send pipelined commands and return their replies; reconnects once on a dropped connection"""
+        for attempt in range(2):
+            if getattr(self._local, 'sock', None) is None or self._local.pid != os.getpid():
+                self._connect()
+            try:
+                return self._send(commands)
+            except (OSError, ConnectionError):
+                self._close()
+                if attempt:
+                    raise
+
+    def _close(self):
+        sock = getattr(self._local, 'sock', None)
+        self._local.sock = None
+        if sock is not None:
+            try:
+                sock.close()
+            except OSError:
+                pass
+
+    @staticmethod
+    def _encode(command):
+        parts = [str(part).encode() for part in command]
+        return b'*%d\r\n' % len(parts) + b''.join(b'$%d\r\n%s\r\n' % (len(p), p) for p in parts)
+
+    def _read_reply(self):
+        line = self._local.file.readline()
+        if not line:
+            raise ConnectionError('Connection closed by server')
+        kind, rest = line[:1], line[1:-2]
+        if kind == b'+':
+            return rest.decode()
+        if kind == b'-':
+            return RedisError(rest.decode())
+        if kind == b':':
+            return int(rest)
+        if kind == b'$':
+            length = int(rest)
+            if length < 0:
+                return None
+            return self._local.file.read(length + 2)[:-2]
+        if kind == b'*':
+            length = int(rest)
+            return None if length < 0 else [self._read_reply() for _ in range(length)]
+        raise ConnectionError(f'Unexpected reply from server: {line!r}')
+
+    def incr(self, key, delta, ttl):
+        value, _ = self.execute(('INCRBY', key, delta), ('EXPIRE', key, int(math.ceil(ttl))))
+        return value
+
+    def get(self, key):
+        value = self.execute(('GET', key))[0]
+        return int(value) if value is not None else 0
+
+    def hit(self, key, previous_key, ttl):
+        value, _, previous = self.execute(
+            ('INCRBY', key, 1), ('EXPIRE', key, int(math.ceil(ttl))), ('GET', previous_key)
+        )
+        return value, int(previous) if previous is not None else 0
+
+    def clear(self):
+        self.execute(('FLUSHDB',))
+
+
+class RedisError(Exception):
+    pass
+
+
+def make_backend(name=None):
+    name = name or getattr(settings, 'RATELIMIT_BACKEND', 'memory')
+    if name == 'memory':
+        return MemoryBackend()
+    if name == 'sqlite':
+        return SQLiteBackend(getattr(settings, 'RATELIMIT_SQLITE_PATH', '/tmp/bunshai-ratelimit.sqlite3'))
+    if name == 'redis':
+        return RedisBackend(getattr(settings, 'RATELIMIT_REDIS_URL', 'redis://127.0.0.1:6379/0'))
+    raise ValueError(f'Unknown rate limit backend "{name}"')
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = make_backend()
+    return _backend
+
+
+# ===== SLIDING WINDOW =====
+
+def hit(key, limit, period, backend=None):
+    """
+    Count one attempt against ``key`` and decide whether it is allowed: at
+    most ``limit`` attempts in any ``period`` seconds, using a sliding window
+    counter (current fixed window plus the previous one weighted by how much
+    of it still overlaps the sliding window).
+
+    Rejected attempts are taken back out of the count, and because every
+    increment is atomic, concurrent workers can never admit more than
+    ``limit`` attempts between them. Fails open if the backend is down.
+    """
+    backend = backend or get_backend()
+    now = time.time()
+    window = int(now // period)
+    elapsed = (now % period) / period
+    current_key = f'rl:{key}:{window}'
+    try:
+        current, previous = backend.hit(current_key, f'rl:{key}:{window - 1}', period * 2)
+    except Exception as e:
+        logger.error(f'Rate limit backend unavailable, allowing request: {str(e)}')
+        return RateLimitDecision(True, limit, limit)
+
+    weighted = previous * (1 - elapsed)
+    if current + weighted <= limit:
+        return RateLimitDecision(True, limit, int(limit - current - weighted),
+                                 counted=(backend, current_key, period * 2))
+
+    try:
+        backend.incr(current_key, -1, period * 2)
+    except Exception:
+        pass
+    return RateLimitDecision(False, limit, 0, _retry_after(current - 1, previous, limit, period, elapsed))
+
+
+def _retry_after(current, previous, limit, period, elapsed):
+    """Seconds until one more attempt would fit in the sliding window"""
+    if current + 1 <= limit and previous:
+        # Wait for the previous window's weight to decay enough
+        needed = 1 - (limit - current - 1) / previous
+        return max(1, int(math.ceil((needed - elapsed) * period)))
+    # The current window is full on its own: wait for it to become the
+    # previous window and decay
+    needed = 1 - (limit - 1) / current if current else 0
+    return max(1, int(math.ceil((1 - elapsed + max(0, needed)) * period)))
+
+
+# ===== POLICIES =====
+# RATELIMIT_POLICIES maps URL names to rules such as 'ip:5/m' (five requests
+# a minute per client IP). Keys are ip, session or email; periods are s, m,
+# h or d with an optional multiplier ('10/15m'). Pairing a short burst rule
+# with a longer sustained one lets people retry a typo but not script a form.
+
+RATE_RE = re.compile(r'^(ip|session|email):(\d+)/(\d*)([smhd])$')
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+# Bodies larger than this are never read just to find an email key
+MAX_INSPECT_BYTES = 16 * 1024
+
+
+def parse_rule(rule):
+    """'ip:5/m' -> ('ip', 5, 60)"""
+    match = RATE_RE.match(rule.replace(' ', ''))
+    if not match:
+        raise ValueError(f'Invalid rate limit rule "{rule}"')
+    key, count, multiplier, unit = match.groups()
+    return key, int(count), int(multiplier or 1) * PERIODS[unit]
+
+
+def compile_policies(policies):
+    """{url name: {'methods': [...], 'rules': [...]}} -> {url name: (methods, parsed rules)}"""
+    compiled = {}
+    for name, policy in policies.items():
+        methods = frozenset(method.upper() for method in policy.get('methods', ['POST']))
+        compiled[name] = (methods, [parse_rule(rule) for rule in policy['rules']])
+    return compiled
+
+
+def _request_email(request):
+    """Submitted email address, read only from small form (urlencoded or multipart) or JSON bodies"""
+    try:
+        length = int(request.META.get('CONTENT_LENGTH') or 0)
+    except ValueError:
+        return None
+    if not length or length > MAX_INSPECT_BYTES:
+        return None
+    content_type = request.content_type
+    try:
+        if content_type in ('application/x-www-form-urlencoded', 'multipart/form-data'):
+            # FormData posts are multipart; the parsed form is cached on the
+            # request, so the view does not parse it again
+            email = request.POST.get('email')
+        elif content_type == 'application/json':
+            data = json.loads(request.body)
+            email = data.get('email') if isinstance(data, dict) else None
+        else:
+            return None
+    except Exception:
+        return None
+    if not isinstance(email, str) or not email.strip():
+        return None
+    return hashlib.blake2b(email.strip().lower().encode(), digest_size=10).hexdigest()
+
+
+def request_key(request, key):
+    """Value of rate limit key ``key`` for this request, or None when it has none"""
+    if key == 'ip':
+        return get_client_ip(request)[0] or 'unknown'
+    if key == 'session':
+        session = getattr(request, 'session', None)
+        session_key = session.session_key if session is not None else None
+        # Clients without a session cookie are limited by address instead
+        return f'anon:{get_client_ip(request)[0]}' if not session_key else session_key
+    if key == 'email':
+        return _request_email(request)
+    return None
+
+
+def too_many_requests(request, retry_after):
+    message = 'Too many requests. Please try again later.'
+    if (request.headers.get('X-Requested-With') == 'XMLHttpRequest'
+            or 'application/json' in request.headers.get('Accept', '')
+            or request.content_type == 'application/json'):
+        response = JsonResponse({'success': False, 'error': message}, status=429)
+    else:
+        response = HttpResponse(message, status=429, content_type='text/plain')
+    response['Retry-After'] = str(retry_after)
+    return response
+
+
+def enforce(request, scope, rules):
+    """
+    Apply parsed ``rules`` for ``scope``. Returns a 429 response when any
+    rule is exceeded, otherwise None. Rules are checked in order and
+    evaluation stops at the first one exceeded; a rejected request is not
+    counted against any rule, including those it had already passed.
+    """
+    passed = []
+    for key, limit, period in rules:
+        value = request_key(request, key)
+        if value is None:
+            continue
+        decision = hit(f'{scope}:{key}:{limit}/{period}:{value}', limit, period)
+        if decision:
+            passed.append(decision)
+        else:
+            for earlier in passed:
+                earlier.release()
+            ip = get_client_ip(request)[0]
+            logger.warning(f'Rate limit {key}:{limit}/{period}s exceeded for {scope} from {ip}')
+            # Repeats from one address within a flush window share one SecurityLog row
+            log_security_event('bruteforce', ip, request.META.get('HTTP_USER_AGENT', ''),
+                               'Rate limit exceeded for {scope}', scope=scope)
+            return too_many_requests(request, decision.retry_after)
+    return None
+
+
+def rate_limit(*rules, methods=('POST',), scope=None):
+    """
+    View decorator applying rate limit rules, e.g. ``@rate_limit('ip:5/m', 'ip:20/h')``,
+    for views that are not covered by RATELIMIT_POLICIES.
+    """
+    parsed = [parse_rule(rule) for rule in rules]
+    methods = frozenset(method.upper() for method in methods)
+
+    def decorator(view_func):
+        name = scope or f'{view_func.__module__}.{view_func.__name__}'
+
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if request.method in methods:
+                response = enforce(request, name, parsed)
+                if response is not None:
+                    return response
+            return view_func(request, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,180 @@
+import bisect
+import heapq
+import ipaddress
+import logging
+import re
+import threading
+from functools import lru_cache
+
+from django.conf import settings
+
+
+logger = logging.getLogger(__name__)
+
+# User agent categories, first match wins; one compiled alternation of named groups
+UA_CATEGORIES = [
+    ('search_engine', r'googlebot|bingbot|duckduckbot|baiduspider|yandex(?:bot|images)|applebot|slurp'),
+    ('social', r'facebookexternalhit|twitterbot|linkedinbot|slackbot|discordbot|whatsapp|telegrambot'),
+    ('monitor', r'uptimerobot|pingdom|statuscake|site24x7'),
+    ('tool', r'\b(?:curl|wget|python|java|php|ruby|perl|go-http-client|okhttp|libwww|lwp|http-client|scrapy|'
+             r'httpx|aiohttp|node-fetch|axios|headless)\b'),
+    ('generic', r'bot|crawl|spider|scrape'),
+]
+UA_RE = re.compile('|'.join(f'(?P<{name}>{pattern})' for name, pattern in UA_CATEGORIES), re.IGNORECASE)
+
+NETWORK_KINDS = ('crawler', 'abuse')
+
+
+def classify_user_agent(user_agent):
+    """Bot category of a user agent ('empty' for none), or None for a browser"""
+    if not user_agent:
+        return 'empty'
+    match = UA_RE.search(user_agent)
+    return match.lastgroup if match else None
+
+
+class NetworkIndex:
+    """
+    Labelled CIDR ranges as sorted, disjoint intervals per address family,
+    so a lookup is one bisect. Overlaps are resolved when the index is
+    built: the most specific range wins, as with routing.
+    """
+    def __init__(self, networks=()):
+        ranges = {4: [], 6: []}
+        for network, label in networks:
+            ranges[network.version].append((int(network.network_address), int(network.broadcast_address),
+                                            network.prefixlen, label))
+        self.starts, self.ends, self.labels = {}, {}, {}
+        for version, items in ranges.items():
+            starts, ends, labels = self._flatten(items)
+            self.starts[version], self.ends[version], self.labels[version] = starts, ends, labels
+        self.size = sum(len(items) for items in ranges.values())
+
+    @staticmethod
+    def _flatten(ranges):
+        """Disjoint (start, end, label) intervals; inside an overlap the longest prefix wins"""
+        points = sorted({start for start, _, _, _ in ranges} | {end + 1 for _, end, _, _ in ranges})
+        by_start = sorted(ranges)
+        starts, ends, labels = [], [], []
+        active = []  # heap of (-prefixlen, end, label)
+        i = 0
+        for point, next_point in zip(points, points[1:]):
+            while i < len(by_start) and by_start[i][0] <= point:
+                start, end, prefixlen, label = by_start[i]
+                heapq.heappush(active, (-prefixlen, end, label))
+                i += 1
+            while active and active[0][1] < point:
+                heapq.heappop(active)
+            if not active:
+                # A gap no range covers
+                continue
+            label = active[0][2]
+            if labels and labels[-1] == label and ends[-1] + 1 == point:
+                ends[-1] = next_point - 1
+            else:
+                starts.append(point)
+                ends.append(next_point - 1)
+                labels.append(label)
+        return starts, ends, labels
+
+    def lookup(self, ip):
+        """Label of the range containing ``ip``, or None"""
+        try:
+            address = ipaddress.ip_address(ip)
+        except ValueError:
+            return None
+        if address.version == 6 and address.ipv4_mapped:
+            address = address.ipv4_mapped
+        value = int(address)
+        starts = self.starts[address.version]
+        i = bisect.bisect_right(starts, value) - 1
+        if i >= 0 and value <= self.ends[address.version][i]:
+            return self.labels[address.version][i]
+        return None
+
+
+def parse_networks(lines, source='networks'):
+    """
+    Yield (ip_network, label) from lines of '<cidr> <kind>[:<name>]',
+    where kind is 'crawler' or 'abuse'. '#' and ';' start comments, so
+    Spamhaus DROP style lists ('1.2.3.0/24 ; SBL123') load as 'abuse'.
+    """
+    for number, line in enumerate(lines, 1):
+        line = line.split('#', 1)[0]
+        line, _, comment = line.partition(';')
+        parts = line.split()
+        if not parts:
+            continue
+        label = parts[1] if len(parts) > 1 else f'abuse:{comment.strip() or "listed"}'
+        if label.split(':', 1)[0] not in NETWORK_KINDS:
+            logger.warning(f'{source}:{number}: unknown network kind in {label!r}')
+            continue
+        try:
+            yield ipaddress.ip_network(parts[0], strict=False), label
+        except ValueError:
+            logger.warning(f'{source}:{number}: invalid network {parts[0]!r}')
+
+
+def load_networks(paths):
+    networks = []
+    for path in paths:
+        try:
+            with open(path) as f:
+                networks.extend(parse_networks(f, str(path)))
+        except OSError as e:
+            logger.error(f'Could not read network list {path}: {str(e)}')
+    return NetworkIndex(networks)
+
+
+class ClientVerdict:
+    __slots__ = ('category', 'network')
+
+    def __init__(self, category, network):
+        self.category = category
+        self.network = network
+
+    @property
+    def network_kind(self):
+        return self.network.split(':', 1)[0] if self.network else None
+
+    @property
+    def is_bot(self):
+        return self.category is not None or self.network_kind == 'crawler'
+
+    @property
+    def is_abuse(self):
+        return self.network_kind == 'abuse'
+
+    def __repr__(self):
+        return f'<ClientVerdict category={self.category} network={self.network}>'
+
+
+class ReputationIndex:
+    """UA classifier plus network lookup, with an LRU cache of recent (ip, user agent) verdicts"""
+    def __init__(self, networks, cache_size=10000):
+        self.networks = networks
+        self.classify = lru_cache(maxsize=cache_size)(self._classify)
+
+    def _classify(self, ip, user_agent):
+        return ClientVerdict(classify_user_agent(user_agent), self.networks.lookup(ip) if ip else None)
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_reputation_index():
+    """The process-wide index, built from REPUTATION_NETWORK_FILES on first use"""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                networks = load_networks(getattr(settings, 'REPUTATION_NETWORK_FILES', []))
+                _index = ReputationIndex(networks, getattr(settings, 'REPUTATION_CACHE_SIZE', 10000))
+                logger.info(f'Loaded {networks.size} reputation network ranges')
+    return _index
+
+
+def classify_client(ip, user_agent):
+    return get_reputation_index().classify(ip or '', user_agent or '')
+
@@ -0,0 +1,261 @@
+import json
+import logging
+import math
+import mmap
+import os
+import re
+import struct
+import sys
+import threading
+import time
+from array import array
+from collections import Counter
+from html.parser import HTMLParser
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'BSHBM25\x01'
+INDEX_VERSION = 1
+
+WORD_RE = re.compile(r'[a-z0-9]+')
+TEMPLATE_TAG_RE = re.compile(r'{%.*?%}|{{.*?}}|{#.*?#}', re.S)
+PAGE_TITLE_RE = re.compile(r'{%\s*block page_title\s*%}(.*?){%\s*endblock', re.S)
+
+STOP_WORDS = frozenset('''
+a an and are as at be but by can do does for from get has have how i in is it its me my of on or our
+please so that the their them there this to us we what when where which who why will with would you
+your about also any been just know like more need not some tell than then today very want was were
+'''.split())
+
+HEADINGS = {'h1', 'h2', 'h3', 'h4'}
+HEADING_CLASSES = {'faq-question'}  # elements styled as headings, e.g. support.html's FAQ
+BLOCKS = {'p', 'li', 'div', 'section', 'br', 'tr', 'td'} | HEADINGS
+SKIPPED = {'script', 'style', 'button', 'form'}  # no answer text in these
+
+
+def stem(word):
+    """Fold plurals onto the singular: services -> service, companies -> company"""
+    if len(word) <= 3 or not word.endswith('s') or word.endswith(('ss', 'us', 'is')):
+        return word
+    if word.endswith('ies'):
+        return word[:-3] + 'y'
+    return word[:-1]
+
+
+def terms(text):
+    """Index terms of ``text``: lowercased words, single characters and stop words dropped, plurals folded"""
+    return [stem(word) for word in WORD_RE.findall(text.lower()) if len(word) > 1 and word not in STOP_WORDS]
+
+
+class Passage:
+    __slots__ = ('title', 'text', 'answer', 'source')
+
+    def __init__(self, title, text, answer, source):
+        self.title = title
+        self.text = text  # what is indexed
+        self.answer = answer  # what the chatbot replies
+        self.source = source
+
+
+class SectionParser(HTMLParser):
+    """Visible text of a page, split into (heading, lines) sections at h1-h4"""
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.sections = [['', []]]
+        self.skip = 0
+        self.heading = None
+        self.line = []
+        self.bullet = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIPPED:
+            self.skip += 1
+        elif tag in BLOCKS:
+            self.end_line()
+            if tag in HEADINGS or HEADING_CLASSES.intersection((dict(attrs).get('class') or '').split()):
+                self.heading = []
+            self.bullet = tag == 'li'
+
+    def handle_endtag(self, tag):
+        if tag in SKIPPED:
+            self.skip = max(0, self.skip - 1)
+        elif tag in BLOCKS:
+            self.end_line()
+            self.bullet = False
+
+    def handle_data(self, data):
+        if not self.skip:
+            self.line.append(data)
+
+    def end_line(self):
+        line = ' '.join(' '.join(self.line).split())
+        self.line = []
+        if self.heading is not None:
+            self.heading = None
+            if line:
+                self.sections.append([line, []])
+            return
+        if line:
+            self.sections[-1][1].append(('• ' if self.bullet else '') + line)
+
+    def close(self):
+        super().close()
+        self.end_line()
+
+
+def template_passages(path, url, max_lines=6, min_terms=4):
+    """
+    Passages for each headed section of a template, answered with the
+    section and a link to ``url``. Sections of fewer than ``min_terms``
+    terms (figures like '50+ Projects') are left out.
+    """
+    with open(path, encoding='utf-8') as f:
+        source = f.read()
+    title = PAGE_TITLE_RE.search(source)
+    title = title.group(1).strip() if title else os.path.basename(path)
+    parser = SectionParser()
+    parser.feed(TEMPLATE_TAG_RE.sub(' ', source))
+    parser.close()
+    passages = []
+    for heading, lines in parser.sections:
+        if not heading or len(terms(heading + ' ' + ' '.join(lines))) < min_terms:
+            continue
+        shown = lines[:max_lines] + (['…'] if len(lines) > max_lines else [])
+        answer = f'{title} — {heading}:\n' + '\n'.join(shown) + f'\n\nRead more: {url}'
+        passages.append(Passage(heading, f'{title}\n{heading}\n' + '\n'.join(lines), answer, url))
+    return passages
+
+
+def write_index(passages, path, k1=1.2, b=0.75):
+    """
+    Write a BM25 index of ``passages`` to ``path``: a JSON header (passages
+    and the term dictionary) followed by two flat arrays of postings, the
+    passage numbers (uint32) and their precomputed BM25 weights (float32),
+    grouped by term. The file is replaced atomically.
+    """
+    counts = [Counter(terms(passage.text)) for passage in passages]
+    lengths = [sum(c.values()) for c in counts]
+    average = sum(lengths) / len(lengths) if lengths else 1.0
+    postings = {}
+    for doc, counter in enumerate(counts):
+        for term, tf in counter.items():
+            postings.setdefault(term, []).append((doc, tf))
+
+    docs, weights, dictionary = array('I'), array('f'), {}
+    for term in sorted(postings):
+        entries = postings[term]
+        idf = math.log(1 + (len(passages) - len(entries) + 0.5) / (len(entries) + 0.5))
+        dictionary[term] = [len(docs), len(entries)]
+        for doc, tf in entries:
+            norm = k1 * (1 - b + b * lengths[doc] / average)
+            docs.append(doc)
+            weights.append(idf * tf * (k1 + 1) / (tf + norm))
+
+    header = json.dumps({
+        'version': INDEX_VERSION,
+        'byteorder': sys.byteorder,
+        'k1': k1,
+        'b': b,
+        'postings': len(docs),
+        'passages': [[p.title, p.answer, p.source] for p in passages],
+        'terms': dictionary,
+    }, separators=(',', ':')).encode()
+    header += b' ' * (-(len(MAGIC) + 4 + len(header)) % 4)
+    tmp = f'{path}.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(MAGIC)
+        f.write(struct.pack('<I', len(header)))
+        f.write(header)
+        docs.tofile(f)
+        weights.tofile(f)
+    os.replace(tmp, path)
+    return len(dictionary), len(docs)
+
+
+class SearchIndex:
+    """
+    A write_index file, memory-mapped: the postings stay in the page cache,
+    shared by every worker, and only the term dictionary and passage
+    answers are loaded. A query costs one dictionary lookup per term plus
+    a pass over that term's postings.
+    """
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.map[:len(MAGIC)] != MAGIC:
+            raise ValueError('not a chatbot search index')
+        (size,) = struct.unpack_from('<I', self.map, len(MAGIC))
+        start = len(MAGIC) + 4
+        header = json.loads(self.map[start:start + size])
+        if header['version'] != INDEX_VERSION or header['byteorder'] != sys.byteorder:
+            raise ValueError(f'index version {header["version"]} ({header["byteorder"]}-endian) '
+                             f'cannot be read here; rebuild it')
+        count = header['postings']
+        start += size
+        view = memoryview(self.map)
+        self.docs = view[start:start + 4 * count].cast('I')
+        self.weights = view[start + 4 * count:start + 8 * count].cast('f')
+        self.terms = header['terms']
+        self.passages = header['passages']
+
+    def __len__(self):
+        return len(self.passages)
+
+    def search(self, text, limit=1):
+        """Up to ``limit`` (score, passage number) pairs for ``text``, best first"""
+        scores = {}
+        docs, weights = self.docs, self.weights
+        for term in set(terms(text)):
+            span = self.terms.get(term)
+            if span is None:
+                continue
+            start, count = span
+            for i in range(start, start + count):
+                doc = docs[i]
+                scores[doc] = scores.get(doc, 0.0) + weights[i]
+        if limit == 1:
+            return [max((score, doc) for doc, score in scores.items())] if scores else []
+        return sorted(((score, doc) for doc, score in scores.items()), reverse=True)[:limit]
+
+    def answer(self, text, min_score):
+        """Answer of the best passage for ``text`` if it scores at least ``min_score``, else None"""
+        hits = self.search(text)
+        if not hits or hits[0][0] < min_score:
+            return None
+        return self.passages[hits[0][1]][1]
+
+
+_index = None
+_index_mtime = None
+_checked_at = 0.0
+_lock = threading.Lock()
+
+
+def get_index():
+    """
+    The process-wide SearchIndex, or None when CHATBOT_INDEX_PATH has not
+    been built (`manage.py build_chatbot_index`). Re-checked every
+    CHATBOT_INDEX_CHECK_INTERVAL seconds like the spam model.
+    """
+    global _index, _index_mtime, _checked_at
+    now = time.monotonic()
+    if _checked_at and now - _checked_at < getattr(settings, 'CHATBOT_INDEX_CHECK_INTERVAL', 60):
+        return _index
+    with _lock:
+        _checked_at = now
+        path = getattr(settings, 'CHATBOT_INDEX_PATH', None)
+        try:
+            mtime = os.stat(path).st_mtime if path else None
+        except OSError:
+            mtime = None
+        if mtime != _index_mtime:
+            index = None
+            if mtime is not None:
+                try:
+                    index = SearchIndex(path)
+                except (OSError, ValueError, KeyError) as e:
+                    logger.error(f'Could not load chatbot search index {path}: {str(e)}')
+            _index, _index_mtime = index, mtime
+    return _index
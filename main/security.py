@@ -3,7 +3,9 @@ import time
 from django.core.cache import cache
 from django.conf import settings
 from ipware import get_client_ip
-from .models import SecurityLog
+from .scanner import get_scanner
+from .reputation import classify_client, classify_user_agent
+from .security_events import record_security_event
 import random
 import string
 from datetime import datetime, timedelta
@@ -57,36 +59,6 @@ def validate_captcha(request, user_input, session_key='captcha'):
         logger.error(f"CAPTCHA validation error: {str(e)}")
         return False, "CAPTCHA validation error. Please refresh the page."
 
-# ===== RATE LIMITING =====
-def check_rate_limit(ip, action, limit=5, period=3600):
-    """
-    Check if IP has exceeded rate limit for specific action
-    limit: maximum attempts allowed
-    period: time window in seconds (default 1 hour)
-    """
-    cache_key = f'rate_limit:{action}:{ip}'
-    attempts = cache.get(cache_key, 0)
-    
-    if attempts >= limit:
-        return False  # Rate limit exceeded
-    
-    cache.set(cache_key, attempts + 1, period)
-    return True  # Within limit
-
-# ===== SECURITY LOGGING =====
-def log_security_event(event_type, ip, user_agent, details=None):
-    """
-    Log security events for monitoring
-    """
-    logger.warning(
-        f"SECURITY EVENT - Type: {event_type}, IP: {ip}, "
-        f"User-Agent: {user_agent[:100]}, Details: {details}"
-    )
-    
-    # You could also save to database here
-    # from .models import SecurityLog
-    # SecurityLog.objects.create(...)
-
 # ===== FORM VALIDATION =====
 def validate_form_data(form_data, required_fields=None):
     """
@@ -113,65 +85,20 @@ def validate_form_data(form_data, required_fields=None):
             errors['phone'] = "Please enter a valid phone number (at least 10 digits)"
     
     return errors
-def log_security_event(event_type, ip, user_agent, details):
-    """Log security events to database"""
-    try:
-        SecurityLog.objects.create(
-            event_type=event_type,
-            ip_address=ip,
-            user_agent=user_agent[:500] if user_agent else '',
-            details=details[:1000]
-        )
-    except Exception as e:
-        # Fallback to console logging if database fails
-        print(f"Security Event - {event_type}: {details}")
-
-def check_rate_limit(ip, action, limit=5, period=60):
-    """Implement rate limiting for actions"""
-    cache_key = f"rate_limit:{ip}:{action}"
-    attempts = cache.get(cache_key, 0)
-    
-    if attempts >= limit:
-        log_security_event('rate_limit', ip, '', f'Rate limit exceeded for {action}')
-        return False
-    
-    cache.set(cache_key, attempts + 1, period)
-    return True
+# ===== SECURITY LOGGING =====
+def log_security_event(event_type, ip, user_agent, details, **params):
+    """
+    Log a security event (see main.security_events). Written in the
+    background; repeats from one IP within a flush window share a row.
+    """
+    record_security_event(event_type, ip, user_agent, details, **params)
 
 def validate_form_data(form_data):
-    """Validate form data for malicious content"""
-    # SQL injection patterns
-    sql_patterns = [
-        r"(\%27)|(\')|(\-\-)|(\%23)|(#)",
-        r"((\%3D)|(=))[^\n]*((\%27)|(\')|(\-\-)|(\%3B)|(;))",
-        r"\w*((\%27)|(\'))((\%6F)|o|(\%4F))((\%72)|r|(\%52))",
-        r"((\%27)|(\'))union",
-        r"exec(\s|\+)+(s|x)p\w+",
-    ]
-    
-    # XSS patterns
-    xss_patterns = [
-        r"<script[^>]*>.*?</script>",
-        r"javascript:",
-        r"on\w+\s*=",
-        r"<iframe[^>]*>.*?</iframe>",
-        r"<object[^>]*>.*?</object>",
-        r"<embed[^>]*>.*?</embed>",
-        r"<applet[^>]*>.*?</applet>",
-    ]
-    
-    # Check each form field
-    for key, value in form_data.items():
-        if isinstance(value, str):
-            # Check for SQL injection
-            for pattern in sql_patterns:
-                if re.search(pattern, value, re.IGNORECASE):
-                    return False, f"SQL injection detected in {key}"
-            
-            # Check for XSS
-            for pattern in xss_patterns:
-                if re.search(pattern, value, re.IGNORECASE):
-                    return False, f"XSS attack detected in {key}"
+    """Validate form data for malicious content (see main.scanner for the rules)"""
+    threat = get_scanner().scan_fields(form_data)
+    if threat:
+        logger.info(f"Input rejected by rule {threat.rule} in {threat.field}")
+        return False, f"{threat.label} detected in {threat.field}"
     
     return True, "Valid"
 
@@ -196,24 +123,23 @@ def sanitize_input(input_string):
     
     return clean.strip()
 
+def is_bot_user_agent(user_agent):
+    """Cheap user-agent only bot check (no logging)"""
+    return classify_user_agent(user_agent) is not None
+
 def check_bot_activity(user_agent, ip):
-    """Check for bot-like activity"""
-    if not user_agent:
+    """
+    Check for bot-like activity (see main.reputation). Repeated hits are
+    coalesced into one SecurityLog row per flush window.
+    """
+    verdict = classify_client(ip, user_agent)
+    if verdict.is_abuse:
+        log_security_event('suspicious', ip, user_agent, 'Request from listed network {network}',
+                           network=verdict.network)
+        return True
+    if verdict.is_bot:
+        log_security_event('bot', ip, user_agent, 'Bot detected ({reason})', reason=verdict.category or verdict.network)
         return True
-    
-    bot_indicators = [
-        'bot', 'crawl', 'spider', 'scrape', 'curl', 'wget',
-        'python', 'java', 'php', 'ruby', 'perl', 'go-http',
-        'okhttp', 'requests', 'libwww', 'lwp', 'http-client'
-    ]
-    
-    user_agent_lower = user_agent.lower()
-    
-    for indicator in bot_indicators:
-        if indicator in user_agent_lower:
-            log_security_event('bot', ip, user_agent, 'Bot detected')
-            return True
-    
     return False
 
 def generate_csrf_token():
@@ -252,32 +178,3 @@ def verify_csrf_token(token):
     
     except:
         return False
-
-class SecurityMiddleware:
-    """Custom security middleware"""
-    def __init__(self, get_response):
-        self.get_response = get_response
-    
-    def __call__(self, request):
-        # Add security headers
-        response = self.get_response(request)
-        
-        # Security headers
-        response['X-Content-Type-Options'] = 'nosniff'
-        response['X-Frame-Options'] = 'DENY'
-        response['X-XSS-Protection'] = '1; mode=block'
-        response['Referrer-Policy'] = 'strict-origin-when-cross-origin'
-        
-        # CSP Header (adjust based on your needs)
-        csp = [
-            "default-src 'self'",
-            "script-src 'self' https://www.google.com https://www.gstatic.com",
-            "style-src 'self' 'unsafe-inline' https://cdnjs.cloudflare.com",
-            "img-src 'self' data: https:",
-            "font-src 'self' https://cdnjs.cloudflare.com",
-            "connect-src 'self'",
-            "frame-ancestors 'none'",
-        ]
-        response['Content-Security-Policy'] = '; '.join(csp)
-        
-        return response
\ No newline at end of file
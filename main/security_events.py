@@ -0,0 +1,49 @@
+import logging
+
+from django.conf import settings
+
+from .buffers import CoalescingBuffer
+from .models import SecurityLog
+
+logger = logging.getLogger(__name__)
+
+
+def _event_key(event):
+    event_type, ip, _, template, _ = event
+    return event_type, ip, template
+
+
+def write_security_events(entries):
+    """One SecurityLog row per coalesced (event type, ip, template), with the event count"""
+    rows = []
+    for entry in entries:
+        event_type, ip, user_agent, _, details = entry.item
+        rows.append(SecurityLog(
+            event_type=event_type,
+            ip_address=ip,
+            user_agent=user_agent,
+            details=details,
+            count=entry.count,
+        ))
+    SecurityLog.objects.bulk_create(rows, batch_size=len(rows))
+    logger.debug(f'Flushed {len(rows)} security log rows')
+
+
+security_event_buffer = CoalescingBuffer(
+    'securitylog',
+    write_security_events,
+    _event_key,
+    batch_size=getattr(settings, 'SECURITYLOG_BATCH_SIZE', 500),
+    flush_interval=getattr(settings, 'SECURITYLOG_FLUSH_INTERVAL', 10.0),
+    max_pending=getattr(settings, 'SECURITYLOG_MAX_PENDING', 5000),
+)
+
+
+def record_security_event(event_type, ip, user_agent, template, **params):
+    """
+    Queue a SecurityLog row. ``template`` is formatted with ``params`` for the
+    details; events with the same type, ip and template before the next
+    flush become one row, whose details are those of the first event.
+    """
+    details = template.format(**params) if params else template
+    security_event_buffer.add((event_type, ip or '0.0.0.0', (user_agent or '')[:500], template, details[:1000]))
@@ -0,0 +1,262 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import F, Q
+from django.forms.models import model_to_dict
+from django.utils import timezone
+
+from .google_sheets import form_row, sheets_client, write_limiter
+from .models import (
+    ContactMessage, Subscriber, ServiceInquiry, ProposalRequest,
+    CareerApplication, SyncCursor, SUBMITTED_AT_FIELDS
+)
+
+logger = logging.getLogger(__name__)
+
+# Retries for a request the API rejected with 429 (quota exceeded)
+QUOTA_RETRIES = 3
+
+# sync_unsynced --model name -> (model, worksheet)
+SYNCED_MODELS = {
+    'contacts': (ContactMessage, 'contact_messages'),
+    'subscribers': (Subscriber, 'subscribers'),
+    'inquiries': (ServiceInquiry, 'service_inquiries'),
+    'proposals': (ProposalRequest, 'proposal_requests'),
+    'applications': (CareerApplication, 'career_applications'),
+}
+
+# Model fields that never go to the sheet
+UNSYNCED_FIELDS = ['sync_status', 'sync_attempts', 'sync_error', 'synced_at', 'verification_token']
+
+
+class SyncReport:
+    """Running totals for one sync run"""
+    def __init__(self):
+        self.rows = 0
+        self.requests = 0
+        self.errors = {}
+        self.throttled = 0.0
+        self.started = time.monotonic()
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    @property
+    def rows_per_sec(self):
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+    def summary(self):
+        return (
+            f'{self.rows} rows in {self.requests} requests, {self.elapsed:.1f}s '
+            f'({self.rows_per_sec:.1f} rows/sec), {len(self.errors)} failed, '
+            f'{self.throttled:.1f}s waiting for quota'
+        )
+
+
+def _cell(value):
+    if isinstance(value, bool):
+        return {'userEnteredValue': {'boolValue': value}}
+    if isinstance(value, (int, float)):
+        return {'userEnteredValue': {'numberValue': value}}
+    return {'userEnteredValue': {'stringValue': '' if value is None else str(value)}}
+
+
+def _append_cells(spreadsheet, segments):
+    """Append rows to several worksheets in one spreadsheets.batchUpdate call"""
+    requests = [
+        {'appendCells': {
+            'sheetId': sheets_client.worksheet(sheet_name).id,
+            'rows': [{'values': [_cell(value) for value in row]} for _, row in entries],
+            'fields': 'userEnteredValue',
+        }}
+        for sheet_name, entries in segments
+    ]
+    return spreadsheet.batch_update({'requests': requests})
+
+
+def _plan_requests(items, chunk_size):
+    """
+    Group ``(key, sheet_name, row)`` items per worksheet and pack them into
+    requests of at most ``chunk_size`` rows. Each request is a list of
+    ``(sheet_name, [(key, row), ...])`` segments.
+    """
+    by_sheet = {}
+    for key, sheet_name, row in items:
+        by_sheet.setdefault(sheet_name, []).append((key, row))
+
+    requests, current, size = [], [], 0
+    for sheet_name, entries in by_sheet.items():
+        while entries:
+            take = entries[:chunk_size - size]
+            entries = entries[len(take):]
+            current.append((sheet_name, take))
+            size += len(take)
+            if size >= chunk_size:
+                requests.append(current)
+                current, size = [], 0
+    if current:
+        requests.append(current)
+    return requests
+
+
+def _send(segments):
+    if len(segments) == 1:
+        sheet_name, entries = segments[0]
+        rows = [row for _, row in entries]
+        return sheets_client.call(sheet_name, lambda worksheet: worksheet.append_rows(rows), throttle=False)
+    return sheets_client.call(None, lambda spreadsheet: _append_cells(spreadsheet, segments), throttle=False)
+
+
+def sync_rows(items, chunk_size=None, report=None):
+    """
+    Append ``(key, sheet_name, row)`` items in as few API calls as possible:
+    rows for one worksheet go out with ``append_rows``, rows spanning
+    several worksheets with one ``batch_update``. Every request waits for
+    the write quota. Returns a dict mapping the key of each row of this
+    call that could not be written to its exception; totals, failures
+    included, are added to ``report``, which may span several calls.
+    """
+    chunk_size = max(1, chunk_size or getattr(settings, 'GOOGLE_SHEETS_CHUNK_SIZE', 500))
+    report = report or SyncReport()
+    errors = {}
+
+    items = list(items)
+    for sheet_name in {sheet_name for _, sheet_name, _ in items}:
+        try:
+            sheets_client.worksheet(sheet_name)
+        except Exception as e:
+            # Keep a missing worksheet from failing rows bound for the others
+            logger.error(f'Google Sheets worksheet "{sheet_name}" unavailable: {str(e)}')
+            for key, name, _ in items:
+                if name == sheet_name:
+                    errors[key] = e
+    items = [item for item in items if item[0] not in errors]
+
+    for segments in _plan_requests(items, chunk_size):
+        keys = [key for _, entries in segments for key, _ in entries]
+        for attempt in range(QUOTA_RETRIES + 1):
+            report.requests += 1
+            report.throttled += write_limiter.acquire()
+            try:
+                _send(segments)
+            except Exception as e:
+                status = getattr(getattr(e, 'response', None), 'status_code', None)
+                if status == 429 and attempt < QUOTA_RETRIES:
+                    delay = 2 ** attempt * 10
+                    logger.warning(f'Google Sheets quota exceeded, retrying in {delay}s')
+                    time.sleep(delay)
+                    continue
+                logger.error(f'Failed to append {len(keys)} rows to Google Sheets: {str(e)}')
+                for key in keys:
+                    errors[key] = e
+            else:
+                report.rows += len(keys)
+            break
+
+    report.errors.update(errors)
+    return errors
+
+
+def record_row(instance):
+    """Sheet row for a stored form submission"""
+    data = model_to_dict(instance, exclude=UNSYNCED_FIELDS)
+    submitted_at = getattr(instance, SUBMITTED_AT_FIELDS[type(instance)])
+    return form_row(data, timezone.localtime(submitted_at).strftime('%Y-%m-%d %H:%M:%S'))
+
+
+def synced_pks(model, pks):
+    return {str(pk) for pk in model.objects.filter(pk__in=pks, sync_status='synced').values_list('pk', flat=True)}
+
+
+def mark_outcomes(records, errors):
+    """
+    Record sync results on the submissions. ``records`` maps each sync key to
+    the ``(model, pk)`` it was written for; ``errors`` maps failed keys to
+    their exception.
+    """
+    now = timezone.now()
+    synced, failed = {}, {}
+    for key, (model, pk) in records.items():
+        if key in errors:
+            failed.setdefault((model, id(errors[key])), (errors[key], []))[1].append(pk)
+        else:
+            synced.setdefault(model, []).append(pk)
+
+    for model, pks in synced.items():
+        model.objects.filter(pk__in=pks).update(
+            sync_status='synced', sync_error='', synced_at=now, sync_attempts=F('sync_attempts') + 1
+        )
+    for (model, _), (error, pks) in failed.items():
+        model.objects.filter(pk__in=pks).exclude(sync_status='synced').update(
+            sync_status='failed', sync_error=f'{type(error).__name__}: {str(error)}'[:2000],
+            sync_attempts=F('sync_attempts') + 1
+        )
+
+
+def sync_model(name, limit=100, chunk_size=None, report=None):
+    """
+    Append one model's unsynced submissions to its worksheet. New rows are
+    read from the model's SyncCursor high-water mark onwards (leaving the
+    last GOOGLE_SHEETS_SYNC_GRACE seconds to the outbox), then failed rows
+    are retried, up to ``limit`` rows in all.
+    """
+    model, sheet_name = SYNCED_MODELS[name]
+    ts_field = SUBMITTED_AT_FIELDS[model]
+    report = report or SyncReport()
+    until = timezone.now() - timedelta(seconds=getattr(settings, 'GOOGLE_SHEETS_SYNC_GRACE', 600))
+    cursor, _ = SyncCursor.objects.get_or_create(name=name)
+
+    new = model.objects.filter(**{f'{ts_field}__lte': until}).exclude(sync_status='synced')
+    if cursor.position:
+        after = Q(**{f'{ts_field}__gt': cursor.position})
+        if cursor.last_pk:
+            # The previous run stopped part-way through rows sharing this timestamp
+            after |= Q(**{ts_field: cursor.position, 'pk__gt': cursor.last_pk})
+        new = new.filter(after)
+    rows = list(new.order_by(ts_field, 'pk')[:limit])
+
+    if len(rows) == limit:
+        position, last_pk = getattr(rows[-1], ts_field), str(rows[-1].pk)
+    else:
+        position, last_pk = until, ''
+        seen = {row.pk for row in rows}
+        retry = model.objects.filter(
+            sync_status='failed',
+            sync_attempts__lt=getattr(settings, 'GOOGLE_SHEETS_SYNC_MAX_ATTEMPTS', 10),
+        ).order_by(ts_field)
+        rows += [row for row in retry[:limit - len(rows)] if row.pk not in seen]
+
+    if rows:
+        errors = sync_rows([(row.pk, sheet_name, record_row(row)) for row in rows], chunk_size, report)
+        mark_outcomes({row.pk: (model, row.pk) for row in rows}, errors)
+
+    cursor.position, cursor.last_pk = position, last_pk
+    cursor.save(update_fields=['position', 'last_pk', 'updated_at'])
+    return report
+
+
+def _sync_in_thread(name, limit, chunk_size):
+    try:
+        return sync_model(name, limit, chunk_size)
+    finally:
+        # Connections are per thread; don't leak this worker's
+        connections.close_all()
+
+
+def sync_models(names, limit=100, chunk_size=None, parallel=True):
+    """
+    Sync several models, concurrently by default so a full run takes as long
+    as the slowest model. All threads share the process write quota.
+    Returns {name: SyncReport}.
+    """
+    if not parallel or len(names) < 2:
+        return {name: sync_model(name, limit, chunk_size) for name in names}
+
+    with ThreadPoolExecutor(max_workers=len(names), thread_name_prefix='sheets-sync') as pool:
+        futures = {name: pool.submit(_sync_in_thread, name, limit, chunk_size) for name in names}
+        return {name: future.result() for name, future in futures.items()}
@@ -8,17 +8,22 @@ from django.utils.html import strip_tags
 from django.utils import timezone
 from .models import (
     ContactMessage, Subscriber, ServiceInquiry, 
-    ProposalRequest, CareerApplication, SecurityLog
+    ProposalRequest, CareerApplication
 )
+from .outbox import enqueue
+from .security import log_security_event
+from .spam import get_filter
 import logging
 
 logger = logging.getLogger(__name__)
 
 # Email templates
+# These run in the outbox worker (main.jobs) and raise on failure so the job
+# is retried with backoff.
 def send_contact_confirmation_email(contact_message):
     """Send confirmation email for contact form submission"""
     try:
-        subject = f'Thank you for contacting BunShai TECHNOHUB - #{contact_message.id[:8]}'
+        subject = f'Thank you for contacting BunShai TECHNOHUB - #{str(contact_message.id)[:8]}'
         html_message = render_to_string('emails/contact_confirmation.html', {
             'contact': contact_message,
             'support_email': settings.SUPPORT_EMAIL,
@@ -37,12 +42,7 @@ def send_contact_confirmation_email(contact_message):
         logger.info(f'Contact confirmation email sent to {contact_message.email}')
     except Exception as e:
         logger.error(f'Error sending contact confirmation email: {e}')
-        # Log security event for email failure
-        SecurityLog.objects.create(
-            event_type='other',
-            ip_address=contact_message.ip_address or '0.0.0.0',
-            details=f'Failed to send contact confirmation email to {contact_message.email}: {str(e)}'
-        )
+        raise
 
 def send_subscription_confirmation_email(subscriber):
     """Send confirmation email for subscription"""
@@ -66,6 +66,7 @@ def send_subscription_confirmation_email(subscriber):
         logger.info(f'Subscription confirmation email sent to {subscriber.email}')
     except Exception as e:
         logger.error(f'Error sending subscription confirmation email: {e}')
+        raise
 
 def send_service_inquiry_email(inquiry):
     """Send notification for service inquiry"""
@@ -89,6 +90,7 @@ def send_service_inquiry_email(inquiry):
         logger.info(f'Service inquiry notification sent for {inquiry.email}')
     except Exception as e:
         logger.error(f'Error sending service inquiry email: {e}')
+        raise
 
 def send_proposal_request_email(proposal):
     """Send notification for proposal request"""
@@ -112,6 +114,7 @@ def send_proposal_request_email(proposal):
         logger.info(f'Proposal request notification sent for {proposal.email}')
     except Exception as e:
         logger.error(f'Error sending proposal request email: {e}')
+        raise
 
 def send_career_application_email(application):
     """Send notification for career application"""
@@ -135,94 +138,82 @@ def send_career_application_email(application):
         logger.info(f'Career application notification sent for {application.email}')
     except Exception as e:
         logger.error(f'Error sending career application email: {e}')
+        raise
 
 # Signal receivers
 @receiver(post_save, sender=ContactMessage)
 def handle_contact_message_save(sender, instance, created, **kwargs):
     """Handle contact message save signal"""
     if created:
-        # Send confirmation email to user
-        send_contact_confirmation_email(instance)
+        # Send confirmation email to user (via the outbox worker)
+        enqueue('model_email', {'model': 'contactmessage', 'pk': str(instance.pk)})
         
         # Log the contact submission
-        SecurityLog.objects.create(
-            event_type='other',
-            ip_address=instance.ip_address or '0.0.0.0',
-            user_agent=instance.user_agent or '',
-            details=f'Contact form submitted by {instance.email}'
-        )
+        log_security_event('other', instance.ip_address, instance.user_agent,
+                           'Contact form submitted by {email}', email=instance.email)
 
 @receiver(post_save, sender=Subscriber)
 def handle_subscriber_save(sender, instance, created, **kwargs):
     """Handle subscriber save signal"""
     if created:
-        # Send confirmation email
-        send_subscription_confirmation_email(instance)
+        # Send confirmation email (via the outbox worker)
+        enqueue('model_email', {'model': 'subscriber', 'pk': str(instance.pk)})
         
         # Log subscription
-        SecurityLog.objects.create(
-            event_type='other',
-            ip_address=instance.ip_address or '0.0.0.0',
-            details=f'New subscription from {instance.email}'
-        )
+        log_security_event('other', instance.ip_address, '',
+                           'New subscription from {email}', email=instance.email)
 
 @receiver(post_save, sender=ServiceInquiry)
 def handle_service_inquiry_save(sender, instance, created, **kwargs):
     """Handle service inquiry save signal"""
     if created:
-        # Send notification email to admin
-        send_service_inquiry_email(instance)
+        # Send notification email to admin (via the outbox worker)
+        enqueue('model_email', {'model': 'serviceinquiry', 'pk': str(instance.pk)})
         
         # Log inquiry
-        SecurityLog.objects.create(
-            event_type='other',
-            ip_address=instance.ip_address or '0.0.0.0',
-            details=f'Service inquiry from {instance.email} for {instance.get_service_display()}'
-        )
+        log_security_event('other', instance.ip_address, '', 'Service inquiry from {email} for {service}',
+                           email=instance.email, service=instance.get_service_display())
 
 @receiver(post_save, sender=ProposalRequest)
 def handle_proposal_request_save(sender, instance, created, **kwargs):
     """Handle proposal request save signal"""
     if created:
-        # Send notification email to admin
-        send_proposal_request_email(instance)
+        # Send notification email to admin (via the outbox worker)
+        enqueue('model_email', {'model': 'proposalrequest', 'pk': str(instance.pk)})
         
         # Log proposal request
-        SecurityLog.objects.create(
-            event_type='other',
-            ip_address=instance.ip_address or '0.0.0.0',
-            details=f'Proposal request from {instance.email} for {instance.get_service_display()}'
-        )
+        log_security_event('other', instance.ip_address, '', 'Proposal request from {email} for {service}',
+                           email=instance.email, service=instance.get_service_display())
 
 @receiver(post_save, sender=CareerApplication)
 def handle_career_application_save(sender, instance, created, **kwargs):
     """Handle career application save signal"""
     if created:
-        # Send notification email to HR/admin
-        send_career_application_email(instance)
+        # Send notification email to HR/admin (via the outbox worker)
+        enqueue('model_email', {'model': 'careerapplication', 'pk': str(instance.pk)})
         
         # Log application
-        SecurityLog.objects.create(
-            event_type='other',
-            ip_address=instance.ip_address or '0.0.0.0',
-            details=f'Career application from {instance.email} for {instance.get_position_display()}'
-        )
+        log_security_event('other', instance.ip_address, '', 'Career application from {email} for {position}',
+                           email=instance.email, position=instance.get_position_display())
 
 @receiver(pre_save, sender=ContactMessage)
+@receiver(pre_save, sender=Subscriber)
+@receiver(pre_save, sender=ServiceInquiry)
+@receiver(pre_save, sender=ProposalRequest)
+@receiver(pre_save, sender=CareerApplication)
 def check_spam_before_save(sender, instance, **kwargs):
-    """Check for spam in contact messages before saving"""
-    if not instance.pk:  # Only for new messages
-        spam_keywords = [
-            'buy now', 'click here', 'http://', 'https://', 'www.', '.com',
-            'urgent', 'ASAP', 'earn money', 'make money', 'work from home',
-            'investment', 'lottery', 'winner', 'prize', 'free', 'discount',
-            'viagra', 'cialis', 'pharmacy', 'drug', 'medication'
-        ]
-        
-        message_lower = instance.message.lower()
-        if any(keyword in message_lower for keyword in spam_keywords):
+    """Score new form submissions for spam (see main.spam)"""
+    # pk is a default uuid4, so it is set before the first save
+    if instance._state.adding and not instance.spam_reviewed:
+        verdict = get_filter().score_instance(instance)
+        instance.spam_score = verdict.score
+        if verdict.is_spam:
             instance.is_spam = True
-            logger.warning(f'Potential spam detected from {instance.email}')
+            logger.warning(f'Potential spam detected from {instance.email} '
+                           f'(score {verdict.score:.2f}, signals {", ".join(sorted(verdict.signals)) or "none"})')
+            log_security_event('spam', instance.ip_address, getattr(instance, 'user_agent', ''),
+                               'Potential spam {model} from {email}',
+                               model=sender._meta.verbose_name.lower(), email=instance.email)
 
 @receiver(pre_save, sender=Subscriber)
 def validate_email_before_save(sender, instance, **kwargs):
@@ -237,22 +228,3 @@ def validate_email_before_save(sender, instance, **kwargs):
             instance.subscribed_at = existing.subscribed_at
             instance.is_active = True  # Reactivate
             logger.info(f'Reactivated existing subscriber: {instance.email}')
-
-# Rate limiting check
-def check_rate_limit(ip_address, model_class, time_window_minutes=15, max_requests=5):
-    """Check if an IP address has exceeded rate limits"""
-    time_threshold = timezone.now() - timezone.timedelta(minutes=time_window_minutes)
-    recent_requests = model_class.objects.filter(
-        ip_address=ip_address,
-        created_at__gte=time_threshold
-    ).count()
-    
-    if recent_requests >= max_requests:
-        # Log security event for rate limiting
-        SecurityLog.objects.create(
-            event_type='bruteforce',
-            ip_address=ip_address,
-            details=f'Rate limit exceeded for {model_class.__name__} ({recent_requests} requests in {time_window_minutes} minutes)'
-        )
-        return True
-    return False
\ No newline at end of file
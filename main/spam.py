@@ -0,0 +1,265 @@
+import json
+import logging
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter, deque
+
+from django.conf import settings
+
+from .models import CareerApplication, ContactMessage, ProposalRequest, ServiceInquiry, Subscriber
+
+logger = logging.getLogger(__name__)
+
+# Form model -> the fields whose text is scored
+SPAM_MODELS = {
+    ContactMessage: ('name', 'message'),
+    Subscriber: ('email',),
+    ServiceInquiry: ('name', 'company', 'message'),
+    ProposalRequest: ('name', 'requirements'),
+    CareerApplication: ('name', 'cover_letter'),
+}
+
+# Keyword signals: name -> (weight in log-odds, phrases). Phrases are matched
+# case-insensitively on word boundaries, so 'free' does not fire on
+# 'freelance' and an email address no longer counts as a '.com' link.
+KEYWORDS = {
+    'pharma': (4.5, ['viagra', 'cialis', 'pharmacy', 'medication', 'pills']),
+    'money': (4.5, ['earn money', 'make money', 'work from home', 'lottery', 'casino', 'bitcoin', 'crypto']),
+    'call_to_action': (2.0, ['buy now', 'click here', 'order now', 'limited time', 'act now']),
+    'prize': (2.0, ['winner', 'prize', 'you have won', 'congratulations']),
+    'seo': (2.0, ['seo services', 'backlinks', 'guest post', 'rank your website', 'first page of google']),
+    'offer': (1.0, ['free', 'discount', 'investment', 'cheap']),
+    'urgency': (1.0, ['urgent', 'asap']),
+    'link': (1.0, ['http://', 'https://', 'www.']),
+}
+
+# Log-odds of an unscored message being spam when no model is trained
+DEFAULT_BIAS = -2.0
+
+TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9'_-]{1,29}")
+
+
+def sigmoid(x):
+    if x < -30:
+        return 0.0
+    if x > 30:
+        return 1.0
+    return 1 / (1 + math.exp(-x))
+
+
+class AhoCorasick:
+    """
+    Multi-pattern matcher: one pass over the text finds every pattern,
+    however many there are. The automaton is compiled to a DFA (each state
+    maps a character straight to the next state), so the scan is a dict
+    lookup per character with no failure-link walking.
+    """
+    def __init__(self, patterns):
+        goto = [{}]
+        output = [[]]
+        for pattern in patterns:
+            state = 0
+            for ch in pattern:
+                if ch not in goto[state]:
+                    goto.append({})
+                    output.append([])
+                    goto[state][ch] = len(goto) - 1
+                state = goto[state][ch]
+            output[state].append(pattern)
+
+        # Breadth-first, so a state's failure target is complete before it
+        fail = [0] * len(goto)
+        delta = [dict(goto[0])] + [None] * (len(goto) - 1)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            delta[state] = dict(delta[fail[state]])
+            delta[state].update(goto[state])
+            output[state] = output[state] + output[fail[state]]
+            for ch, child in goto[state].items():
+                fail[child] = delta[fail[state]].get(ch, 0)
+                queue.append(child)
+
+        self.delta = delta
+        self.output = [tuple(patterns) for patterns in output]
+
+    def search(self, text):
+        """Yield (end index, pattern) for every occurrence in ``text``"""
+        delta, output = self.delta, self.output
+        state = 0
+        for i, ch in enumerate(text):
+            state = delta[state].get(ch, 0)
+            if output[state]:
+                for pattern in output[state]:
+                    yield i, pattern
+
+
+class KeywordMatcher:
+    """Keyword signals found in a text, via one Aho-Corasick pass"""
+    def __init__(self, keywords=KEYWORDS):
+        self.signals = {}
+        for name, (weight, phrases) in keywords.items():
+            for phrase in phrases:
+                self.signals[phrase.lower()] = name
+        self.weights = {name: weight for name, (weight, _) in keywords.items()}
+        self.automaton = AhoCorasick(self.signals)
+
+    def find(self, text):
+        """Set of signal names in ``text`` (lowercased by the caller)"""
+        found = set()
+        for end, phrase in self.automaton.search(text):
+            start = end - len(phrase) + 1
+            # Word boundaries, for phrases that start or end with a word character
+            if phrase[0].isalnum() and start > 0 and text[start - 1].isalnum():
+                continue
+            if phrase[-1].isalnum() and end + 1 < len(text) and text[end + 1].isalnum():
+                continue
+            found.add(self.signals[phrase])
+        return found
+
+
+def features(text, signals):
+    """Binary features of a message: its distinct words plus its keyword signals"""
+    return set(TOKEN_RE.findall(text)) | {f'kw:{name}' for name in signals}
+
+
+class NaiveBayes:
+    """
+    Binarized multinomial Naive Bayes, reduced to what scoring needs: one
+    log-odds weight per feature plus a bias, so a message is scored with a
+    dict lookup per distinct word.
+    """
+    def __init__(self, weights=None, bias=0.0, meta=None):
+        self.weights = weights or {}
+        self.bias = bias
+        self.meta = meta or {}
+
+    @classmethod
+    def train(cls, documents, labels, alpha=1.0, min_count=2, max_features=20000):
+        """Train on feature sets and booleans (True = spam)"""
+        counts = {True: Counter(), False: Counter()}
+        totals = Counter(labels)
+        for doc, label in zip(documents, labels):
+            counts[label].update(doc)
+        if not totals[True] or not totals[False]:
+            raise ValueError('Training needs both spam and non-spam examples')
+
+        vocabulary = [f for f, n in (counts[True] + counts[False]).items() if n >= min_count]
+        spam_total = sum(counts[True][f] for f in vocabulary) + alpha * len(vocabulary)
+        ham_total = sum(counts[False][f] for f in vocabulary) + alpha * len(vocabulary)
+        weights = {
+            f: math.log((counts[True][f] + alpha) / spam_total) - math.log((counts[False][f] + alpha) / ham_total)
+            for f in vocabulary
+        }
+        if len(weights) > max_features:
+            keep = sorted(weights, key=lambda f: abs(weights[f]), reverse=True)[:max_features]
+            weights = {f: weights[f] for f in keep}
+        bias = math.log(totals[True] / totals[False])
+        meta = {'spam': totals[True], 'ham': totals[False], 'features': len(weights)}
+        return cls(weights, bias, meta)
+
+    def log_odds(self, doc):
+        weights = self.weights
+        return self.bias + sum(weights.get(f, 0.0) for f in doc)
+
+    def to_dict(self):
+        return {'version': 1, 'bias': self.bias, 'weights': self.weights, 'meta': self.meta}
+
+    @classmethod
+    def from_dict(cls, data):
+        if data.get('version') != 1:
+            raise ValueError(f'Unsupported spam model version {data.get("version")}')
+        return cls(data['weights'], data['bias'], data.get('meta'))
+
+    def save(self, path):
+        """Write atomically, so running workers never load a partial file"""
+        tmp = f'{path}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.to_dict(), f, separators=(',', ':'))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+
+class SpamVerdict:
+    def __init__(self, score, signals, threshold):
+        self.score = score
+        self.signals = signals
+        self.is_spam = score >= threshold
+
+    def __bool__(self):
+        return self.is_spam
+
+    def __repr__(self):
+        return f'<SpamVerdict {self.score:.3f} spam={self.is_spam} signals={sorted(self.signals)}>'
+
+
+class SpamFilter:
+    """
+    Keyword signals, then the trained model if there is one. Without a model
+    the signals' weights are summed; with one they are features alongside
+    the words, weighted by what the admins' labels say about them.
+    """
+    def __init__(self, matcher=None, model=None, threshold=0.9):
+        self.matcher = matcher or KeywordMatcher()
+        self.model = model
+        self.threshold = threshold
+
+    def score(self, text):
+        text = text.lower()
+        signals = self.matcher.find(text)
+        if self.model is not None:
+            log_odds = self.model.log_odds(features(text, signals))
+        else:
+            log_odds = DEFAULT_BIAS + sum(self.matcher.weights[name] for name in signals)
+        return SpamVerdict(sigmoid(log_odds), signals, self.threshold)
+
+    def score_instance(self, instance):
+        return self.score(instance_text(instance))
+
+
+def instance_text(instance):
+    """The scored text of a form submission"""
+    fields = SPAM_MODELS.get(type(instance), ())
+    return '\n'.join(str(getattr(instance, field, '') or '') for field in fields)
+
+
+_filter = None
+_filter_mtime = None
+_checked_at = 0.0
+_lock = threading.Lock()
+
+
+def get_filter():
+    """
+    The process-wide SpamFilter. The model file is re-checked every
+    SPAM_MODEL_CHECK_INTERVAL seconds, so `manage.py train_spam_model` takes
+    effect without restarting the workers.
+    """
+    global _filter, _filter_mtime, _checked_at
+    now = time.monotonic()
+    if _filter is not None and now - _checked_at < getattr(settings, 'SPAM_MODEL_CHECK_INTERVAL', 60):
+        return _filter
+    with _lock:
+        _checked_at = now
+        path = getattr(settings, 'SPAM_MODEL_PATH', None)
+        try:
+            mtime = os.stat(path).st_mtime if path else None
+        except OSError:
+            mtime = None
+        if _filter is None or mtime != _filter_mtime:
+            model = None
+            if mtime is not None:
+                try:
+                    model = NaiveBayes.load(path)
+                except (OSError, ValueError, KeyError) as e:
+                    logger.error(f'Could not load spam model {path}: {str(e)}')
+            _filter = SpamFilter(model=model, threshold=getattr(settings, 'SPAM_THRESHOLD', 0.9))
+            _filter_mtime = mtime
+    return _filter
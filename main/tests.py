@@ -1,3 +1,893 @@
-from django.test import TestCase
+import asyncio
+import ipaddress
+import math
+import shutil
+import tempfile
+from datetime import datetime, time, timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.core.management import call_command
+from django.http import HttpResponse
+from django.template import Context, Template
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import resolve
+from django.utils import timezone
+
+from . import archive, captcha, outbox, sheets_sync
+from .blocklist import Blocklist, PrefixTrie
+from .buffers import BatchBuffer, CoalescingBuffer
+from .chatbot_ai import IntentEngine, edit_distance
+from .chatbot_sessions import write_chatbot_messages
+from .middleware import PageViewMiddleware, RateLimitMiddleware, SecurityHeadersMiddleware
+from .models import (
+    ChatbotMessage, ChatbotSession, ContactMessage, OutboundJob, PageView, PageViewDaily, PageViewHourly,
+    ReferrerDaily, SecurityLog, SyncCursor
+)
+from .ratelimit import MemoryBackend, SQLiteBackend, enforce, hit, parse_rule
+from .reputation import NetworkIndex, parse_networks
+from .rollups import HyperLogLog, apply_page_views
+from .spam import SpamFilter
+
+
+class BatchBufferTests(SimpleTestCase):
+    def make_buffer(self, flush_func, cls=BatchBuffer, **kwargs):
+        buffer = cls('test', flush_func, flush_interval=3600, **kwargs)
+        # No background flusher: the tests flush by hand
+        patcher = mock.patch.object(buffer, '_ensure_worker')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(setattr, buffer, 'flush_func', lambda batch: None)
+        return buffer
+
+    def test_flush_in_batches(self):
+        batches = []
+        buffer = self.make_buffer(batches.append, batch_size=2)
+        for item in range(5):
+            buffer.add(item)
+        self.assertEqual(buffer.flush(), 5)
+        self.assertEqual(batches, [[0, 1], [2, 3], [4]])
+        self.assertEqual(buffer.stats()['pending'], 0)
+
+    def test_drops_oldest_beyond_max_pending(self):
+        batches = []
+        buffer = self.make_buffer(batches.append, batch_size=100, max_pending=100)
+        for item in range(103):
+            buffer.add(item)
+        buffer.flush()
+        self.assertEqual(batches[0][0], 3)
+        self.assertEqual(buffer.stats()['dropped'], 3)
+
+    def test_failed_batch_is_requeued_then_dropped(self):
+        def fail(batch):
+            raise OSError('database is down')
+
+        buffer = self.make_buffer(fail, max_retries=1)
+        buffer.add('a')
+        buffer.add('b')
+        with self.assertLogs('main.buffers', 'ERROR'):
+            self.assertEqual(buffer.flush(), 0)
+            self.assertEqual(buffer.stats()['pending'], 2)
+            self.assertEqual(buffer.flush(), 0)
+        stats = buffer.stats()
+        self.assertEqual((stats['pending'], stats['dropped'], stats['failed_batches']), (0, 2, 2))
+
+
+class CoalescingBufferTests(SimpleTestCase):
+    make_buffer = BatchBufferTests.make_buffer
+
+    def test_coalescing(self):
+        batches = []
+        buffer = self.make_buffer(batches.append, cls=CoalescingBuffer, key_func=lambda item: item[0])
+        for item in [('a', 1), ('a', 2), ('b', 3), ('a', 4)]:
+            buffer.add(item)
+        buffer.flush()
+        self.assertEqual([(entry.item, entry.count) for entry in batches[0]], [(('a', 1), 3), (('b', 3), 1)])
+        self.assertEqual(buffer.stats()['coalesced'], 2)
+
+    def test_requeue_merges_new_arrivals(self):
+        buffer = self.make_buffer(lambda batch: None, cls=CoalescingBuffer, key_func=lambda item: item)
+        buffer.add('a')
+        with buffer._lock:
+            batch = buffer._take(1)
+        buffer.add('a')
+        buffer._requeue(batch)
+        with buffer._lock:
+            entries = list(buffer._items)
+        self.assertEqual([(entry.key, entry.count) for entry in entries], [('a', 2)])
+
+
+BROWSER = 'Mozilla/5.0 (X11; Linux x86_64; rv:128.0) Gecko/20100101 Firefox/128.0'
+
+
+@override_settings(PAGEVIEW_INCLUDE_PATHS=[], PAGEVIEW_EXCLUDE_PATHS=['/admin/', '/get-captcha/'],
+                   PAGEVIEW_SAMPLE_RATE=1.0, PAGEVIEW_BOT_SAMPLE_RATE=1.0)
+class PageViewMiddlewareTests(SimpleTestCase):
+    factory = RequestFactory()
+
+    def setUp(self):
+        patcher = mock.patch('main.middleware.record_page_view')
+        self.record = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def request(self, path='/about/', method='get', status=200, user_agent=BROWSER, **settings):
+        with override_settings(**settings):
+            middleware = PageViewMiddleware(lambda request: HttpResponse(status=status))
+        request = getattr(self.factory, method)(path, HTTP_USER_AGENT=user_agent, HTTP_REFERER='https://example.com/')
+        return middleware(request)
+
+    def test_records_get_2xx(self):
+        self.request()
+        self.record.assert_called_once_with('/about/', '127.0.0.1', BROWSER, 'https://example.com/')
+
+    def test_skips_other_methods_and_statuses(self):
+        self.request(method='post')
+        self.request(status=404)
+        self.request(status=302)
+        self.record.assert_not_called()
+
+    def test_include_and_exclude_paths(self):
+        self.request('/admin/main/pageview/')
+        self.request('/get-captcha/')
+        self.request('/contact/', PAGEVIEW_INCLUDE_PATHS=['/services/'])
+        self.record.assert_not_called()
+        self.request('/services/cloud/', PAGEVIEW_INCLUDE_PATHS=['/services/'])
+        self.assertEqual(self.record.call_count, 1)
+
+    def test_sampling(self):
+        with mock.patch('main.middleware.random.random', return_value=0.3):
+            self.request(PAGEVIEW_SAMPLE_RATE=0.25)
+            self.request(user_agent='curl/8.0', PAGEVIEW_BOT_SAMPLE_RATE=0.25)
+            self.assertEqual(self.record.call_count, 0)
+            self.request(PAGEVIEW_SAMPLE_RATE=0.5)
+            self.request(user_agent='curl/8.0', PAGEVIEW_SAMPLE_RATE=0.25, PAGEVIEW_BOT_SAMPLE_RATE=0.5)
+            self.assertEqual(self.record.call_count, 2)
+
+    def test_async(self):
+        async def view(request):
+            return HttpResponse()
+
+        middleware = PageViewMiddleware(view)
+        response = asyncio.run(middleware(self.factory.get('/about/', HTTP_USER_AGENT=BROWSER)))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.record.call_count, 1)
+
+    def test_tracking_errors_do_not_break_the_response(self):
+        self.record.side_effect = RuntimeError('buffer gone')
+        with self.assertLogs('main.middleware', 'ERROR'):
+            self.assertEqual(self.request().status_code, 200)
+
+
+def local_time(days_ago, hour):
+    day = timezone.localdate() - timedelta(days=days_ago)
+    return timezone.make_aware(datetime.combine(day, time(hour)))
+
+
+class RollupTests(TestCase):
+    def page_views(self, viewed_at, count, ip='203.0.113.1', url='/about/', referrer='https://www.google.com/search'):
+        return [PageView(page_url=url, ip_address=ip, referrer=referrer, viewed_at=viewed_at) for _ in range(count)]
+
+    def test_hyperloglog(self):
+        sketch, other = HyperLogLog(), HyperLogLog()
+        for i in range(5000):
+            (sketch if i % 2 else other).add(f'198.51.{i // 256}.{i % 256}')
+        self.assertAlmostEqual(sketch.count(), 2500, delta=2500 * 0.05)
+        sketch.merge(other)
+        self.assertAlmostEqual(sketch.count(), 5000, delta=5000 * 0.05)
+        self.assertEqual(HyperLogLog(sketch.to_bytes()).count(), sketch.count())
+
+    def test_apply_adds_to_existing_rows(self):
+        at = local_time(1, 10)
+        apply_page_views(self.page_views(at, 3))
+        apply_page_views(self.page_views(at.replace(minute=30), 2, ip='203.0.113.2', referrer=''))
+        self.assertEqual(PageViewHourly.objects.get(hour=at, page_url='/about/').views, 5)
+        daily = PageViewDaily.objects.get(date=timezone.localdate(at))
+        self.assertEqual((daily.views, daily.unique_visitors), (5, 2))
+        self.assertEqual(dict(ReferrerDaily.objects.values_list('referrer_host', 'views')),
+                         {'www.google.com': 3, '': 2})
+
+    def test_backfill_replaces_settled_days(self):
+        yesterday, today = local_time(1, 9), timezone.now()
+        PageView.objects.bulk_create(self.page_views(yesterday, 4) + self.page_views(today, 1))
+        # Rollups that drifted from the raw rows, and a day whose raw rows were pruned
+        apply_page_views(self.page_views(yesterday, 10) + self.page_views(today, 7))
+        apply_page_views(self.page_views(local_time(2, 9), 6))
+
+        call_command('backfill_pageview_rollups', days=3, stdout=StringIO())
+        self.assertEqual(PageViewDaily.objects.get(date=timezone.localdate(yesterday)).views, 4)
+        self.assertEqual(PageViewHourly.objects.get(hour=yesterday).views, 4)
+        self.assertEqual(ReferrerDaily.objects.get(date=timezone.localdate(yesterday)).views, 4)
+        # Today is still being written by the buffer; pruned days keep their rollups
+        self.assertEqual(PageViewDaily.objects.get(date=timezone.localdate(today)).views, 7)
+        self.assertEqual(PageViewDaily.objects.get(date=timezone.localdate() - timedelta(days=2)).views, 6)
+
+
+class ArchiveTests(TestCase):
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        settings = override_settings(LOG_ARCHIVE_DIR=root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.old = [local_time(100, 8), local_time(100, 20), local_time(95, 12)]
+        PageView.objects.bulk_create(
+            [PageView(page_url='/old/', ip_address='203.0.113.1', viewed_at=at) for at in self.old]
+            + [PageView(page_url='/new/', ip_address='203.0.113.2', viewed_at=local_time(3, 12))])
+
+    def test_archive_and_read_back(self):
+        self.assertEqual(archive.archive_expired('pageviews', days=90, dry_run=True), 3)
+        self.assertEqual(archive.archive_expired('pageviews', days=90, chunk_size=2), 3)
+        self.assertEqual(list(PageView.objects.values_list('page_url', flat=True)), ['/new/'])
+        self.assertEqual(archive.archived_days('pageviews'),
+                         [timezone.localdate(self.old[0]), timezone.localdate(self.old[2])])
+        rows = list(archive.iter_archive('pageviews'))
+        self.assertEqual(sorted(row['viewed_at'] for row in rows), self.old)
+        self.assertEqual({row['page_url'] for row in rows}, {'/old/'})
+        day = timezone.localdate(self.old[2])
+        self.assertEqual(len(list(archive.iter_archive('pageviews', start=day, end=day))), 1)
+
+    def test_rewritten_partition_reads_back_once(self):
+        # A crash after the archive write but before the delete archives the rows again
+        rows = list(PageView.objects.filter(page_url='/old/').values())
+        archive._write_partitions('pageviews', rows, 'viewed_at')
+        archive.archive_expired('pageviews', days=90)
+        self.assertEqual(len(list(archive.iter_archive('pageviews'))), 3)
+
+    def test_prune(self):
+        log = SecurityLog.objects.create(event_type='spam', ip_address='203.0.113.9', details='old')
+        SecurityLog.objects.filter(pk=log.pk).update(created_at=local_time(200, 12))
+        SecurityLog.objects.create(event_type='spam', ip_address='203.0.113.9', details='new')
+        call_command('prune_logs', days=90, stdout=StringIO())
+        self.assertEqual(PageView.objects.count(), 1)
+        self.assertEqual(list(SecurityLog.objects.values_list('details', flat=True)), ['new'])
+        self.assertEqual(archive.archived_days('pageviews'), [])
+
+
+class OutboxTests(TestCase):
+    def setUp(self):
+        self.calls = []
+        handlers = mock.patch.dict(outbox.HANDLERS, {'test': self.calls.append, 'fail': self.fail_job})
+        handlers.start()
+        self.addCleanup(handlers.stop)
+
+    def fail_job(self, payload):
+        raise ConnectionError('smtp down')
+
+    def make_due(self, job):
+        OutboundJob.objects.filter(pk=job.pk).update(run_after=timezone.now())
+
+    def test_run_pending(self):
+        outbox.enqueue('test', {'n': 1})
+        outbox.enqueue('test', {'n': 2})
+        self.assertEqual(outbox.run_pending(), (2, 0))
+        self.assertEqual(sorted(call['n'] for call in self.calls), [1, 2])
+        self.assertEqual(set(OutboundJob.objects.values_list('status', 'attempts')), {('done', 1)})
+        self.assertEqual(outbox.run_pending(), (0, 0))
+
+    def test_claimed_job_is_not_claimed_again_until_its_lock_expires(self):
+        job = outbox.enqueue('test')
+        self.assertEqual(len(outbox.claim_jobs()), 1)
+        self.assertEqual(outbox.claim_jobs(), [])
+        # The worker died mid-run
+        OutboundJob.objects.filter(pk=job.pk).update(locked_until=timezone.now() - timedelta(seconds=1))
+        claimed = outbox.claim_jobs()
+        self.assertEqual([(j.pk, j.attempts) for j in claimed], [(job.pk, 2)])
+
+    def test_compare_and_set_claim_loses_to_another_worker(self):
+        first, second = outbox.enqueue('test'), outbox.enqueue('test')
+        filter_jobs = OutboundJob.objects.filter
+
+        def race(*args, **kwargs):
+            if kwargs.get('pk') == first.pk and 'attempts' in kwargs:
+                # Another worker claims it between this worker's SELECT and UPDATE
+                filter_jobs(pk=first.pk).update(status='running', attempts=1,
+                                                locked_until=timezone.now() + timedelta(minutes=5))
+            return filter_jobs(*args, **kwargs)
+
+        with mock.patch.object(OutboundJob.objects, 'filter', side_effect=race):
+            claimed = outbox.claim_jobs()
+        self.assertEqual([job.pk for job in claimed], [second.pk])
+        self.assertEqual(OutboundJob.objects.get(pk=first.pk).attempts, 1)
+
+    def test_failure_backs_off(self):
+        job = outbox.enqueue('fail')
+        with self.assertLogs('main.outbox', 'WARNING'):
+            self.assertEqual(outbox.run_pending(), (0, 1))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.locked_until), ('pending', 1, None))
+        self.assertEqual(job.last_error, 'ConnectionError: smtp down')
+        delay = (job.run_after - timezone.now()).total_seconds()
+        self.assertTrue(25 < delay <= 33, delay)
+        self.assertEqual(outbox.run_pending(), (0, 0))
+
+    @override_settings(OUTBOX_BACKOFF_BASE=30, OUTBOX_BACKOFF_MAX=3600)
+    def test_backoff_delay(self):
+        self.assertAlmostEqual(outbox.backoff_delay(3).total_seconds(), 120, delta=12)
+        self.assertAlmostEqual(outbox.backoff_delay(20).total_seconds(), 3600, delta=360)
+
+    def test_dead_letter_and_retry(self):
+        job = outbox.enqueue('fail', max_attempts=2)
+        with self.assertLogs('main.outbox', 'WARNING'):
+            outbox.run_pending()
+            self.make_due(job)
+            outbox.run_pending()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('dead', 2))
+        self.make_due(job)
+        self.assertEqual(outbox.claim_jobs(), [])
+
+        self.assertEqual(outbox.retry_dead(OutboundJob.objects.all()), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('pending', 0))
+
+    def test_unknown_kind_fails(self):
+        job = outbox.enqueue('no-such-kind')
+        with self.assertLogs('main.outbox', 'WARNING'):
+            outbox.run_pending()
+        job.refresh_from_db()
+        self.assertTrue(job.last_error.startswith('LookupError'))
+
+    def test_batch_handler_fails_only_its_failed_jobs(self):
+        jobs = [outbox.enqueue('batch', {'n': n}) for n in range(3)]
+
+        def handle(batch):
+            return {job.pk: ValueError('bad row') for job in batch if job.payload['n'] == 1}
+
+        with mock.patch.dict(outbox.BATCH_HANDLERS, {'batch': handle}), self.assertLogs('main.outbox', 'WARNING'):
+            self.assertEqual(outbox.run_pending(), (2, 1))
+        statuses = dict(OutboundJob.objects.values_list('pk', 'status'))
+        self.assertEqual([statuses[job.pk] for job in jobs], ['done', 'pending', 'done'])
+
+
+class APIError(Exception):
+    def __init__(self, status_code=429):
+        super().__init__(f'HTTP {status_code}')
+        self.response = mock.Mock(status_code=status_code)
+
+
+class SyncRowsTests(SimpleTestCase):
+    def setUp(self):
+        self.sent = []
+        self.send_errors = {}
+        for target, kwargs in [
+            ('main.sheets_sync._send', {'side_effect': self.send}),
+            ('main.sheets_sync.sheets_client', {}),
+            ('main.sheets_sync.write_limiter.acquire', {'return_value': 0.0}),
+            ('main.sheets_sync.time.sleep', {}),
+        ]:
+            patcher = mock.patch(target, **kwargs)
+            setattr(self, target.rsplit('.', 1)[-1], patcher.start())
+            self.addCleanup(patcher.stop)
+
+    def send(self, segments):
+        self.sent.append([(name, [key for key, _ in entries]) for name, entries in segments])
+        error = self.send_errors.get(len(self.sent))
+        if error:
+            raise error
+
+    def items(self, sheet_name, keys):
+        return [(key, sheet_name, [key]) for key in keys]
+
+    def test_requests_are_packed_up_to_chunk_size(self):
+        report = sheets_sync.SyncReport()
+        items = self.items('a', range(3)) + self.items('b', range(3, 5))
+        self.assertEqual(sheets_sync.sync_rows(items, chunk_size=2, report=report), {})
+        self.assertEqual(self.sent, [[('a', [0, 1])], [('a', [2]), ('b', [3])], [('b', [4])]])
+        self.assertEqual((report.rows, report.requests), (5, 3))
+        self.assertEqual(self.acquire.call_count, 3)
+
+    def test_missing_worksheet_fails_only_its_rows(self):
+        def worksheet(sheet_name):
+            if sheet_name == 'gone':
+                raise LookupError(sheet_name)
+        self.sheets_client.worksheet.side_effect = worksheet
+
+        with self.assertLogs('main.sheets_sync', 'ERROR'):
+            errors = sheets_sync.sync_rows(self.items('a', [1]) + self.items('gone', [2]))
+        self.assertEqual(list(errors), [2])
+        self.assertEqual(self.sent, [[('a', [1])]])
+
+    def test_failed_request_fails_its_rows(self):
+        self.send_errors[2] = APIError(status_code=500)
+        report = sheets_sync.SyncReport()
+        report.errors['earlier'] = ValueError()
+        with self.assertLogs('main.sheets_sync', 'ERROR'):
+            errors = sheets_sync.sync_rows(self.items('a', range(4)), chunk_size=2, report=report)
+        # Only this call's failures are returned; the report keeps the run's
+        self.assertEqual(sorted(errors), [2, 3])
+        self.assertEqual(sorted(report.errors, key=str), [2, 3, 'earlier'])
+        self.assertEqual(report.rows, 2)
+        self.sleep.assert_not_called()
+
+    def test_quota_errors_are_retried(self):
+        self.send_errors.update({1: APIError(), 2: APIError()})
+        report = sheets_sync.SyncReport()
+        with self.assertLogs('main.sheets_sync', 'WARNING'):
+            self.assertEqual(sheets_sync.sync_rows(self.items('a', [1]), report=report), {})
+        self.assertEqual([call.args for call in self.sleep.call_args_list], [(10,), (20,)])
+        self.assertEqual((report.rows, report.requests), (1, 3))
+
+    def test_quota_retries_give_up(self):
+        self.send_errors.update({n: APIError() for n in range(1, sheets_sync.QUOTA_RETRIES + 2)})
+        with self.assertLogs('main.sheets_sync', 'WARNING'):
+            errors = sheets_sync.sync_rows(self.items('a', [1]))
+        self.assertEqual(list(errors), [1])
+        self.assertEqual(len(self.sent), sheets_sync.QUOTA_RETRIES + 1)
+
+
+@override_settings(GOOGLE_SHEETS_SYNC_GRACE=600, GOOGLE_SHEETS_SYNC_MAX_ATTEMPTS=3)
+class SyncModelTests(TestCase):
+    def setUp(self):
+        self.batches = []
+        self.rejected = set()
+        # The form signals' security events would outlive the test database in the log buffer
+        for patcher in [mock.patch('main.sheets_sync.sync_rows', side_effect=self.sync_rows),
+                        mock.patch('main.signals.log_security_event')]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def sync_rows(self, items, chunk_size, report):
+        items = list(items)
+        self.batches.append([self.names[key] for key, _, _ in items])
+        return {key: ValueError('rejected') for key, _, _ in items if self.names[key] in self.rejected}
+
+    def contact(self, name, minutes_ago):
+        message = ContactMessage.objects.create(name=name, email=f'{name}@example.com', message='Hello')
+        ContactMessage.objects.filter(pk=message.pk).update(
+            date_sent=timezone.now() - timedelta(minutes=minutes_ago)
+        )
+        return message
+
+    @property
+    def names(self):
+        return {message.pk: message.name for message in ContactMessage.objects.all()}
+
+    def statuses(self):
+        return dict(ContactMessage.objects.values_list('name', 'sync_status'))
+
+    def test_cursor_walks_past_limit(self):
+        for n in range(5):
+            self.contact(f'c{n}', minutes_ago=60 - n)
+        # Still inside the grace window: left to the outbox
+        self.contact('recent', minutes_ago=1)
+
+        for _ in range(4):
+            sheets_sync.sync_model('contacts', limit=2)
+        self.assertEqual(self.batches, [['c0', 'c1'], ['c2', 'c3'], ['c4']])
+        self.assertEqual(self.statuses(), {'c0': 'synced', 'c1': 'synced', 'c2': 'synced',
+                                           'c3': 'synced', 'c4': 'synced', 'recent': 'pending'})
+        cursor = SyncCursor.objects.get(name='contacts')
+        self.assertEqual(cursor.last_pk, '')
+
+    def test_rows_sharing_a_timestamp_are_not_skipped(self):
+        for n in range(3):
+            self.contact(f'c{n}', minutes_ago=60)
+        ContactMessage.objects.update(date_sent=timezone.now() - timedelta(hours=1))
+        sheets_sync.sync_model('contacts', limit=2)
+        sheets_sync.sync_model('contacts', limit=2)
+        self.assertEqual(sorted(sum(self.batches, [])), ['c0', 'c1', 'c2'])
+
+    def test_failed_rows_are_retried_up_to_max_attempts(self):
+        self.contact('bad', minutes_ago=60)
+        self.contact('good', minutes_ago=59)
+        self.rejected.add('bad')
+        for _ in range(4):
+            sheets_sync.sync_model('contacts')
+        self.assertEqual(self.batches, [['bad', 'good'], ['bad'], ['bad']])
+        failed = ContactMessage.objects.get(name='bad')
+        self.assertEqual((failed.sync_status, failed.sync_attempts), ('failed', 3))
+        self.assertEqual(failed.sync_error, 'ValueError: rejected')
+
+    def test_retries_wait_for_a_page_without_new_rows(self):
+        self.contact('bad', minutes_ago=60)
+        self.rejected.add('bad')
+        sheets_sync.sync_model('contacts', limit=1)
+        self.rejected.clear()
+        self.contact('new', minutes_ago=30)
+        self.contact('newer', minutes_ago=29)
+        sheets_sync.sync_model('contacts', limit=1)
+        sheets_sync.sync_model('contacts', limit=1)
+        self.assertEqual(self.batches, [['bad'], ['new'], ['newer']])
+        sheets_sync.sync_model('contacts', limit=1)
+        self.assertEqual(self.batches[-1], ['bad'])
+        self.assertEqual(set(self.statuses().values()), {'synced'})
+
+
+class RateLimitTests(SimpleTestCase):
+    def test_parse_rule(self):
+        self.assertEqual(parse_rule('ip:5/m'), ('ip', 5, 60))
+        self.assertEqual(parse_rule('email: 10/15m'), ('email', 10, 900))
+        with self.assertRaises(ValueError):
+            parse_rule('ip:5/week')
+
+    def test_limit_within_window(self):
+        backend = MemoryBackend()
+        with mock.patch('main.ratelimit.time.time', return_value=6000.0):
+            decisions = [hit('k', 3, 60, backend) for _ in range(4)]
+            self.assertEqual([bool(d) for d in decisions], [True, True, True, False])
+            self.assertGreaterEqual(decisions[-1].retry_after, 1)
+            # The rejected attempt was taken back out of the count
+            self.assertEqual(backend.get('rl:k:100'), 3)
+
+    def test_previous_window_is_weighted(self):
+        backend = MemoryBackend()
+        with mock.patch('main.ratelimit.time.time', return_value=6000.0):
+            for _ in range(4):
+                self.assertTrue(hit('k', 4, 60, backend))
+        # Halfway into the next window the previous four count as two
+        with mock.patch('main.ratelimit.time.time', return_value=6090.0):
+            self.assertEqual([bool(hit('k', 4, 60, backend)) for _ in range(3)], [True, True, False])
+
+    def test_fails_open(self):
+        backend = mock.Mock()
+        backend.hit.side_effect = ConnectionError
+        with self.assertLogs('main.ratelimit', 'ERROR'):
+            self.assertTrue(hit('k', 1, 60, backend))
+
+    def test_rejected_request_is_not_counted_by_earlier_rules(self):
+        backend = MemoryBackend()
+        rules = [parse_rule('ip:5/m'), parse_rule('ip:2/h')]
+        request = RequestFactory().post('/contact/', REMOTE_ADDR='203.0.113.9')
+        with mock.patch('main.ratelimit.get_backend', return_value=backend), \
+                mock.patch('main.ratelimit.log_security_event'), \
+                mock.patch('main.ratelimit.time.time', return_value=7200.0):
+            with self.assertLogs('main.ratelimit', 'WARNING'):
+                statuses = [getattr(enforce(request, 'contact', rules), 'status_code', None) for _ in range(4)]
+            self.assertEqual(statuses, [None, None, 429, 429])
+            # Only the two admitted requests count against the per-minute rule
+            self.assertEqual(backend.get('rl:contact:ip:5/60:203.0.113.9:120'), 2)
+
+    def test_sqlite_backend(self):
+        path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, path)
+        for returning in (True, False):
+            backend = SQLiteBackend(f'{path}/{returning}.sqlite3')
+            # SQLite older than 3.35 has no RETURNING
+            backend.returning = returning
+            with mock.patch('main.ratelimit.time.time', return_value=6000.0):
+                self.assertEqual([backend.incr('k', 1, 120) for _ in range(3)], [1, 2, 3])
+                self.assertEqual(backend.incr('k', -1, 120), 2)
+                self.assertEqual(backend.hit('k', 'gone', 120), (3, 0))
+            # An expired counter starts over
+            with mock.patch('main.ratelimit.time.time', return_value=6200.0):
+                self.assertEqual(backend.incr('k', 1, 120), 1)
+
+    def test_sqlite_backend_without_returning_warns(self):
+        with mock.patch('main.ratelimit.sqlite3.sqlite_version_info', (3, 31, 1)), \
+                self.assertLogs('main.ratelimit', 'WARNING'):
+            self.assertFalse(SQLiteBackend(':memory:').returning)
+
+    def test_email_rule_reads_multipart_forms(self):
+        # contact.html and support.html post FormData, which is multipart
+        middleware = RateLimitMiddleware(lambda request: HttpResponse())
+        factory = RequestFactory()
+        statuses = []
+        with mock.patch('main.ratelimit.get_backend', return_value=MemoryBackend()), \
+                mock.patch('main.ratelimit.log_security_event'), self.assertLogs('main.ratelimit', 'WARNING') as logs:
+            for n in range(6):
+                request = factory.post('/contact/', {'name': 'Asha', 'email': 'Asha@Example.com ', 'message': 'Hi'},
+                                       REMOTE_ADDR=f'203.0.113.{n + 1}')
+                self.assertTrue(request.content_type.startswith('multipart/form-data'))
+                request.resolver_match = resolve('/contact/')
+                statuses.append(getattr(middleware.process_view(request, None, (), {}), 'status_code', None))
+        self.assertEqual(statuses, [None] * 5 + [429])
+        self.assertIn('email:5/3600s', logs.output[0])
+        # The view still gets the parsed form
+        self.assertEqual(request.POST['name'], 'Asha')
+
+
+@mock.patch('main.signals.log_security_event')
+class SpamScoringTests(TestCase):
+    def setUp(self):
+        # Keyword weights only, whatever model file the settings point at
+        patcher = mock.patch('main.signals.get_filter', return_value=SpamFilter(threshold=0.9))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def contact(self, message, **kwargs):
+        return ContactMessage.objects.create(name='Ravi', email='ravi@example.com', message=message, **kwargs)
+
+    def spam_events(self, log_event):
+        return [c for c in log_event.call_args_list if c.args[0] == 'spam']
+
+    def test_ordinary_message(self, log_event):
+        message = self.contact('We are looking for a freelance developer for our website, ASAP.')
+        message.refresh_from_db()
+        self.assertFalse(message.is_spam)
+        self.assertLess(message.spam_score, 0.9)
+        self.assertEqual(self.spam_events(log_event), [])
+
+    def test_spam_is_flagged_and_logged(self, log_event):
+        with self.assertLogs('main.signals', 'WARNING'):
+            message = self.contact('Buy now! Cheap viagra pills, click here: http://example.net')
+        message.refresh_from_db()
+        self.assertTrue(message.is_spam)
+        self.assertGreaterEqual(message.spam_score, 0.9)
+        self.assertEqual(len(self.spam_events(log_event)), 1)
+
+    def test_only_new_unreviewed_submissions_are_scored(self, log_event):
+        reviewed = self.contact('Cheap viagra pills, buy now', spam_reviewed=True)
+        self.assertFalse(reviewed.is_spam)
+        self.assertIsNone(reviewed.spam_score)
+
+        message = self.contact('Hello')
+        message.message = 'Cheap viagra pills, buy now'
+        message.save()
+        message.refresh_from_db()
+        self.assertFalse(message.is_spam)
+
+
+class CaptchaTests(SimpleTestCase):
+    def test_verify_once(self):
+        text, token = captcha.issue('contact')
+        self.assertEqual(captcha.verify(token, text.lower(), 'contact')[0], True)
+        valid, message = captcha.verify(token, text, 'contact')
+        self.assertFalse(valid)
+        self.assertIn('already used', message)
+
+    def test_wrong_answer_kind_or_token(self):
+        text, token = captcha.issue('contact')
+        self.assertFalse(captcha.verify(token, text + 'X', 'contact')[0])
+        self.assertFalse(captcha.verify(token, text, 'career')[0])
+        self.assertFalse(captcha.verify(token.replace('.', '!'), text, 'contact')[0])
+        self.assertFalse(captcha.verify(token, '', 'contact')[0])
+        # None of those used the token up
+        self.assertTrue(captcha.verify(token, text, 'contact')[0])
+
+    def test_token_does_not_contain_answer(self):
+        text, token = captcha.issue('contact', text='ABC234')
+        self.assertNotIn('ABC234', token.upper())
+
+    def test_signed_digest(self):
+        text, token = captcha.issue('contact', digest=captcha.answer_digest('ABC234'))
+        self.assertIsNone(text)
+        self.assertTrue(captcha.verify(token, ' abc234 ', 'contact')[0])
+
+    def test_expired(self):
+        text, token = captcha.issue('contact')
+        with mock.patch('main.captcha.time.time', return_value=int(token.split('.')[2]) + 601):
+            self.assertIn('expired', captcha.verify(token, text, 'contact')[1])
+
+    def test_bloom_seen_set(self):
+        seen = captcha.BloomSeenSet(capacity=1000, error_rate=1e-6, period=600)
+        self.assertTrue(seen.add('nonce'))
+        self.assertFalse(seen.add('nonce'))
+        self.assertTrue(seen.add('other'))
+
+
+
+class NetworkIndexTests(SimpleTestCase):
+    def setUp(self):
+        with self.assertLogs('main.reputation', 'WARNING') as logs:
+            self.index = NetworkIndex(parse_networks([
+                '10.0.0.0/8 abuse:wide',
+                '10.1.0.0/16 crawler:inner  # a crawler inside it',
+                '10.1.2.0/24 abuse:innermost',
+                '2001:db8::/32 crawler:v6',
+                '198.51.100.0/24 ; SBL123',
+                'not-a-network abuse',
+                '192.0.2.0/24 unknown',
+            ]))
+        self.assertEqual(len(logs.output), 2)
+
+    def test_most_specific_range_wins(self):
+        self.assertEqual(self.index.lookup('10.0.0.1'), 'abuse:wide')
+        self.assertEqual(self.index.lookup('10.1.0.1'), 'crawler:inner')
+        self.assertEqual(self.index.lookup('10.1.2.1'), 'abuse:innermost')
+        self.assertEqual(self.index.lookup('10.1.3.0'), 'crawler:inner')
+        self.assertEqual(self.index.lookup('10.2.0.0'), 'abuse:wide')
+        self.assertEqual(self.index.lookup('10.255.255.255'), 'abuse:wide')
+
+    def test_lookup_outside_and_other_families(self):
+        self.assertIsNone(self.index.lookup('11.0.0.0'))
+        self.assertIsNone(self.index.lookup('192.0.2.1'))
+        self.assertIsNone(self.index.lookup('garbage'))
+        self.assertEqual(self.index.lookup('198.51.100.5'), 'abuse:SBL123')
+        self.assertEqual(self.index.lookup('2001:db8::5'), 'crawler:v6')
+        self.assertEqual(self.index.lookup('::ffff:10.1.0.1'), 'crawler:inner')
+
+
+def v4(ip):
+    return int(ipaddress.IPv4Address(ip))
+
+
+class PrefixTrieTests(SimpleTestCase):
+    def setUp(self):
+        self.trie = PrefixTrie(32)
+        for network in ['10.0.0.0/8', '10.1.0.0/16', '10.1.2.0/24', '192.168.1.7/32']:
+            network = ipaddress.ip_network(network)
+            self.trie.insert(int(network.network_address), network.prefixlen, str(network))
+
+    def test_matches_shortest_first(self):
+        self.assertEqual(self.trie.matches(v4('10.1.2.3')), ['10.0.0.0/8', '10.1.0.0/16', '10.1.2.0/24'])
+        self.assertEqual(self.trie.matches(v4('10.1.3.1')), ['10.0.0.0/8', '10.1.0.0/16'])
+        self.assertEqual(self.trie.matches(v4('10.200.0.1')), ['10.0.0.0/8'])
+        self.assertEqual(self.trie.matches(v4('192.168.1.7')), ['192.168.1.7/32'])
+        self.assertEqual(self.trie.matches(v4('192.168.1.8')), [])
+        self.assertEqual(self.trie.matches(v4('11.0.0.1')), [])
+
+    def test_insert_between_existing_nodes(self):
+        self.trie.insert(v4('10.1.2.0'), 23, '10.1.2.0/23')
+        self.assertEqual(self.trie.matches(v4('10.1.3.1')), ['10.0.0.0/8', '10.1.0.0/16', '10.1.2.0/23'])
+        self.assertEqual(self.trie.matches(v4('10.1.2.1'))[-1], '10.1.2.0/24')
+
+    def test_remove(self):
+        self.trie.remove(v4('10.1.0.0'), 16)
+        self.assertEqual(self.trie.matches(v4('10.1.2.3')), ['10.0.0.0/8', '10.1.2.0/24'])
+        self.assertEqual(len(self.trie), 3)
+
+
+class BlocklistTests(SimpleTestCase):
+    def test_check(self):
+        blocklist = Blocklist({}, networks=['203.0.113.0/24'])
+        blocklist.ban(ipaddress.ip_network('198.51.100.7/32'), 2000.0, 'test')
+        self.assertIsNotNone(blocklist.check('203.0.113.9'))
+        self.assertIsNotNone(blocklist.check('::ffff:203.0.113.9'))
+        self.assertIsNotNone(blocklist.check('198.51.100.7', now=1000.0))
+        self.assertIsNone(blocklist.check('198.51.100.7', now=3000.0))
+        self.assertIsNone(blocklist.check('198.51.100.8', now=1000.0))
+        self.assertIsNone(blocklist.check('not an address'))
+
+    def test_ipv6_ban_covers_prefix(self):
+        blocklist = Blocklist({}, ipv6_prefix=64)
+        blocklist.ban(blocklist.network_for(6, int(ipaddress.IPv6Address('2001:db8::1'))), math.inf, 'test')
+        self.assertIsNotNone(blocklist.check('2001:db8::ffff:1'))
+        self.assertIsNone(blocklist.check('2001:db8:0:1::1'))
+
+    def test_expire(self):
+        blocklist = Blocklist({})
+        blocklist.ban(ipaddress.ip_network('198.51.100.7/32'), 1000.0, 'test')
+        blocklist.expire(now=2000.0)
+        self.assertEqual(blocklist.bans, {})
+        self.assertEqual(blocklist.tries[4].matches(v4('198.51.100.7')), [])
+
+
+@override_settings(
+    SECURITY_CSP={'default-src': ["'self'"], 'script-src': ["'self'"], 'img-src': ["'self'", 'data:']},
+    SECURITY_CSP_REPORT_ONLY=False,
+    SECURITY_EXTRA_HEADERS={'X-XSS-Protection': '1; mode=block'},
+    SECURITY_HEADERS_ROUTES={'contact': {
+        'csp': {'script-src': ["'self'", 'https://www.google.com'], 'img-src': None},
+        'headers': {'X-XSS-Protection': None, 'Permissions-Policy': 'camera=()'},
+    }},
+    SECURE_HSTS_SECONDS=3600, SECURE_SSL_REDIRECT=False, SECURE_CONTENT_TYPE_NOSNIFF=True,
+)
+class SecurityHeadersMiddlewareTests(SimpleTestCase):
+    def request(self, path='/', view=None, secure=False):
+        request = RequestFactory().get(path, secure=secure)
+        request.resolver_match = resolve(path)
+        return SecurityHeadersMiddleware(view or (lambda request: HttpResponse()))(request)
+
+    def test_default_headers(self):
+        response = self.request()
+        self.assertEqual(response['Content-Security-Policy'],
+                         "default-src 'self'; script-src 'self'; img-src 'self' data:")
+        self.assertEqual(response['X-XSS-Protection'], '1; mode=block')
+        self.assertEqual(response['X-Content-Type-Options'], 'nosniff')
+        self.assertNotIn('Strict-Transport-Security', response)
+        self.assertEqual(self.request(secure=True)['Strict-Transport-Security'], 'max-age=3600')
+
+    def test_route_overrides(self):
+        response = self.request('/contact/')
+        self.assertEqual(response['Content-Security-Policy'],
+                         "default-src 'self'; script-src 'self' https://www.google.com")
+        self.assertEqual(response['Permissions-Policy'], 'camera=()')
+        self.assertNotIn('X-XSS-Protection', response)
+        self.assertEqual(response['X-Content-Type-Options'], 'nosniff')
+
+    def test_headers_set_by_the_view_are_kept(self):
+        def view(request):
+            response = HttpResponse()
+            response['Content-Security-Policy'] = "default-src 'none'"
+            response['X-XSS-Protection'] = '0'
+            return response
+
+        response = self.request(view=view)
+        self.assertEqual(response['Content-Security-Policy'], "default-src 'none'")
+        self.assertEqual(response['X-XSS-Protection'], '0')
+
+    def test_nonce_only_when_rendered(self):
+        def view(request):
+            return HttpResponse(Template('<script nonce="{{ request.csp_nonce }}"></script>').render(
+                Context({'request': request})
+            ))
+
+        response = self.request(view=view)
+        nonce = response.content.decode().split('"')[1]
+        self.assertEqual(response['Content-Security-Policy'],
+                         f"default-src 'self'; script-src 'self' 'nonce-{nonce}'; img-src 'self' data:")
+        self.assertNotIn("'nonce-", self.request()['Content-Security-Policy'])
+
+
+class EditDistanceTests(SimpleTestCase):
+    def test_distances(self):
+        self.assertEqual(edit_distance('email', 'email', 2), 0)
+        self.assertEqual(edit_distance('emial', 'email', 1), 1)
+        self.assertEqual(edit_distance('pricng', 'pricing', 1), 1)
+        self.assertEqual(edit_distance('website', 'websites', 1), 1)
+        self.assertEqual(edit_distance('kitten', 'sitting', 3), 3)
+
+    def test_stops_past_limit(self):
+        self.assertEqual(edit_distance('kitten', 'sitting', 1), 2)
+        self.assertEqual(edit_distance('cloud', 'cloudflare', 2), 3)
+
+
+class IntentEngineTests(SimpleTestCase):
+    INTENTS = [
+        ('greeting', ['hi', 'hello']),
+        ('service:cybersecurity', ['cybersecurity', 'security']),
+        ('contact', ['email', 'phone number']),
+        ('pricing', ['price', 'how much']),
+        ('location', ['office']),
+        ('support', ['help']),
+    ]
+
+    def setUp(self):
+        self.engine = IntentEngine(self.INTENTS)
+
+    def intent(self, message, engine=None):
+        match = (engine or self.engine).match(message)
+        return match.intent if match else None
+
+    def test_whole_words_and_plurals(self):
+        self.assertEqual(self.intent('Hi there'), 'greeting')
+        self.assertIsNone(self.intent('this is it'))
+        self.assertEqual(self.intent('what are your prices?'), 'pricing')
+
+    def test_multi_word_keywords(self):
+        self.assertEqual(self.intent('what is your phone number'), 'contact')
+        self.assertIsNone(self.intent('my phone broke'))
+        self.assertEqual(self.intent('how much'), 'pricing')
+
+    def test_earliest_keyword_wins(self):
+        match = self.engine.match('hello, how much is it?')
+        self.assertEqual(match.intent, 'greeting')
+        self.assertEqual(match.found, {'hello', 'how much'})
+
+    def test_typos(self):
+        self.assertEqual(self.intent('send an emial'), 'contact')
+        self.assertEqual(self.intent('securty audit'), 'service:cybersecurity')
+        self.assertIsNone(self.intent('send an emial', IntentEngine(self.INTENTS, fuzzy=False)))
+        self.assertIsNone(self.intent('asdfgh'))
+
+    def test_corrected_keyword_competes_on_rank(self):
+        # A typo of a higher-priority keyword beats a lower-priority one typed correctly
+        self.assertEqual(self.intent('I need cybersecurty help'), 'service:cybersecurity')
+        self.assertEqual(self.intent('securty for our office'), 'service:cybersecurity')
+        self.assertEqual(self.engine.match('securty for our office').found, {'security', 'office'})
+        self.assertEqual(self.intent('I need help with our offce'), 'location')
+        self.assertEqual(self.engine.corrections['securty'], 'security')
+
+
+class ChatbotMessageWriteTests(TestCase):
+    def message(self, session, minutes_ago, text='hello'):
+        return ChatbotMessage(session_id=session.pk, message=text,
+                              created_at=timezone.now() - timedelta(minutes=minutes_ago))
+
+    def test_messages_and_session_details(self):
+        session = ChatbotSession.objects.create(session_id='s1', name='Meera', email='')
+        latest = self.message(session, 1)
+        write_chatbot_messages([
+            (self.message(session, 5), {}),
+            (latest, {'email': 'meera@example.com', 'name': 'Someone else'}),
+        ])
+        session.refresh_from_db()
+        self.assertEqual(session.messages.count(), 2)
+        self.assertEqual(session.last_activity, latest.created_at)
+        # Only empty details are filled in
+        self.assertEqual((session.name, session.email), ('Meera', 'meera@example.com'))
+
+    def test_messages_for_deleted_sessions_are_dropped(self):
+        live = ChatbotSession.objects.create(session_id='live')
+        gone = ChatbotSession.objects.create(session_id='gone')
+        entries = [(self.message(live, 2), {}), (self.message(gone, 2), {}), (self.message(gone, 1), {})]
+        gone.delete()
+        with self.assertLogs('main.chatbot_sessions', 'INFO') as logs:
+            write_chatbot_messages(entries)
+        self.assertIn('Dropped 2 chatbot messages', logs.output[0])
+        self.assertEqual(list(ChatbotMessage.objects.values_list('session_id', flat=True)), [live.pk])
+
+        live.delete()
+        with self.assertLogs('main.chatbot_sessions', 'INFO'):
+            write_chatbot_messages(entries)
+        self.assertEqual(ChatbotMessage.objects.count(), 0)
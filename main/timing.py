@@ -0,0 +1,27 @@
+"""Per-call timing helpers for the management commands that report latency"""
+
+import statistics
+import time
+
+
+def time_calls(func, inputs, repeat=1):
+    """Call ``func`` on every input ``repeat`` times; returns per-call timings in microseconds"""
+    timings = []
+    for _ in range(repeat):
+        for value in inputs:
+            start = time.perf_counter()
+            func(value)
+            timings.append((time.perf_counter() - start) * 1e6)
+    return timings
+
+
+def summarize(timings):
+    """'mean / p50 / p99' summary of microsecond timings"""
+    if not timings:
+        return 'no samples'
+    ordered = sorted(timings)
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+    return (
+        f'mean {statistics.mean(ordered):9.1f} us  p50 {statistics.median(ordered):9.1f} us  '
+        f'p99 {p99:9.1f} us  ({1e6 * len(ordered) / sum(ordered) if sum(ordered) else 0:,.0f}/sec)'
+    )
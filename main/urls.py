@@ -17,6 +17,8 @@ urlpatterns = [
     path('subscribe/', views.subscribe, name='subscribe'),
     path('proposal-request/', views.proposal_request, name='proposal_request'),
     path('career/', views.career, name='career'),
+    path('get-captcha/', views.get_captcha, name='get_captcha'),
+    path('verify-captcha/', views.verify_captcha, name='verify_captcha'),
     
     # Legal pages
     path('privacy/', views.privacy, name='privacy'),
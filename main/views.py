@@ -3,10 +3,8 @@ from django.http import HttpResponse, JsonResponse
 from django.contrib import messages
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST
-from django.core.mail import send_mail, EmailMessage
 from django.conf import settings
 from django.utils import timezone
-from django.template.loader import render_to_string
 from ipware import get_client_ip
 import uuid
 import json
@@ -15,8 +13,13 @@ from datetime import datetime
 from .security import generate_captcha_text, validate_captcha  # Make sure these exist in security.py
 from .forms import *
 from .models import *
-from .google_sheets import save_to_google_sheet
-from .security import log_security_event, check_rate_limit, validate_form_data
+from .email_service import EXCLUDED_FIELDS
+from .outbox import enqueue
+from .security import validate_form_data
+from . import captcha
+from .captcha_images import challenge_pool
+from .chatbot_ai import get_chatbot_response
+from .chatbot_sessions import get_conversation, record_turn, remember_session
 # main/views.py
 from django.http import JsonResponse
 import json
@@ -39,8 +42,38 @@ def home(request):
 def get_captcha(request):
     """Generate and return new CAPTCHA via AJAX"""
     captcha_type = request.GET.get('type', 'contact')
-    session_key = f'{captcha_type}_captcha'
     
+    if settings.CAPTCHA_MODE == 'signed':
+        # Stateless: the signed token is the only record of the challenge
+        if settings.CAPTCHA_IMAGES:
+            # Pre-rendered image; the answer never leaves the server
+            challenge = challenge_pool.take()
+            if challenge is None:
+                # Pool drained by a flood: no plain-text fallback, the client retries
+                retry_after = getattr(settings, 'CAPTCHA_POOL_RETRY_AFTER', 2)
+                response = JsonResponse({
+                    'success': False,
+                    'error': 'CAPTCHA temporarily unavailable. Please try again shortly.',
+                    'retry_after': retry_after
+                }, status=503)
+                response['Retry-After'] = str(retry_after)
+                return response
+            _, token = captcha.issue(captcha_type, digest=challenge.digest)
+            return JsonResponse({
+                'success': True,
+                'image': challenge.image,
+                'token': token,
+                'expires_in': settings.CAPTCHA_TTL
+            })
+        captcha_text, token = captcha.issue(captcha_type)
+        return JsonResponse({
+            'success': True,
+            'captcha_text': captcha_text,
+            'token': token,
+            'expires_in': settings.CAPTCHA_TTL
+        })
+    
+    session_key = f'{captcha_type}_captcha'
     captcha_text = generate_captcha_text()
     request.session[session_key] = f"{captcha_text}|{datetime.now().isoformat()}"
     
@@ -49,20 +82,27 @@ def get_captcha(request):
         'captcha_text': captcha_text
     })
 
+@require_POST
 @csrf_exempt
 def verify_captcha(request):
     """Verify CAPTCHA via AJAX (for real-time validation)"""
-    if request.method == 'POST':
+    try:
         data = json.loads(request.body)
-        captcha_input = data.get('captcha', '')
-        captcha_type = data.get('type', 'contact')
-        
+    except ValueError:
+        return JsonResponse({'valid': False, 'message': 'Invalid request.'}, status=400)
+    captcha_input = data.get('captcha', '')
+    captcha_type = data.get('type', 'contact')
+    
+    if settings.CAPTCHA_MODE == 'signed':
+        is_valid, message = captcha.verify(data.get('token', ''), captcha_input, captcha_type)
+    else:
         is_valid, message = validate_captcha(request, captcha_input, f'{captcha_type}_captcha')
-        
-        return JsonResponse({
-            'valid': is_valid,
-            'message': message
-        })
+    
+    return JsonResponse({
+        'valid': is_valid,
+        'message': message
+    })
+
 logger = logging.getLogger(__name__)
 
 def get_client_info(request):
@@ -70,84 +110,33 @@ def get_client_info(request):
     user_agent = request.META.get('HTTP_USER_AGENT', '')
     return ip, user_agent
 
-def log_page_view(request, page_url):
-    ip, user_agent = get_client_info(request)
-    referrer = request.META.get('HTTP_REFERER', '')
-    
-    PageView.objects.create(
-        page_url=page_url,
-        ip_address=ip,
-        user_agent=user_agent,
-        referrer=referrer
-    )
-
-def send_form_email(form_type, form_data):
-    """Send email notifications for form submissions"""
-    try:
-        subject = f'New {form_type} Submission - {settings.SITE_NAME}'
-        
-        # Create email content
-        content = f"""
-        New {form_type} Submission:
-        
-        Details:
-        """
-        
-        for key, value in form_data.items():
-            if key not in ['csrfmiddletoken', 'captcha', 'g-recaptcha-response']:
-                content += f"{key.replace('_', ' ').title()}: {value}\n"
-        
-        # Send to admin
-        send_mail(
-            subject,
-            content,
-            settings.DEFAULT_FROM_EMAIL,
-            [settings.SITE_EMAIL],
-            fail_silently=False,
-        )
-        
-        # Send confirmation to user if email provided
-        if 'email' in form_data:
-            user_subject = f'Thank you for contacting {settings.SITE_NAME}'
-            user_content = f"""
-            Dear {form_data.get('name', 'User')},
-            
-            Thank you for your submission. We have received your {form_type} and will contact you within 24 hours.
-            
-            Best regards,
-            {settings.SITE_NAME} Team
-            """
-            
-            send_mail(
-                user_subject,
-                user_content,
-                settings.DEFAULT_FROM_EMAIL,
-                [form_data['email']],
-                fail_silently=True,
-            )
-            
-    except Exception as e:
-        logger.error(f"Email sending failed: {str(e)}")
+def queue_form_notifications(form_type, sheet_name, form_data, instance=None):
+    """Queue the notification emails and Google Sheets row for a submission"""
+    data = {key: value for key, value in form_data.items() if key not in EXCLUDED_FIELDS}
+    enqueue('form_email', {'form_type': form_type, 'data': data})
+    payload = {
+        'sheet_name': sheet_name,
+        'data': data,
+        'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+    }
+    if instance is not None:
+        # Lets the job record the sync state on the stored submission
+        payload.update(model=instance._meta.model_name, pk=str(instance.pk))
+    enqueue('sheets_append', payload)
 
 def home(request):
-    log_page_view(request, request.path)
     return render(request, 'index.html')
 
 def about(request):
-    log_page_view(request, request.path)
     return render(request, 'about.html')
 
 def company_profile(request):
-    log_page_view(request, request.path)
     return render(request, 'company-profile.html')
 
 def md_profile(request):
-    log_page_view(request, request.path)
     return render(request, 'md-profile.html')
 
 def services(request):
-    log_page_view(request, request.path)
-    
     if request.method == 'POST':
         form = ServiceInquiryForm(request.POST)
         if form.is_valid():
@@ -156,10 +145,9 @@ def services(request):
             inquiry.ip_address = ip
             inquiry.save()
             
-            # Send email and save to Google Sheets
+            # Queue emails and the Google Sheets row; the outbox worker sends them
             form_data = form.cleaned_data
-            send_form_email('Service Inquiry', form_data)
-            save_to_google_sheet('service_inquiries', form_data)
+            queue_form_notifications('Service Inquiry', 'service_inquiries', form_data, inquiry)
             
             if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
                 return JsonResponse({
@@ -184,7 +172,6 @@ def services(request):
     return render(request, 'services.html', {'inquiry_form': form})
 
 def service_detail(request, service_slug):
-    log_page_view(request, request.path)
     templates = {
         'it-consulting': 'services/it-consulting.html',
         'digital-marketing': 'services/digital-marketing.html',
@@ -198,15 +185,7 @@ def service_detail(request, service_slug):
     return render(request, template)
 
 def contact(request):
-    log_page_view(request, request.path)
-    
     if request.method == 'POST':
-        # Rate limiting check
-        ip, _ = get_client_info(request)
-        if not check_rate_limit(ip, 'contact_form'):
-            messages.error(request, 'Too many submission attempts. Please try again later.')
-            return redirect('contact')
-        
         form = ContactForm(request.POST)
         if form.is_valid():
             contact_message = form.save(commit=False)
@@ -215,19 +194,12 @@ def contact(request):
             contact_message.user_agent = user_agent
             contact_message.verification_token = str(uuid.uuid4())
             
-            # Check for spam
-            spam_keywords = ['buy now', 'click here', 'http://', 'https://', 'www.', '.com']
-            message_lower = contact_message.message.lower()
-            if any(keyword in message_lower for keyword in spam_keywords):
-                contact_message.is_spam = True
-                log_security_event('spam', ip, user_agent, f'Potential spam message from {contact_message.email}')
-            
+            # Scored for spam by signals.check_spam_before_save
             contact_message.save()
             
-            # Send email and save to Google Sheets
+            # Queue emails and the Google Sheets row; the outbox worker sends them
             form_data = form.cleaned_data
-            send_form_email('Contact Message', form_data)
-            save_to_google_sheet('contact_messages', form_data)
+            queue_form_notifications('Contact Message', 'contact_messages', form_data, contact_message)
             
             if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
                 return JsonResponse({
@@ -267,10 +239,9 @@ def subscribe(request):
             subscriber.save()
             message = 'Thank you for subscribing!'
         
-        # Send email and save to Google Sheets
+        # Queue emails and the Google Sheets row; the outbox worker sends them
         form_data = form.cleaned_data
-        send_form_email('Subscription', form_data)
-        save_to_google_sheet('subscribers', form_data)
+        queue_form_notifications('Subscription', 'subscribers', form_data, None if existing else subscriber)
         
         if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
             return JsonResponse({
@@ -299,10 +270,9 @@ def proposal_request(request):
         proposal.ip_address = ip
         proposal.save()
         
-        # Send email and save to Google Sheets
+        # Queue emails and the Google Sheets row; the outbox worker sends them
         form_data = form.cleaned_data
-        send_form_email('Proposal Request', form_data)
-        save_to_google_sheet('proposal_requests', form_data)
+        queue_form_notifications('Proposal Request', 'proposal_requests', form_data, proposal)
         
         if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
             return JsonResponse({
@@ -323,8 +293,6 @@ def proposal_request(request):
             return redirect(request.META.get('HTTP_REFERER', '/'))
 
 def career(request):
-    log_page_view(request, request.path)
-    
     if request.method == 'POST':
         form = CareerApplicationForm(request.POST, request.FILES)
         if form.is_valid():
@@ -333,11 +301,10 @@ def career(request):
             application.ip_address = ip
             application.save()
             
-            # Send email and save to Google Sheets
+            # Queue emails and the Google Sheets row; the outbox worker sends them
             form_data = form.cleaned_data
             form_data['resume'] = str(application.resume)
-            send_form_email('Career Application', form_data)
-            save_to_google_sheet('career_applications', form_data)
+            queue_form_notifications('Career Application', 'career_applications', form_data, application)
             
             if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
                 return JsonResponse({
@@ -362,15 +329,12 @@ def career(request):
     return render(request, 'career.html', {'form': form})
 
 def privacy(request):
-    log_page_view(request, request.path)
     return render(request, 'privacy.html')
 
 def terms(request):
-    log_page_view(request, request.path)
     return render(request, 'terms.html')
 
 def support(request):
-    log_page_view(request, request.path)
     return render(request, 'support.html')
 
 def sitemap(request):
@@ -397,6 +361,7 @@ def chatbot_start_session(request):
         if existing:
             session.is_returning = True
             session.save()
+    remember_session(session)
     
     return JsonResponse({
         'success': True,
@@ -415,27 +380,15 @@ def chatbot_send_message(request):
     if not session_id or not message:
         return JsonResponse({'success': False, 'error': 'Missing parameters'})
     
-    session = ChatbotSession.objects.filter(session_id=session_id).first()
-    if not session:
+    # Cached conversation state; the database is only read on a cache miss
+    state = get_conversation(session_id)
+    if state is None:
         return JsonResponse({'success': False, 'error': 'Invalid session'})
     
-    # Save user message
-    ChatbotMessage.objects.create(
-        session=session,
-        message=message,
-        is_user=True
-    )
+    bot_response = get_chatbot_response(message, state)
     
-    # Get bot response (simplified - in production, use AI)
-    from .chatbot_ai import get_chatbot_response
-    bot_response = get_chatbot_response(message, session)
-    
-    # Save bot response
-    ChatbotMessage.objects.create(
-        session=session,
-        message=bot_response,
-        is_user=False
-    )
+    # Both messages are written in the next batch
+    record_turn(state, message, bot_response)
     
     return JsonResponse({
         'success': True,